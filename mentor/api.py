@@ -3,13 +3,20 @@ FastAPI wrapper for Yconic Mentor
 Provides REST API endpoints for the Next.js frontend
 """
 import os
+import json
+import weakref
 from typing import Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
 
 from main import YconicMentor
+from src.llm.resilience import LLMUnavailableError
+from src.monitoring.profiler import ProfileStore, ProfilingMiddleware
+from src.retrieval.filters import RetrievalFilters
 
 # Load environment
 load_dotenv()
@@ -30,6 +37,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request profiling: X-Profile: 1 (with X-Admin-Token), random sampling, or slow-request capture
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+profile_store = ProfileStore(
+    root=os.getenv('PROFILE_DIRECTORY', './profiles'),
+    max_entries=int(os.getenv('PROFILE_MAX_ENTRIES', 50))
+)
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    paths=[p.strip() for p in os.getenv('PROFILE_PATHS', '/ask,/ask/batch,/score').split(',') if p.strip()],
+    sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+    slow_ms=float(os.getenv('PROFILE_SLOW_MS', 0)),
+    admin_token=ADMIN_TOKEN,
+    sample_interval_ms=float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 10)),
+    trace_allocations=os.getenv('PROFILE_TRACE_ALLOCATIONS', 'true').lower() == 'true'
+)
+
 # Initialize mentor (singleton)
 mentor: Optional[YconicMentor] = None
 
@@ -51,6 +75,12 @@ class Question(BaseModel):
     question: str
     user_id: str
     conversation_id: Optional[str] = None
+    # Optional retrieval pre-filters (also detected from the question text)
+    doc_type: Optional[str] = None  # email, calendar, meeting, slack, document (comma-separated for several)
+    sender: Optional[str] = None  # email address or domain
+    since: Optional[str] = None  # ISO date or datetime
+    until: Optional[str] = None
+    thread_id: Optional[str] = None
 
 
 class Answer(BaseModel):
@@ -60,6 +90,45 @@ class Answer(BaseModel):
     conversation_id: Optional[str] = None
 
 
+class ScoreRequest(BaseModel):
+    user_id: str
+
+
+class ReportRequest(BaseModel):
+    user_id: str
+    refresh: bool = False  # regenerate every category even if cached
+
+
+class DocumentChange(BaseModel):
+    user_id: str
+    key: str  # S3 key, e.g. user/<user_id>/pitch.md
+    new_key: Optional[str] = None  # rename only
+
+
+class BatchQuestions(BaseModel):
+    questions: list[str]
+    user_id: str
+    conversation_id: Optional[str] = None
+    max_concurrency: Optional[int] = None
+    stream: bool = False  # NDJSON lines as answers complete (each carries its index)
+
+
+class BatchItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: Optional[list[str]] = None
+    error: Optional[str] = None  # set instead of answer when this question failed
+    conversation_id: Optional[str] = None
+
+
+class BatchAnswer(BaseModel):
+    answers: list[BatchItem]
+    conversation_id: Optional[str] = None
+
+
+MAX_BATCH_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 50))
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -77,22 +146,22 @@ async def ask_question(question: Question):
         raise HTTPException(status_code=503, detail="Mentor not initialized")
 
     try:
-        # Always reload documents for this specific user (for hackathon - ensures fresh data)
-        current_user_prefix = f"user/{question.user_id}/"
-        should_reload = (
-            not hasattr(mentor, 'current_user_prefix') or
-            mentor.current_user_prefix != current_user_prefix
+        filters = RetrievalFilters.from_request(
+            doc_type=question.doc_type,
+            sender=question.sender,
+            since=question.since,
+            until=question.until,
+            thread_id=question.thread_id
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
 
-        # Force reload every time for hackathon (comment out for production)
-        should_reload = True
-
-        if should_reload:
-            print(f"📂 Loading documents for user: {question.user_id}")
-            mentor.load_user_documents(question.user_id)
-            mentor.current_user_prefix = current_user_prefix
+    try:
+        # Cheap when the user's index is current; rebuilds or restores only when their S3 documents changed
+        mentor.load_user_documents(question.user_id)
+        mentor.current_user_prefix = f"user/{question.user_id}/"
 
-        result = mentor.ask(question.question)
+        result = mentor.ask(question.question, filters=filters)
 
         return Answer(
             question=result['question'],
@@ -101,6 +170,9 @@ async def ask_question(question: Question):
             conversation_id=question.conversation_id
         )
 
+    except LLMUnavailableError as e:
+        print(f"❌ No LLM backend available: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"LLM backends unavailable: {str(e)}")
     except Exception as e:
         print(f"❌ Error processing question: {str(e)}")
         import traceback
@@ -108,6 +180,143 @@ async def ask_question(question: Question):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/ask/batch", response_model=BatchAnswer)
+async def ask_batch(batch: BatchQuestions):
+    """Ask several independent questions with one tenant load, shared retrieval and parallel generation"""
+    if not mentor:
+        raise HTTPException(status_code=503, detail="Mentor not initialized")
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="No questions provided")
+    if len(batch.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+
+    max_concurrency = batch.max_concurrency or int(os.getenv('BATCH_MAX_CONCURRENCY', 4))
+
+    try:
+        # Load the tenant once for the whole batch
+        print(f"📂 Loading documents for user: {batch.user_id}")
+        mentor.load_user_documents(batch.user_id)
+        mentor.current_user_prefix = f"user/{batch.user_id}/"
+
+        def to_answer(result: dict) -> BatchItem:
+            if "error" in result:
+                return BatchItem(question=result['question'], error=result['error'],
+                                 conversation_id=batch.conversation_id)
+            return BatchItem(
+                question=result['question'],
+                answer=result['answer'],
+                sources=list(set(result['sources'])),
+                conversation_id=batch.conversation_id
+            )
+
+        if batch.stream:
+            # The stream runs after this handler returns, when another request may have switched the
+            # mentor to a different tenant: bind this tenant's chain now and pin its index until done
+            chain = mentor.rag_chain
+            resident = mentor.tenant_pool.acquire(mentor.current_tenant) if mentor.current_tenant else None
+
+            def stream_answers():
+                try:
+                    for index, result in chain.iter_many(batch.questions, max_concurrency):
+                        yield json.dumps({"index": index, **to_answer(result).model_dump(exclude_none=True)}) + "\n"
+                except Exception as e:
+                    yield json.dumps({"error": str(e)}) + "\n"
+
+            stream = stream_answers()
+            background = None
+            if resident:
+                # Released when the response completes, or when the stream is dropped on disconnect
+                release = weakref.finalize(stream, mentor.tenant_pool.release, resident)
+                background = BackgroundTask(release)
+            return StreamingResponse(stream, media_type="application/x-ndjson", background=background)
+
+        results = mentor.ask_many(batch.questions, max_concurrency=max_concurrency)
+        return BatchAnswer(
+            answers=[to_answer(result) for result in results],
+            conversation_id=batch.conversation_id
+        )
+
+    except LLMUnavailableError as e:
+        print(f"❌ No LLM backend available: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"LLM backends unavailable: {str(e)}")
+    except Exception as e:
+        print(f"❌ Error processing batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/score")
+async def score_rubric(request: ScoreRequest):
+    """Deterministic rubric scores computed over the user's full corpus"""
+    if not mentor:
+        raise HTTPException(status_code=503, detail="Mentor not initialized")
+
+    try:
+        mentor.load_user_documents(request.user_id)
+        mentor.current_user_prefix = f"user/{request.user_id}/"
+
+        return mentor.score_rubric()
+
+    except Exception as e:
+        print(f"❌ Error scoring rubric: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/report")
+async def rubric_report(request: ReportRequest):
+    """Per-category mentor assessment with cited evidence, cached until the user's documents change"""
+    if not mentor:
+        raise HTTPException(status_code=503, detail="Mentor not initialized")
+
+    try:
+        mentor.load_user_documents(request.user_id)
+        mentor.current_user_prefix = f"user/{request.user_id}/"
+
+        return {"user_id": request.user_id, **mentor.build_report(refresh=request.refresh)}
+
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error building report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _apply_document_change(change, action: str):
+    if not mentor:
+        raise HTTPException(status_code=503, detail="Mentor not initialized")
+
+    try:
+        return {"user_id": change.user_id, "key": change.key, **action()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"❌ Error updating index for {change.key}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/documents/delete")
+async def delete_document(change: DocumentChange):
+    """Remove one deleted S3 document from the user's index and rescore the rubric without it"""
+    return _apply_document_change(change, lambda: mentor.remove_document(change.user_id, change.key))
+
+
+@app.post("/documents/rename")
+async def rename_document(change: DocumentChange):
+    """Point a renamed S3 document's chunks at its new key; nothing is re-embedded"""
+    if not change.new_key:
+        raise HTTPException(status_code=400, detail="new_key is required")
+    return _apply_document_change(
+        change, lambda: mentor.rename_document(change.user_id, change.key, change.new_key)
+    )
+
+
+@app.post("/documents/replace")
+async def replace_document(change: DocumentChange):
+    """Re-index one S3 document whose content was replaced"""
+    return _apply_document_change(change, lambda: mentor.replace_document(change.user_id, change.key))
+
+
 @app.post("/clear")
 async def clear_conversation():
     """Clear conversation history"""
@@ -146,11 +355,42 @@ async def health():
         "status": "healthy",
         "mentor": True,
         "model": model_info['model_name'],
+        "fast_model": model_info['fast_model_name'],
         "is_ollama": model_info['is_ollama'],
-        "is_openai": model_info['is_openai']
+        "is_openai": model_info['is_openai'],
+        "routes": mentor.llm_wrapper.route_metrics.snapshot(),
+        "failover_model": model_info['failover_model_name'],
+        "backends": mentor.llm_wrapper.get_backend_status(),
+        "prompt_cache": mentor.llm_wrapper.get_prompt_cache_stats(),
+        "retrieval": mentor.retrieval_metrics.snapshot(),
+        "tenants": mentor.tenant_pool.stats()
     }
 
 
+def _require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Captured request profiles, newest first"""
+    _require_admin(x_admin_token)
+    return {"profiles": profile_store.list()}
+
+
+@app.get("/admin/profiles/{profile_id}/{name}")
+async def download_profile(profile_id: str, name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download one file of a profile (cpu.prof opens in snakeviz or pstats; stacks.folded in flamegraph tools)"""
+    _require_admin(x_admin_token)
+    path = profile_store.path(profile_id, name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile file not found")
+    return FileResponse(path, filename=f"{profile_id}-{name}")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,351 @@
+"""
+Bulk re-index of every tenant in the bucket
+After a change to the embedding model, chunker or index settings, rebuilds
+each user/<id>/ prefix into a new index version next to the one being served
+and then switches the tenant to it atomically (src/embeddings/index_versions.py).
+Serving nodes keep answering from the old index until the switch and open the
+new one on the tenant's next request. Tenants with no documents left are
+switched to a placeholder version; a tenant whose S3 listing fails counts as
+failed and is retried, never as empty.
+
+Tenants are discovered with a paginated delimiter listing and rebuilt in a
+process pool, one tenant per task in its own directory, so a failing tenant
+only fails itself. Every finished tenant is written to a checkpoint file; a
+rerun with the same index settings skips them and retries the rest.
+
+Usage:
+    python backfill.py --workers 4
+    python backfill.py --workers 8 --embed-rate 300 --checkpoint backfill_checkpoint.json
+    python backfill.py --users alice,bob --restart
+
+Run it with the embedding, chunking and index settings (.env) the serving nodes
+use. Previous index versions are left on disk for rollback; delete them once
+every node has moved to the new one.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from main import YconicMentor
+from src.embeddings.index_config import IndexConfig
+from src.embeddings.index_versions import switch_index_version, version_index_path
+from src.embeddings.snapshot import IndexSnapshotStore
+from src.embeddings.vector_store import VectorStoreManager
+from src.loaders.s3_loader import S3DocumentLoader
+from src.retrieval.summarizer import CorpusSummarizer
+from src.rubrics.engine import RubricEngine
+from src.rubrics.records import RECORD_ROWS_FILE, RecordExtractor
+
+# Settings that change what gets indexed; a checkpoint only carries over between runs with the same values
+INDEX_SETTING_PREFIXES = ("EMBEDDING_", "OLLAMA_EMBEDDING_MODEL", "USE_OLLAMA", "CHUNK_", "DEDUP_", "INDEX_HNSW_",
+                          "INDEX_CONFIG_PATH", "ENABLE_SUMMARIES")
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Caps texts embedded per second (token bucket) so a backfill doesn't saturate a shared embedding backend"""
+
+    def __init__(self, inner: Embeddings, texts_per_second: float):
+        self.inner = inner
+        self.rate = texts_per_second
+        self.burst = max(1, int(texts_per_second))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _acquire(self, count: int):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= count:
+                self._tokens -= count
+                return
+            time.sleep((count - self._tokens) / self.rate)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.burst):
+            batch = texts[start:start + self.burst]
+            self._acquire(len(batch))
+            vectors.extend(self.inner.embed_documents(batch))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self._acquire(1)
+        return self.inner.embed_query(text)
+
+
+def index_settings_signature() -> str:
+    settings = sorted((k, v) for k, v in os.environ.items() if k.startswith(INDEX_SETTING_PREFIXES))
+    return hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()[:16]
+
+
+# Per-process state, set up once by _init_worker
+_worker: dict = {}
+
+
+def _init_worker(options: dict):
+    load_dotenv()
+    template = VectorStoreManager(
+        persist_directory=options["index_root"],
+        use_ollama=os.getenv('USE_OLLAMA', 'true').lower() == 'true',
+        ollama_model=os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text'),
+        ollama_base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+    )
+    embeddings = template.embeddings
+    if options["embed_rate"]:
+        # The total rate is shared evenly between the worker processes
+        embeddings = RateLimitedEmbeddings(embeddings, options["embed_rate"] / options["workers"])
+
+    rubrics_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src/rubrics/example_rubrics.json')
+    snapshot_bucket = os.getenv('INDEX_SNAPSHOT_BUCKET') or options["bucket"]
+    _worker.update(
+        options,
+        embeddings=embeddings,
+        embedding_model_name=template.embedding_model_name,
+        rubric_engine=RubricEngine.from_file(rubrics_path) if os.path.exists(rubrics_path) else None,
+        startup_domains=[d.strip() for d in os.getenv('STARTUP_EMAIL_DOMAINS', '').split(',') if d.strip()],
+        snapshot_store=IndexSnapshotStore(
+            bucket_name=snapshot_bucket,
+            prefix=os.getenv('INDEX_SNAPSHOT_PREFIX', 'index-snapshots'),
+            keep=int(os.getenv('INDEX_SNAPSHOT_KEEP', 3))
+        ) if options["snapshots"] and snapshot_bucket else None,
+        llm_wrapper=None
+    )
+
+
+def _llm_wrapper():
+    """LLM for summarizing new documents; created on first use since cached summaries need none"""
+    if _worker["llm_wrapper"] is None:
+        from src.llm.llm_wrapper import LLMWrapper
+        _worker["llm_wrapper"] = LLMWrapper(
+            use_ollama=os.getenv('USE_OLLAMA', 'true').lower() == 'true',
+            ollama_model=os.getenv('OLLAMA_MODEL', 'llama3.1'),
+            ollama_base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
+            temperature=float(os.getenv('TEMPERATURE', 0.3)),
+            max_tokens=int(os.getenv('MAX_TOKENS', 2000)),
+            timeout_seconds=float(os.getenv('LLM_TIMEOUT_SECONDS', 60))
+        )
+    return _worker["llm_wrapper"]
+
+
+def backfill_tenant(user_id: str, run_id: str) -> dict:
+    """Build one tenant's new index version and switch to it; errors are returned, not raised"""
+    start = time.perf_counter()
+    tenant_id = YconicMentor._tenant_id(user_id)
+    result = {"user_id": user_id, "tenant_id": tenant_id}
+
+    for attempt in range(_worker["retries"] + 1):
+        try:
+            result.update(_build_tenant(user_id, tenant_id, run_id))
+            result.pop("error", None)
+            break
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}"[:300])
+            if attempt < _worker["retries"]:
+                time.sleep(2 ** attempt)
+
+    result.update(seconds=round(time.perf_counter() - start, 2), finished_at=time.time())
+    return result
+
+
+def _new_index_version(tenant_id: str, run_id: str):
+    # A new directory on every build, so a retried or resumed tenant never overwrites the index being served
+    path = version_index_path(_worker["index_root"], tenant_id, f"{run_id}-{int(time.time() * 1000)}")
+    return path, VectorStoreManager(
+        persist_directory=path,
+        embeddings=_worker["embeddings"],
+        embedding_model_name=_worker["embedding_model_name"],
+        index_config=IndexConfig.from_env(tenant_id)
+    )
+
+
+def _switch_to_placeholder(tenant_id: str, run_id: str) -> str:
+    """Switch a tenant without documents to a placeholder version so its old index stops answering.
+
+    Like the API's placeholder it has no manifest, so serving nodes check S3
+    again on the tenant's next request.
+    """
+    path, manager = _new_index_version(tenant_id, run_id)
+    try:
+        manager.create_vectorstore([
+            Document(page_content="No documents uploaded yet for this user.", metadata={"source": "system"})
+        ])
+    finally:
+        manager.close()
+    switch_index_version(_worker["index_root"], tenant_id, path)
+    return path
+
+
+def _build_tenant(user_id: str, tenant_id: str, run_id: str) -> dict:
+    loader = S3DocumentLoader(bucket_name=_worker["bucket"], prefix=f"user/{user_id}/")
+    # Fingerprint before loading: documents changed mid-build make serving nodes rebuild rather than trust this index
+    objects = loader.list_document_objects()
+    fingerprint = loader.fingerprint(objects)
+    documents = loader.load_documents()
+    # Rubric records come from the full documents, before quoted replies are stripped for chunking
+    record_rows = RecordExtractor.from_documents(documents, startup_domains=_worker["startup_domains"])
+    records = record_rows.build()
+    chunks = loader.split_documents(documents) if documents else []
+    if not chunks:
+        path = _switch_to_placeholder(tenant_id, run_id)
+        return {"status": "empty", "documents": len(documents), "chunks": 0, "version": os.path.basename(path)}
+
+    rubric_engine = _worker["rubric_engine"]
+    path, manager = _new_index_version(tenant_id, run_id)
+    try:
+        manager.create_vectorstore(chunks)
+        # Kept with the index so serving nodes can rescore a deleted or replaced document in place
+        record_rows.save(os.path.join(path, RECORD_ROWS_FILE))
+
+        tenant_summary = None
+        if _worker["summaries"]:
+            summarizer = CorpusSummarizer(
+                llm_wrapper=_llm_wrapper(),
+                cache_path=os.path.join(os.getenv('SUMMARY_CACHE_DIR', './summary_cache'), f"user_{user_id}.json"),
+                max_workers=int(os.getenv('SUMMARY_MAX_WORKERS', 4))
+            )
+            summary_docs = summarizer.summarize(documents)
+            if summary_docs:
+                manager.add_documents(summary_docs)
+            tenant_summary = summarizer.tenant_summary
+
+        # Same manifest the API writes, so serving nodes reuse this index instead of rebuilding it
+        manifest = {
+            "tenant_id": tenant_id,
+            "source_fingerprint": fingerprint,
+            "source_etags": YconicMentor._source_etags(objects),
+            "embedding_model": manager.embedding_model_name,
+            "rubric_scores": rubric_engine.score(records) if rubric_engine else None,
+            "tenant_summary": tenant_summary,
+            "dedup": dict(loader.deduplicator.last_stats) if loader.deduplicator else None,
+            "index_settings": manager.index_config.build_settings(),
+            "backfill_run": run_id
+        }
+        if _worker["snapshot_store"]:
+            manifest = _worker["snapshot_store"].export(manager, tenant_id, extra=manifest)
+        YconicMentor._write_local_manifest(manager, manifest)
+        count = manager.count()
+    finally:
+        manager.close()
+
+    switch_index_version(_worker["index_root"], tenant_id, path)
+    return {"status": "done", "documents": len(documents), "chunks": count, "version": os.path.basename(path)}
+
+
+def discover_users(bucket: str) -> List[str]:
+    """User ids from the user/<id>/ prefixes in the bucket"""
+    loader = S3DocumentLoader(bucket_name=bucket, prefix="user/")
+    return sorted(p[len("user/"):].rstrip('/') for p in loader.list_prefixes())
+
+
+def load_checkpoint(path: str, signature: str, restart: bool) -> dict:
+    if os.path.exists(path) and not restart:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("settings") == signature:
+            return checkpoint
+        print("⚠️  Index settings changed since the checkpoint was written; starting a new run")
+    return {"run_id": time.strftime("%Y%m%d%H%M%S"), "settings": signature, "tenants": {}}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2, default=float)
+    os.replace(path + '.tmp', path)
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Re-index every tenant into a new index version and switch to it")
+    parser.add_argument("--bucket", default=os.getenv('S3_BUCKET_NAME'))
+    parser.add_argument("--index-root", default=os.getenv('TENANT_INDEX_DIRECTORY', './chroma_tenants'))
+    parser.add_argument("--users", default=None, help="comma-separated user ids (default: every user/<id>/ prefix)")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes (tenants built at once)")
+    parser.add_argument("--embed-rate", type=float, default=0,
+                        help="max texts embedded per second across all workers (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=1, help="attempts per tenant after the first")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and rebuild every tenant")
+    parser.add_argument("--summaries", default=os.getenv('ENABLE_SUMMARIES', 'true').lower() == 'true',
+                        action=argparse.BooleanOptionalAction, help="index document and tenant summaries")
+    parser.add_argument("--snapshots", default=os.getenv('ENABLE_INDEX_SNAPSHOTS', 'true').lower() == 'true',
+                        action=argparse.BooleanOptionalAction, help="export each new index as an S3 snapshot")
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error("No bucket: set S3_BUCKET_NAME or pass --bucket")
+
+    checkpoint = load_checkpoint(args.checkpoint, index_settings_signature(), args.restart)
+    users = [u.strip() for u in args.users.split(',') if u.strip()] if args.users else discover_users(args.bucket)
+    finished = {"done", "empty"}
+    pending = [u for u in users if checkpoint["tenants"].get(u, {}).get("status") not in finished]
+    print(f"🗂️  Backfill run {checkpoint['run_id']}: {len(users)} tenants, "
+          f"{len(users) - len(pending)} already done, {len(pending)} to build with {args.workers} workers")
+    if not pending:
+        return
+
+    options = {
+        "bucket": args.bucket,
+        "index_root": args.index_root,
+        "workers": args.workers,
+        "embed_rate": args.embed_rate,
+        "retries": args.retries,
+        "summaries": args.summaries,
+        "snapshots": args.snapshots
+    }
+    start = time.perf_counter()
+    completed = failed = chunks = 0
+    # Spawned workers: no forked Chroma or HTTP client state is shared between tenants
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(options,)
+    ) as executor:
+        futures = {executor.submit(backfill_tenant, user_id, checkpoint["run_id"]): user_id for user_id in pending}
+        for future in as_completed(futures):
+            user_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                result = {"user_id": user_id, "status": "failed", "error": f"{type(e).__name__}: {e}"[:300]}
+
+            checkpoint["tenants"][user_id] = result
+            save_checkpoint(args.checkpoint, checkpoint)
+
+            completed += 1
+            failed += result["status"] == "failed"
+            chunks += result.get("chunks", 0)
+            elapsed = time.perf_counter() - start
+            eta = elapsed / completed * (len(pending) - completed)
+            detail = result.get("error") if result["status"] == "failed" else f"{result.get('chunks', 0)} chunks"
+            print(f"[{completed}/{len(pending)}] {user_id}: {result['status']} ({detail}, {result.get('seconds', 0):.1f}s) | "
+                  f"{chunks / elapsed:.1f} chunks/s, elapsed {format_duration(elapsed)}, ETA {format_duration(eta)}")
+
+    print(f"\n✅ Backfill finished in {format_duration(time.perf_counter() - start)}: "
+          f"{completed - failed} switched or empty, {failed} failed")
+    if failed:
+        print(f"   Rerun with the same settings to retry the failed tenants (checkpoint: {args.checkpoint})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Vector index evaluation harness
+Sweeps HNSW parameters (space, M, construction ef, search ef) and retrieval k
+over a synthetic clustered corpus (or the vectors of an exported index
+snapshot), and reports recall@k against exact search, p50/p99 search latency,
+index build time and on-disk size, so the operating point can be chosen from
+data rather than defaults.
+
+Usage:
+    python index_eval.py
+    python index_eval.py --corpus-size 50000 --m 8,16,32 --search-ef 10,50,100 --k 4,6,10
+    python index_eval.py --vectors snapshot/vectors.npy --target-recall 0.95 --output sweep.json
+
+The chosen values go in INDEX_HNSW_* / RETRIEVAL_K (or per tenant in the
+INDEX_CONFIG_PATH file).
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from src.embeddings.index_config import IndexConfig
+from src.embeddings.vector_store import release_chroma_client
+
+
+def make_corpus(size: int, dimension: int, clusters: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian clusters on the unit sphere, like topic-grouped text embeddings"""
+    centers = rng.normal(size=(clusters, dimension))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    assignments = rng.integers(0, clusters, size=size)
+    vectors = centers[assignments] + rng.normal(scale=spread / np.sqrt(dimension), size=(size, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_queries(corpus: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """Perturbed corpus points: queries near, but not equal to, stored chunks"""
+    picks = corpus[rng.integers(0, len(corpus), size=count)]
+    queries = picks + rng.normal(scale=noise / np.sqrt(corpus.shape[1]), size=picks.shape)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Ground-truth top-k indices by brute force, using Chroma's distance for the space"""
+    if space == "l2":
+        distances = (queries ** 2).sum(1)[:, None] - 2 * queries @ corpus.T + (corpus ** 2).sum(1)[None, :]
+    elif space == "cosine":
+        normalized = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        distances = -(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+    else:
+        distances = -queries @ corpus.T
+    top = np.argpartition(distances, k, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def build_index(client, corpus: np.ndarray, config: IndexConfig, name: str):
+    """Create a collection with the given HNSW settings and insert the corpus; returns (collection, seconds)"""
+    collection = client.create_collection(name, metadata=config.collection_metadata())
+    batch_size = client.get_max_batch_size()
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        batch = corpus[offset:offset + batch_size]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(batch))], embeddings=batch)
+    return collection, time.perf_counter() - start
+
+
+def open_client(path: str):
+    return chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+
+
+def reopen_with_search_ef(client, collection, path: str, search_ef: int):
+    """Change search ef in place; Chroma applies it when the index is next loaded, so reopen.
+    Returns (client, collection), or None when this Chroma version cannot change it."""
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except Exception:
+        return None
+    release_chroma_client(client)
+    client = open_client(path)
+    return client, client.get_collection(collection.name)
+
+
+def measure(collection, queries: np.ndarray, truth: np.ndarray, k: int, warmup: int = 10) -> dict:
+    """Single-query searches (as the API issues them): recall@k and latency percentiles"""
+    for query in queries[:warmup]:
+        collection.query(query_embeddings=[query], n_results=k, include=[])
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({int(i) for i in result["ids"][0]} & set(expected[:k].tolist()))
+
+    return {
+        "recall": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+
+def sweep(corpus: np.ndarray, queries: np.ndarray, args) -> list:
+    results = []
+    root = tempfile.mkdtemp(prefix="index-eval-")
+    max_k = max(args.k)
+    try:
+        for space, m, construction_ef in itertools.product(args.spaces, args.m, args.construction_ef):
+            truth = exact_neighbors(corpus, queries, max_k, space)
+            path = os.path.join(root, f"{space}-m{m}-c{construction_ef}")
+            client = open_client(path)
+
+            collection, build_seconds = None, 0.0
+            for search_ef in args.search_ef:
+                config = IndexConfig(space=space, m=m, construction_ef=construction_ef, search_ef=search_ef)
+                # search ef can be changed in place on recent Chroma; otherwise rebuild per value
+                reopened = reopen_with_search_ef(client, collection, path, search_ef) if collection else None
+                if reopened:
+                    client, collection = reopened
+                else:
+                    if collection is not None:
+                        client.delete_collection(collection.name)
+                    collection, build_seconds = build_index(client, corpus, config, f"eval-{search_ef}")
+                    size = directory_size(path)
+
+                for k in args.k:
+                    row = {
+                        **config.to_dict(),
+                        "k": k,
+                        **measure(collection, queries, truth, k),
+                        "build_seconds": build_seconds,
+                        "index_mb": size / 1024 / 1024
+                    }
+                    results.append(row)
+                    print(f"  space={space:<6} M={m:<3} c_ef={construction_ef:<4} ef={search_ef:<4} k={k:<3} "
+                          f"recall={row['recall']:.3f}  p50={row['p50_ms']:.2f}ms  p99={row['p99_ms']:.2f}ms  "
+                          f"build={build_seconds:.1f}s")
+            release_chroma_client(client)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def recommend(results: list, target_recall: float) -> dict:
+    """Per k: the lowest-p99 setting that meets the recall target"""
+    picks = {}
+    for k in sorted({r["k"] for r in results}):
+        eligible = [r for r in results if r["k"] == k and r["recall"] >= target_recall]
+        picks[k] = min(eligible, key=lambda r: (r["p99_ms"], r["build_seconds"])) if eligible else None
+    return picks
+
+
+def print_report(results: list, picks: dict, target_recall: float, current: IndexConfig):
+    print(f"\n{'space':<7}{'M':>4}{'c_ef':>6}{'ef':>6}{'k':>4}{'recall':>9}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'MB':>8}")
+    for r in results:
+        print(f"{r['space']:<7}{r['m']:>4}{r['construction_ef']:>6}{r['search_ef']:>6}{r['k']:>4}"
+              f"{r['recall']:>9.3f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['build_seconds']:>9.1f}{r['index_mb']:>8.1f}")
+
+    print(f"\nCurrent configuration: {current.describe()}")
+    print(f"Lowest p99 meeting recall >= {target_recall}:")
+    for k, pick in picks.items():
+        if pick:
+            print(f"  k={k}: INDEX_HNSW_SPACE={pick['space']} INDEX_HNSW_M={pick['m']} "
+                  f"INDEX_HNSW_CONSTRUCTION_EF={pick['construction_ef']} INDEX_HNSW_SEARCH_EF={pick['search_ef']} "
+                  f"(recall {pick['recall']:.3f}, p99 {pick['p99_ms']:.2f} ms)")
+        else:
+            print(f"  k={k}: no setting reached the target")
+
+
+def int_list(text: str) -> list:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    current = IndexConfig.from_env()
+
+    parser = argparse.ArgumentParser(description="Recall vs latency sweep for the vector index")
+    parser.add_argument("--corpus-size", type=int, default=10000, help="synthetic corpus size (chunks)")
+    parser.add_argument("--dimension", type=int, default=768, help="synthetic embedding dimension (nomic-embed-text: 768)")
+    parser.add_argument("--clusters", type=int, default=50, help="topic clusters in the synthetic corpus")
+    parser.add_argument("--spread", type=float, default=0.6, help="within-cluster spread")
+    parser.add_argument("--vectors", default=None, help="use vectors from an index snapshot (vectors.npy) instead")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--query-noise", type=float, default=0.3, help="distance of queries from their source chunk")
+    parser.add_argument("--spaces", default=current.space or "l2", help="comma-separated: l2,cosine,ip")
+    parser.add_argument("--m", type=int_list, default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int_list, default=[100])
+    parser.add_argument("--search-ef", type=int_list, default=[10, 20, 50, 100])
+    parser.add_argument("--k", type=int_list, default=[4, current.k, 10])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    args = parser.parse_args()
+    args.spaces = [s.strip() for s in args.spaces.split(",") if s.strip()]
+    args.k = sorted(set(args.k))
+    for space in args.spaces:
+        IndexConfig(space=space)  # validates
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        corpus = np.load(args.vectors).astype(np.float32)
+        print(f"Loaded {len(corpus)} vectors ({corpus.shape[1]}-d) from {args.vectors}")
+    else:
+        corpus = make_corpus(args.corpus_size, args.dimension, args.clusters, args.spread, rng)
+        print(f"Synthetic corpus: {len(corpus)} vectors, {args.dimension}-d, {args.clusters} clusters")
+    queries = make_queries(corpus, args.queries, args.query_noise, rng)
+
+    results = sweep(corpus, queries, args)
+    picks = recommend(results, args.target_recall)
+    print_report(results, picks, args.target_recall, current)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "corpus": {"size": len(corpus), "dimension": int(corpus.shape[1]), "source": args.vectors or "synthetic"},
+                "queries": args.queries,
+                "target_recall": args.target_recall,
+                "results": results,
+                "recommended": {str(k): pick for k, pick in picks.items()}
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
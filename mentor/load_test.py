@@ -0,0 +1,444 @@
+"""
+End-to-end load test for the Mentor API
+Starts api.py against local stand-ins (a fake Ollama server for generation and
+embeddings, a moto S3 server seeded with synthetic tenants), replays a mix of
+users, conversations and question types at a target arrival rate, and reports
+throughput, latency percentiles, time-to-first-byte and error rate.
+
+Usage:
+    python load_test.py --rate 2 --duration 60 --users 5
+    python load_test.py --rate 2 --duration 60 --output run.json --baseline baseline.json
+
+Requires moto[server] (pip install "moto[server]") unless --s3-endpoint points
+at another S3-compatible server (e.g. MinIO).
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+QUESTION_MIX = {
+    "lookup": [
+        "When is the next all-hands meeting?",
+        "Who is the lead engineer?",
+        "How many new clients did we sign in Q3?",
+        "What was the payment failure rate?"
+    ],
+    "synthesis": [
+        "What should we prioritize next quarter to improve growth, and why?",
+        "Evaluate our engineering execution against the rubric and recommend improvements.",
+        "What are the biggest risks in our go-to-market plan and how should we mitigate them?"
+    ],
+    "broad": [
+        "How is the company doing overall?",
+        "Give me an overview of the state of the business."
+    ],
+    "filtered": [
+        "What did the emails say in October?",
+        "What was discussed in the standup meetings?"
+    ],
+    "batch": [
+        "When is the next all-hands meeting?|Who is the lead engineer?|What are our Q4 priorities?"
+    ]
+}
+DEFAULT_MIX = "lookup=0.45,synthesis=0.3,broad=0.1,filtered=0.15"
+
+
+# ----------------------------------------------------------------------
+# Stand-ins
+# ----------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fake_embedding(text: str, dimension: int) -> list:
+    """Deterministic unit vector seeded from the text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def start_fake_ollama(tokens_per_second: float, first_token_ms: float, answer_tokens: int,
+                      embed_ms: float, dimension: int) -> ThreadingHTTPServer:
+    """Minimal Ollama-compatible server: streamed /api/generate at a fixed token rate, /api/embeddings"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/embeddings":
+                time.sleep(embed_ms / 1000.0)
+                body = json.dumps({"embedding": fake_embedding(payload.get("prompt", ""), dimension)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == "/api/generate":
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                time.sleep(first_token_ms / 1000.0)
+                for i in range(answer_tokens):
+                    self.wfile.write((json.dumps({"response": f"tok{i} ", "done": False}) + "\n").encode())
+                    self.wfile.flush()
+                    time.sleep(1.0 / tokens_per_second)
+                self.wfile.write((json.dumps({"response": "", "done": True}) + "\n").encode())
+            else:
+                self.send_response(404)
+                self.end_headers()
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_s3(endpoint: str = None):
+    """moto S3 server unless an external endpoint is given; returns (endpoint, server or None)"""
+    if endpoint:
+        return endpoint, None
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        sys.exit('moto is not installed. Install it with: pip install "moto[server]" (or pass --s3-endpoint)')
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    return f"http://127.0.0.1:{port}", server
+
+
+def seed_tenants(endpoint: str, bucket: str, users: int, docs_per_user: int):
+    """Upload a synthetic corpus (emails, meeting minutes, notes) for each user"""
+    import boto3
+    s3 = boto3.client("s3", endpoint_url=endpoint, region_name="us-east-1")
+    try:
+        s3.create_bucket(Bucket=bucket)
+    except Exception:
+        pass
+
+    for u in range(users):
+        for d in range(docs_per_user):
+            day = 1 + d % 28
+            if d % 3 == 0:
+                key, body = f"user/load{u}/email_{d}.eml", (
+                    f"From: founder{d % 4}@startup{u}.com\nTo: team@startup{u}.com\n"
+                    f"Subject: Update {d} on fundraising and hiring\nDate: Mon, {day:02d} Oct 2024 09:30:00 -0700\n\n"
+                    + f"We closed {d} new clients this week. Payment failures dropped to {d % 7}%. " * 20
+                )
+            elif d % 3 == 1:
+                key, body = f"user/load{u}/standup_{d}.txt", (
+                    f"Engineering Standup - October {day}, 2024\n\nAttendees: Alex, Maria, Sam\n\n"
+                    "=== DAILY STANDUP NOTES ===\n\n" + f"Shipped API v2 milestone {d}. Blockers: none. " * 25
+                )
+            else:
+                key, body = f"user/load{u}/notes_{d}.md", (
+                    f"# Strategy notes {d}\n\n## Priorities\n" + f"Focus on enterprise pipeline item {d}. " * 20
+                    + "\n\n## Risks\n" + "Churn risk in mid-market segment. " * 15
+                )
+            s3.put_object(Bucket=bucket, Key=key, Body=body.encode("utf-8"))
+
+
+def start_api(port: int):
+    """Import api.py with the stand-in environment and serve it on a background thread"""
+    import uvicorn
+    import api
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            sys.exit("API failed to start (see errors above)")
+        time.sleep(0.1)
+    return server
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for pair in text.split(","):
+        name, weight = pair.split("=")
+        if name.strip() not in QUESTION_MIX:
+            sys.exit(f"Unknown question type '{name}'. Choose from {list(QUESTION_MIX)}")
+        mix[name.strip()] = float(weight)
+    total = sum(mix.values())
+    return {name: weight / total for name, weight in mix.items()}
+
+
+async def send(client, base_url: str, kind: str, user: int, conversation: int, question: str) -> dict:
+    """One request; latency is measured by the caller from the scheduled arrival time"""
+    if kind == "batch":
+        url = f"{base_url}/ask/batch"
+        body = {"questions": question.split("|"), "user_id": f"load{user}",
+                "conversation_id": f"c{user}-{conversation}", "stream": True}
+    else:
+        url = f"{base_url}/ask"
+        body = {"question": question, "user_id": f"load{user}", "conversation_id": f"c{user}-{conversation}"}
+
+    first_byte = None
+    async with client.stream("POST", url, json=body) as response:
+        async for _ in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter()
+        return {"status": response.status_code, "first_byte": first_byte}
+
+
+async def run_load(args, base_url: str, mix: dict) -> list:
+    import httpx
+
+    rng = random.Random(args.seed)
+    kinds, weights = zip(*mix.items())
+    # Some users are much more active than others
+    user_weights = [1.0 / (u + 1) ** args.user_skew for u in range(args.users)]
+
+    records = []
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    test_start = time.perf_counter()
+
+    async def one(scheduled: float, kind: str, user: int, conversation: int, question: str):
+        # Latency counts from the scheduled arrival, so queueing behind a saturated server is not hidden
+        async with in_flight:
+            try:
+                result = await send(client, base_url, kind, user, conversation, question)
+                error = None if result["status"] == 200 else f"HTTP {result['status']}"
+            except Exception as e:
+                result, error = {"first_byte": None}, type(e).__name__
+        end = time.perf_counter()
+        records.append({
+            "kind": kind,
+            "user": user,
+            "scheduled": scheduled - test_start,
+            "latency": end - scheduled,
+            "ttfb": (result["first_byte"] - scheduled) if result.get("first_byte") else None,
+            "error": error
+        })
+
+    timeout = httpx.Timeout(args.request_timeout)
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=args.max_in_flight)) as client:
+        tasks = []
+        next_arrival = test_start
+        while next_arrival - test_start < args.duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = rng.choices(kinds, weights)[0]
+            user = rng.choices(range(args.users), user_weights)[0]
+            conversation = rng.randrange(args.conversations)
+            tasks.append(asyncio.create_task(one(next_arrival, kind, user, conversation, rng.choice(QUESTION_MIX[kind]))))
+            # Poisson arrivals at the target rate
+            next_arrival += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+
+    return records
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    samples = np.array(values) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 1),
+        "p95_ms": round(float(np.percentile(samples, 95)), 1),
+        "p99_ms": round(float(np.percentile(samples, 99)), 1),
+        "max_ms": round(float(samples.max()), 1)
+    }
+
+
+def summarize(records: list, warmup: float) -> dict:
+    measured = [r for r in records if r["scheduled"] >= warmup]
+
+    def group(rows: list) -> dict:
+        ok = [r for r in rows if not r["error"]]
+        span = (max(r["scheduled"] + r["latency"] for r in rows) - min(r["scheduled"] for r in rows)) if rows else 0
+        return {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "error_rate": round((len(rows) - len(ok)) / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(ok) / span, 3) if span > 0 else 0.0,
+            "latency": percentiles([r["latency"] for r in ok]),
+            "time_to_first_byte": percentiles([r["ttfb"] for r in ok if r["ttfb"] is not None])
+        }
+
+    errors = {}
+    for r in measured:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    return {
+        "overall": group(measured),
+        "by_type": {kind: group([r for r in measured if r["kind"] == kind]) for kind in sorted({r["kind"] for r in measured})},
+        "errors": errors
+    }
+
+
+def print_report(summary: dict):
+    print("\n" + "=" * 78)
+    print(f"{'type':<12}{'reqs':>6}{'err%':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'ttfb p50':>10}{'ttfb p99':>10}")
+    print("-" * 78)
+    rows = [("overall", summary["overall"])] + list(summary["by_type"].items())
+    for name, stats in rows:
+        latency, ttfb = stats["latency"], stats["time_to_first_byte"]
+        fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+        print(f"{name:<12}{stats['requests']:>6}{stats['error_rate'] * 100:>6.1f}%{stats['throughput_rps']:>8.2f}"
+              f"{fmt(latency['p50_ms']):>9}{fmt(latency['p95_ms']):>9}{fmt(latency['p99_ms']):>9}"
+              f"{fmt(ttfb['p50_ms']):>10}{fmt(ttfb['p99_ms']):>10}")
+    print("=" * 78)
+    print("Latencies in ms, measured from scheduled arrival. /ask is not streamed, so its TTFB is close to "
+          "full latency; batch TTFB is the first streamed answer.")
+    if summary["errors"]:
+        print(f"Errors: {summary['errors']}")
+
+
+def check_regression(summary: dict, baseline: dict, args) -> list:
+    """Compare against a previous run's exported results; returns failure messages"""
+    failures = []
+    current, previous = summary["overall"], baseline["summary"]["overall"]
+
+    if previous["throughput_rps"]:
+        change = current["throughput_rps"] / previous["throughput_rps"] - 1
+        print(f"Throughput: {current['throughput_rps']:.3f} rps vs baseline {previous['throughput_rps']:.3f} ({change:+.1%})")
+        if change < -args.max_throughput_drop:
+            failures.append(f"throughput dropped {-change:.1%} (allowed {args.max_throughput_drop:.0%})")
+
+    if previous["latency"]["p99_ms"] and current["latency"]["p99_ms"] and args.max_p99_increase is not None:
+        change = current["latency"]["p99_ms"] / previous["latency"]["p99_ms"] - 1
+        print(f"p99: {current['latency']['p99_ms']:.0f} ms vs baseline {previous['latency']['p99_ms']:.0f} ms ({change:+.1%})")
+        if change > args.max_p99_increase:
+            failures.append(f"p99 rose {change:.1%} (allowed {args.max_p99_increase:.0%})")
+    return failures
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the Mentor API")
+    parser.add_argument("--rate", type=float, default=1.0, help="target arrival rate (requests/second, Poisson)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of arrivals")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds excluded from the report (tenant loads, caches)")
+    parser.add_argument("--users", type=int, default=5, help="number of tenants")
+    parser.add_argument("--user-skew", type=float, default=1.0, help="Zipf exponent for user activity (0 = uniform)")
+    parser.add_argument("--conversations", type=int, default=3, help="conversations per user")
+    parser.add_argument("--docs-per-user", type=int, default=12)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"question type weights, types: {','.join(QUESTION_MIX)}")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="fake LLM generation rate")
+    parser.add_argument("--first-token-ms", type=float, default=150.0, help="fake LLM time to first token")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="fake LLM tokens per answer")
+    parser.add_argument("--embed-ms", type=float, default=5.0, help="fake embedding latency per text")
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--max-in-flight", type=int, default=64, help="client-side cap on concurrent requests")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--s3-endpoint", default=None, help="external S3-compatible endpoint instead of moto")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--baseline", default=None, help="results JSON from a previous run to gate against")
+    parser.add_argument("--max-throughput-drop", type=float, default=0.10, help="allowed throughput drop vs baseline")
+    parser.add_argument("--max-p99-increase", type=float, default=None, help="allowed p99 increase vs baseline")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--verbose", action="store_true", help="show the API's own logging")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    work_dir = tempfile.mkdtemp(prefix="mentor-load-")
+    ollama = start_fake_ollama(args.tokens_per_second, args.first_token_ms, args.answer_tokens,
+                               args.embed_ms, args.embedding_dim)
+    s3_endpoint, s3_server = start_s3(args.s3_endpoint)
+    bucket = "mentor-load-test"
+
+    # Everything points at the stand-ins; set before api.py loads .env (which does not override)
+    os.environ.update({
+        "USE_OLLAMA": "true",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama.server_address[1]}",
+        "OPENAI_API_KEY": "",
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_REGION": "us-east-1",
+        "S3_ENDPOINT_URL": s3_endpoint,
+        "S3_BUCKET_NAME": bucket,
+        "S3_DOCUMENTS_PREFIX": "user/load0/",
+        "CHROMA_PERSIST_DIRECTORY": os.path.join(work_dir, "chroma_db"),
+        "TENANT_INDEX_DIRECTORY": os.path.join(work_dir, "chroma_tenants"),
+        "SUMMARY_CACHE_DIR": os.path.join(work_dir, "summary_cache")
+    })
+
+    print(f"🧪 Seeding {args.users} tenants x {args.docs_per_user} documents in {s3_endpoint}...")
+    seed_tenants(s3_endpoint, bucket, args.users, args.docs_per_user)
+
+    port = free_port()
+    print(f"🚀 Starting API on port {port} (fake LLM {args.tokens_per_second:.0f} tok/s, "
+          f"{args.answer_tokens} tokens/answer)...")
+    print(f"📈 {args.rate} req/s for {args.duration:.0f}s (warmup {args.warmup:.0f}s), mix {mix}", flush=True)
+
+    # The API logs every request to stdout; keep the report readable unless asked otherwise
+    app_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    started = time.time()
+    with app_output:
+        api_server = start_api(port)
+        records = asyncio.run(run_load(args, f"http://127.0.0.1:{port}", mix))
+    summary = summarize(records, args.warmup)
+    print_report(summary)
+
+    api_server.should_exit = True
+    ollama.shutdown()
+    if s3_server:
+        s3_server.stop()
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "summary": summary,
+        "requests": records
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+    failures = []
+    if summary["overall"]["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {summary['overall']['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures += check_regression(summary, json.load(f), args)
+
+    if failures:
+        print("❌ Regression gate failed: " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Load test passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,28 @@ Main entry point for Yconic Mentor RAG System
 Orchestrates document loading, vector store creation, and chatbot interaction
 """
 import os
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
 from dotenv import load_dotenv
 
 from src.loaders.s3_loader import S3DocumentLoader
+from src.embeddings.index_config import IndexConfig
+from src.embeddings.index_versions import current_index_path
+from src.embeddings.residency import ResidentTenant, TenantIndexPool
+from src.embeddings.snapshot import IndexSnapshotStore
 from src.embeddings.vector_store import VectorStoreManager
 from src.llm.llm_wrapper import LLMWrapper
+from src.retrieval.adaptive import RetrievalMetrics
+from src.retrieval.filters import RetrievalFilters
 from src.retrieval.rag_chain import RAGChain
+from src.retrieval.report import RubricReportBuilder
+from src.retrieval.summarizer import TENANT_SUMMARY_SOURCE, CorpusSummarizer
+from src.rubrics.engine import RubricEngine
+from src.rubrics.records import RECORD_ROWS_FILE, CommunicationRecords, RecordExtractor
 
 
 class YconicMentor:
@@ -37,10 +53,51 @@ class YconicMentor:
         self.llm_wrapper = None
         self.rag_chain = None
 
-        # Setup
-        self._initialize_vectorstore(force_reload)
+        # Deterministic rubric scoring over structured records extracted at ingestion
+        self.rubric_engine = RubricEngine.from_file(self.rubrics_path) if os.path.exists(self.rubrics_path) else None
+        self.records = CommunicationRecords.empty()
+        self.rubric_scores = None
+
+        # Precomputed summaries for broad questions (cached per tenant). They are built in the
+        # background after the index is served, one tenant at a time; until a tenant's summary
+        # is ready, broad questions are answered from retrieval.
+        self.enable_summaries = os.getenv('ENABLE_SUMMARIES', 'true').lower() == 'true'
+        self.tenant_summary = None
+        self.summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summaries")
+        self._manifest_lock = threading.Lock()
+
+        # Per-tenant indexes on local disk, backed by versioned snapshots in S3 so
+        # new or redeployed nodes restore vectors instead of re-embedding
+        self.tenant_index_root = os.getenv('TENANT_INDEX_DIRECTORY', './chroma_tenants')
+        self.index_freshness_seconds = float(os.getenv('INDEX_FRESHNESS_SECONDS', 0))
+        self.snapshot_store = None
+        snapshot_bucket = os.getenv('INDEX_SNAPSHOT_BUCKET') or self.s3_bucket
+        if os.getenv('ENABLE_INDEX_SNAPSHOTS', 'true').lower() == 'true' and snapshot_bucket:
+            self.snapshot_store = IndexSnapshotStore(
+                bucket_name=snapshot_bucket,
+                prefix=os.getenv('INDEX_SNAPSHOT_PREFIX', 'index-snapshots'),
+                keep=int(os.getenv('INDEX_SNAPSHOT_KEEP', 3))
+            )
+        # Recently used tenant indexes and chains stay open within a memory budget
+        self.tenant_pool = TenantIndexPool(
+            budget_bytes=int(float(os.getenv('TENANT_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024),
+            max_resident=int(os.getenv('TENANT_MAX_RESIDENT', 0)) or None
+        )
+        self.current_tenant = None
+        # S3 fingerprint of the current tenant's documents (None when unknown) and
+        # the number of in-place document changes applied to its index since
+        self.current_fingerprint = None
+        self.current_index_version = 0
+        # Chunks used per answer and cutoff reasons, across all tenants' chains
+        self.retrieval_metrics = RetrievalMetrics()
+
+        # Setup (LLM first so ingestion can summarize documents)
         self._initialize_llm()
+        self._initialize_vectorstore(force_reload)
         self._initialize_rag_chain()
+        if os.getenv('PROMPT_PREWARM', 'true').lower() == 'true':
+            # Prefill the fixed system prompt once so the first question only pays for its context
+            self.llm_wrapper.warm_prefix(self.rag_chain.system_prompt)
 
         print("\n" + "=" * 60)
         print("✅ Yconic Mentor is ready!")
@@ -53,7 +110,9 @@ class YconicMentor:
         self.vectorstore_manager = VectorStoreManager(
             persist_directory=os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db'),
             use_ollama=self.use_ollama,
-            ollama_model=os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text')
+            ollama_model=os.getenv('OLLAMA_EMBEDDING_MODEL', 'nomic-embed-text'),
+            ollama_base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
+            index_config=IndexConfig.from_env(self._default_tenant_id())
         )
 
         # Check if we need to load from S3
@@ -62,22 +121,28 @@ class YconicMentor:
         )
 
         if force_reload or not vectorstore_exists:
+            # A fresh node restores the latest snapshot instead of re-embedding
+            if not force_reload and self._restore_default_index():
+                return
             print("Loading documents from S3...")
             self._load_documents_from_s3()
         else:
             print("Loading existing vector store...")
             self.vectorstore_manager.load_vectorstore()
+            if not self.vectorstore_manager.matches_index_config() and self.s3_bucket:
+                # Stores built before cosine became the default keep l2 scores until rebuilt
+                print(f"🔁 Vector store was built in {self.vectorstore_manager.built_space()} space, "
+                      f"rebuilding in {self.vectorstore_manager.index_config.build_settings()['space']}")
+                if not self._restore_default_index():
+                    self._load_documents_from_s3()
 
     def _load_documents_from_s3(self):
         """Load documents from S3 and create vector store"""
-        from langchain_core.documents import Document
-
         if not self.s3_bucket:
             print("⚠️  No S3 bucket configured. Using empty vector store.")
             print("   Set S3_BUCKET_NAME in .env to load documents")
             # Create empty vectorstore for testing
-            dummy_doc = [Document(page_content="No documents loaded yet.", metadata={"source": "system"})]
-            self.vectorstore_manager.create_vectorstore(dummy_doc)
+            self._create_placeholder_index("No documents loaded yet.")
             return
 
         try:
@@ -87,23 +152,58 @@ class YconicMentor:
                 prefix=self.s3_prefix
             )
 
-            # Load and split documents
-            chunks = loader.load_and_split()
+            # Listed before loading: documents changed mid-build make the next start rebuild
+            objects = loader.list_document_objects()
+
+            # Load, extract rubric records, then split documents
+            documents = loader.load_documents()
+            self._score_rubric(documents)
+            chunks = loader.split_documents(documents) if documents else []
 
             if not chunks:
                 print("⚠️  No documents found in S3. Creating empty vector store.")
-                dummy_doc = [Document(page_content="No documents loaded yet. Upload documents to S3.", metadata={"source": "system"})]
-                self.vectorstore_manager.create_vectorstore(dummy_doc)
+                self._create_placeholder_index("No documents loaded yet. Upload documents to S3.")
                 return
 
             # Create vector store
             self.vectorstore_manager.create_vectorstore(chunks)
+            self.tenant_summary = None
+            self._save_tenant_index(
+                self.vectorstore_manager, self._default_tenant_id(), loader.fingerprint(objects),
+                self._dedup_stats(loader), self._source_etags(objects), export=not self.enable_summaries
+            )
+            self._summarize_in_background(
+                self.vectorstore_manager, self._default_tenant_id(), self.s3_prefix, documents
+            )
 
         except Exception as e:
             print(f"⚠️  Error loading from S3: {e}")
             print("   Creating empty vector store. Fix S3 permissions or upload documents to continue.")
-            dummy_doc = [Document(page_content="No documents loaded yet. Check S3 permissions.", metadata={"source": "system"})]
-            self.vectorstore_manager.create_vectorstore(dummy_doc)
+            self._create_placeholder_index("No documents loaded yet. Check S3 permissions.")
+
+    def _default_tenant_id(self) -> str:
+        return self._tenant_id(self.s3_prefix.strip('/') or 'default')
+
+    def _restore_default_index(self) -> bool:
+        """Restore the startup index from its snapshot when it matches the current S3 contents"""
+        if not self.s3_bucket or not self.snapshot_store:
+            return False
+
+        try:
+            fingerprint = S3DocumentLoader(bucket_name=self.s3_bucket, prefix=self.s3_prefix).fingerprint()
+        except Exception as e:
+            print(f"⚠️  Could not fingerprint S3 documents: {e}")
+            return False
+
+        manifest = self._open_tenant_index(self.vectorstore_manager, self._default_tenant_id(), fingerprint)
+        if not manifest:
+            return False
+
+        self.rubric_scores = manifest.get("rubric_scores")
+        self.tenant_summary = manifest.get("tenant_summary")
+        self.current_fingerprint = fingerprint
+        self.current_index_version = manifest.get("index_version", 0)
+        return True
 
     def _initialize_llm(self):
         """Initialize LLM with Ollama/OpenAI fallback"""
@@ -115,7 +215,18 @@ class YconicMentor:
             ollama_base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
             openai_model='gpt-4o-mini',
             temperature=float(os.getenv('TEMPERATURE', 0.3)),
-            max_tokens=int(os.getenv('MAX_TOKENS', 2000))
+            max_tokens=int(os.getenv('MAX_TOKENS', 2000)),
+            fast_ollama_model=os.getenv('OLLAMA_FAST_MODEL') or None,
+            fast_openai_model=os.getenv('OPENAI_FAST_MODEL') or None,
+            timeout_seconds=float(os.getenv('LLM_TIMEOUT_SECONDS', 60)),
+            breaker_failures=int(os.getenv('LLM_BREAKER_FAILURES', 3)),
+            latency_slo_seconds=float(os.getenv('LLM_LATENCY_SLO_SECONDS', 0)) or None,
+            breaker_reset_seconds=float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30)),
+            hedge=os.getenv('LLM_HEDGE', 'false').lower() == 'true',
+            attempt_fraction=float(os.getenv('LLM_ATTEMPT_FRACTION', 0.5)),
+            workers_per_backend=int(os.getenv('LLM_WORKERS_PER_BACKEND', 8)),
+            ollama_keep_alive=os.getenv('OLLAMA_KEEP_ALIVE', '30m'),
+            ollama_num_ctx=int(os.getenv('OLLAMA_NUM_CTX', 0)) or None
         )
 
     def _initialize_rag_chain(self):
@@ -125,12 +236,139 @@ class YconicMentor:
         self.rag_chain = RAGChain(
             vectorstore_manager=self.vectorstore_manager,
             llm_wrapper=self.llm_wrapper,
-            rubrics_path=self.rubrics_path if os.path.exists(self.rubrics_path) else None
+            rubrics_path=self.rubrics_path if os.path.exists(self.rubrics_path) else None,
+            rubric_scores=self.rubric_scores,
+            tenant_summary=self.tenant_summary,
+            k=self.vectorstore_manager.index_config.k,
+            auto_filters=os.getenv('AUTO_DETECT_FILTERS', 'true').lower() == 'true',
+            history_turns=int(os.getenv('PROMPT_HISTORY_TURNS', 2)),
+            retrieval_metrics=self.retrieval_metrics
         )
 
-    def ask(self, question: str) -> dict:
-        """Ask the mentor a question"""
-        return self.rag_chain.ask(question)
+    def _summarizer(self, tenant_key: str) -> CorpusSummarizer:
+        cache_name = tenant_key.strip('/').replace('/', '_') or 'default'
+        return CorpusSummarizer(
+            llm_wrapper=self.llm_wrapper,
+            cache_path=os.path.join(os.getenv('SUMMARY_CACHE_DIR', './summary_cache'), f"{cache_name}.json"),
+            max_workers=int(os.getenv('SUMMARY_MAX_WORKERS', 4))
+        )
+
+    def _summarize_in_background(self, manager: VectorStoreManager, tenant_id: str, tenant_key: str, documents):
+        """Build per-document and tenant summaries after the index is served and index them as extra entries.
+
+        The tenant's resident entry is pinned until the job finishes. If the index
+        is rebuilt in the meantime, the job's summaries are dropped.
+        """
+        if not self.enable_summaries or not documents:
+            return
+
+        resident = self.tenant_pool.acquire(tenant_id)
+        collection = manager.vectorstore
+
+        def build():
+            try:
+                summarizer = self._summarizer(tenant_key)
+                summary_docs = summarizer.summarize(documents)
+                if manager.vectorstore is not collection:
+                    print(f"⚠️  Index for {tenant_id} changed while summarizing; dropping its summaries")
+                    return
+                if summary_docs:
+                    manager.add_documents(summary_docs)
+                self._apply_tenant_summary(manager, tenant_id, resident, summarizer.tenant_summary, export=True)
+            except Exception as e:
+                print(f"⚠️  Could not build summaries for {tenant_id}: {e}")
+            finally:
+                if resident:
+                    self.tenant_pool.release(resident)
+
+        self.summary_executor.submit(build)
+
+    def _apply_tenant_summary(
+        self,
+        manager: VectorStoreManager,
+        tenant_id: str,
+        resident: Optional[ResidentTenant],
+        tenant_summary: Optional[str],
+        export: bool = False
+    ):
+        """Serve a new tenant summary from the chains using this index and record it in the manifest"""
+        if resident:
+            resident.tenant_summary = tenant_summary
+            if resident.rag_chain:
+                resident.rag_chain.tenant_summary = tenant_summary
+        if self.vectorstore_manager is manager:
+            self.tenant_summary = tenant_summary
+            if self.rag_chain and self.rag_chain.vectorstore_manager is manager:
+                self.rag_chain.tenant_summary = tenant_summary
+
+        with self._manifest_lock:
+            manifest = self._read_local_manifest(manager)
+            if not manifest:
+                return
+            manifest = {**manifest, "tenant_summary": tenant_summary}
+            if export and self.snapshot_store:
+                try:
+                    manifest = self.snapshot_store.export(manager, tenant_id, extra=manifest)
+                except Exception as e:
+                    print(f"⚠️  Could not export snapshot for {tenant_id}: {e}")
+            self._write_local_manifest(manager, manifest)
+        print(f"🗂️  Tenant summary for {tenant_id} is ready")
+
+    @staticmethod
+    def _startup_domains() -> list:
+        return [d.strip() for d in os.getenv('STARTUP_EMAIL_DOMAINS', '').split(',') if d.strip()]
+
+    def _score_rubric(self, documents) -> RecordExtractor:
+        """Extract structured records from full documents and score the rubric over them.
+
+        Returns the extractor, whose rows are saved with a tenant's index for in-place updates.
+        """
+        extractor = RecordExtractor.from_documents(documents, startup_domains=self._startup_domains())
+        self.records = extractor.build()
+
+        if not self.rubric_engine:
+            self.rubric_scores = None
+            return extractor
+
+        self.rubric_scores = self.rubric_engine.score(self.records)
+        print(f"📊 Rubric scored from {self.records.summary()}: "
+              f"{self.rubric_scores['overall']['score']:.0f}/100 ({self.rubric_scores['overall']['tier']})")
+        return extractor
+
+    def score_rubric(self) -> dict:
+        """Get the deterministic rubric scores for the loaded documents"""
+        if self.rubric_scores is None and self.rubric_engine:
+            self.rubric_scores = self.rubric_engine.score(self.records)
+        return self.rubric_scores or {}
+
+    def build_report(self, refresh: bool = False) -> dict:
+        """Per-category mentor report, cached per tenant and regenerated only where documents or scores changed"""
+        if not self.rubric_engine:
+            raise ValueError("Rubric is not configured")
+
+        cache_path = os.path.join(
+            os.getenv('REPORT_CACHE_DIR', './report_cache'), f"{self.current_tenant or 'default'}.json"
+        )
+        builder = RubricReportBuilder(
+            self.llm_wrapper,
+            self.vectorstore_manager,
+            cache_path,
+            evidence_k=int(os.getenv('REPORT_EVIDENCE_K', 8)),
+            max_workers=int(os.getenv('REPORT_MAX_WORKERS', 4))
+        )
+        document_version = (
+            f"{self.current_fingerprint}:{self.current_index_version}" if self.current_fingerprint else None
+        )
+        return builder.build(self.rubric_engine.categories, self.score_rubric(), document_version, refresh)
+
+    def ask(self, question: str, filters: RetrievalFilters = None) -> dict:
+        """Ask the mentor a question, optionally restricted by document type, sender or date"""
+        return self.rag_chain.ask(question, filters=filters)
+
+    def ask_many(self, questions: list, max_concurrency: int = None) -> list:
+        """Ask several independent questions at once (shared retrieval, parallel generation)"""
+        max_concurrency = max_concurrency or int(os.getenv('BATCH_MAX_CONCURRENCY', 4))
+        return self.rag_chain.ask_many(questions, max_concurrency=max_concurrency)
 
     def chat_loop(self):
         """Interactive chat loop"""
@@ -169,10 +407,8 @@ class YconicMentor:
         print("\n🔄 Reloading documents from S3...")
         self._load_documents_from_s3()
 
-    def load_user_documents(self, user_id: str):
-        """Load documents for a specific user from S3"""
-        from langchain_core.documents import Document
-
+    def load_user_documents(self, user_id: str, force_reload: bool = False):
+        """Load documents for a specific user, reusing a local index or S3 snapshot when current"""
         print(f"\n📂 Loading documents for user: {user_id}")
         s3_prefix = f"user/{user_id}/"
         print(f"🔍 S3 Bucket: {self.s3_bucket}")
@@ -181,11 +417,33 @@ class YconicMentor:
 
         if not self.s3_bucket:
             print("⚠️  No S3 bucket configured. Using empty vector store.")
-            dummy_doc = [Document(page_content="No documents loaded yet.", metadata={"source": "system"})]
-            self.vectorstore_manager.create_vectorstore(dummy_doc)
+            self._score_rubric([])
+            self._create_placeholder_index("No documents loaded yet.")
             self._rebuild_rag_chain()
+            self.current_fingerprint = None
+            self.current_index_version = 0
             return
 
+        tenant_id = self._tenant_id(user_id)
+        resident = self.tenant_pool.get(tenant_id)
+        if resident and resident.manager.persist_directory != current_index_path(self.tenant_index_root, tenant_id):
+            # A backfill switched the tenant to a new index version; open that one instead
+            print(f"🔀 Index for {user_id} was switched to a new version")
+            resident = None
+
+        # Resident and recently verified: switch to its warm index and chain without touching S3
+        if (resident and not force_reload
+                and time.monotonic() - resident.verified_at < self.index_freshness_seconds):
+            print(f"✓ Index for {user_id} verified {time.monotonic() - resident.verified_at:.0f}s ago")
+            self._activate_tenant(resident)
+            return
+
+        manager = resident.manager if resident else self._tenant_vectorstore(tenant_id)
+        fingerprint = None
+        index_version = 0
+        summarize = None
+        start = time.perf_counter()
+
         try:
             # Load from S3 with user-specific prefix
             print(f"📥 Creating S3DocumentLoader...")
@@ -195,28 +453,443 @@ class YconicMentor:
             )
             print(f"✓ S3DocumentLoader created")
 
-            # Load and split documents
-            chunks = loader.load_and_split()
-
-            if not chunks:
-                print(f"⚠️  No documents found for user {user_id}. Creating empty vector store.")
-                dummy_doc = [Document(page_content=f"No documents uploaded yet for this user.", metadata={"source": "system"})]
-                self.vectorstore_manager.create_vectorstore(dummy_doc)
-                self._rebuild_rag_chain()
+            try:
+                objects = loader.list_document_objects()
+            except Exception as e:
+                # A listing error says nothing about the documents: keep serving what is already indexed
+                if resident:
+                    print(f"⚠️  Could not list documents for {user_id}, serving the resident index: {e}")
+                    self._activate_tenant(resident)
+                    return
+                indexed = self._read_local_manifest(manager)
+                if not indexed or not indexed.get("source_fingerprint"):
+                    raise
+                print(f"⚠️  Could not list documents for {user_id}, serving the local index: {e}")
+                objects = None
+                fingerprint = indexed["source_fingerprint"]
+            else:
+                fingerprint = loader.fingerprint(objects)
+            if resident and not force_reload and resident.fingerprint == fingerprint:
+                print(f"✓ Index for {user_id} is up to date")
+                resident.verified_at = time.monotonic()
+                self._activate_tenant(resident)
                 return
 
-            print(f"✓ Loaded {len(chunks)} document chunks for user {user_id}")
-            # Recreate vector store with user's documents
-            self.vectorstore_manager.create_vectorstore(chunks)
-
-            # Rebuild RAG chain with new vector store
-            self._rebuild_rag_chain()
+            self.vectorstore_manager = manager
+            manifest = None if force_reload and objects is not None else self._open_tenant_index(
+                manager, tenant_id, fingerprint
+            )
+            if not manifest and objects is None:
+                raise RuntimeError(f"No usable index for {user_id} while S3 cannot be listed")
+            if manifest:
+                self.records = CommunicationRecords.empty()
+                self.rubric_scores = manifest.get("rubric_scores")
+                self.tenant_summary = manifest.get("tenant_summary")
+                index_version = manifest.get("index_version", 0)
+            else:
+                # Load, extract rubric records, then split documents
+                documents = loader.load_documents()
+                record_rows = self._score_rubric(documents)
+                chunks = loader.split_documents(documents) if documents else []
+
+                if not chunks:
+                    print(f"⚠️  No documents found for user {user_id}. Creating empty vector store.")
+                    self._create_placeholder_index("No documents uploaded yet for this user.")
+                    self.tenant_summary = None
+                else:
+                    print(f"✓ Loaded {len(chunks)} document chunks for user {user_id}")
+                    # Recreate vector store with user's documents
+                    self.vectorstore_manager.create_vectorstore(chunks)
+                    self.tenant_summary = None
+                    self._save_tenant_index(
+                        manager, tenant_id, fingerprint, self._dedup_stats(loader), self._source_etags(objects),
+                        export=not self.enable_summaries, record_rows=record_rows
+                    )
+                    summarize = documents
 
         except Exception as e:
             print(f"⚠️  Error loading documents for user {user_id}: {e}")
-            dummy_doc = [Document(page_content="Error loading documents. Check S3 permissions.", metadata={"source": "system"})]
-            self.vectorstore_manager.create_vectorstore(dummy_doc)
-            self._rebuild_rag_chain()
+            self._score_rubric([])
+            self.vectorstore_manager = manager
+            self._create_placeholder_index("Error loading documents. Check S3 permissions.")
+            self.tenant_summary = None
+            fingerprint = None  # retry on the next request
+
+        # Rebuild RAG chain with new vector store and keep the tenant resident
+        self._rebuild_rag_chain()
+        self.current_tenant = tenant_id
+        self.current_fingerprint = fingerprint
+        self.current_index_version = index_version
+        self.tenant_pool.put(
+            ResidentTenant(
+                tenant_id=tenant_id,
+                manager=manager,
+                rag_chain=self.rag_chain,
+                rubric_scores=self.rubric_scores,
+                tenant_summary=self.tenant_summary,
+                fingerprint=fingerprint,
+                index_version=index_version
+            ),
+            open_seconds=time.perf_counter() - start
+        )
+        if summarize:
+            self._summarize_in_background(manager, tenant_id, s3_prefix, summarize)
+
+    def _activate_tenant(self, resident: ResidentTenant):
+        """Serve a resident tenant's index, chain and scores"""
+        self.current_tenant = resident.tenant_id
+        self.current_fingerprint = resident.fingerprint
+        self.current_index_version = resident.index_version
+        self.vectorstore_manager = resident.manager
+        self.rag_chain = resident.rag_chain
+        self.records = CommunicationRecords.empty()
+        self.rubric_scores = resident.rubric_scores
+        self.tenant_summary = resident.tenant_summary
+
+    def remove_document(self, user_id: str, key: str) -> dict:
+        """Drop the chunks and summary derived from one S3 key from the user's index and rescore the rest"""
+        self._check_document_key(user_id, key)
+        return self._update_tenant_index(
+            user_id, [key], lambda manager: {"removed": manager.delete_source(key)}, removed=[key]
+        )
+
+    def rename_document(self, user_id: str, key: str, new_key: str) -> dict:
+        """Move an S3 key's entries to its new key without re-embedding them"""
+        self._check_document_key(user_id, key)
+        self._check_document_key(user_id, new_key)
+        if os.path.splitext(key)[1].lower() != os.path.splitext(new_key)[1].lower():
+            # Document type metadata and rubric records are derived from the extension
+            return self._replace_document(user_id, new_key, previous_key=key)
+        return self._update_tenant_index(
+            user_id, [key, new_key], lambda manager: {"renamed": manager.rename_source(key, new_key)},
+            renamed=(key, new_key)
+        )
+
+    def replace_document(self, user_id: str, key: str) -> dict:
+        """Re-index one S3 key whose content changed; the rest of the index is left as is"""
+        self._check_document_key(user_id, key)
+        return self._replace_document(user_id, key)
+
+    def _replace_document(self, user_id: str, key: str, previous_key: Optional[str] = None) -> dict:
+        loader = S3DocumentLoader(bucket_name=self.s3_bucket, prefix=f"user/{user_id}/")
+        # Read the new version first so a failed download leaves the old entries in place
+        document = loader.load_document(key)
+        chunks = loader.split_documents([document]) if document else []
+        old_keys = [k for k in (previous_key, key) if k]
+
+        def replace(manager: VectorStoreManager) -> dict:
+            removed = sum(manager.delete_source(k) for k in old_keys)
+            if chunks:
+                manager.add_documents(chunks)
+            return {"removed": removed, "added": len(chunks)}
+
+        return self._update_tenant_index(
+            user_id, old_keys, replace, loader, removed=old_keys, added=[document] if document else []
+        )
+
+    @staticmethod
+    def _check_document_key(user_id: str, key: str):
+        if not key.startswith(f"user/{user_id}/") or key.endswith('/'):
+            raise ValueError(f"{key} is not a document of user {user_id}")
+
+    def _update_tenant_index(
+        self,
+        user_id: str,
+        keys: list,
+        change,
+        loader: Optional[S3DocumentLoader] = None,
+        removed: Sequence[str] = (),
+        added: Sequence = (),
+        renamed: Optional[tuple] = None
+    ) -> dict:
+        """Apply an in-place change to a user's index and record the new document version.
+
+        Only the entries for the affected keys are touched, and only their ETags
+        are updated in the manifest. The manifest takes the current S3 fingerprint
+        only when every other key is still as indexed, so the next load reuses the
+        index; otherwise the old fingerprint stays and the next load rebuilds. The
+        bumped index version invalidates cached reports.
+
+        Corpus-wide state follows the change without re-reading other documents:
+        the rubric is rescored from the saved records with this document's rows
+        swapped, and its summary and the tenant summary are redone in the
+        background from the cached summaries. Chunks of other documents dropped as
+        near-duplicates of a removed document stay dropped until the next full build.
+        Indexes without saved records (restored snapshots, older builds) are
+        flagged needs_rebuild instead, so the next load rebuilds them.
+        """
+        if not self.s3_bucket:
+            raise ValueError("No S3 bucket configured")
+
+        start = time.perf_counter()
+        tenant_id = self._tenant_id(user_id)
+        resident = self.tenant_pool.get(tenant_id)
+        manager = resident.manager if resident else self._tenant_vectorstore(tenant_id)
+        manifest_path = os.path.join(manager.persist_directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            # No documents indexed here yet; the next load ingests whatever is in S3
+            return {"tenant_id": tenant_id, "indexed": False}
+        if not resident:
+            manager.load_vectorstore()
+
+        try:
+            # Listed first, so an S3 error leaves the index and its manifest untouched
+            loader = loader or S3DocumentLoader(bucket_name=self.s3_bucket, prefix=f"user/{user_id}/")
+            objects = loader.list_document_objects()
+            current = self._source_etags(objects)
+
+            result = change(manager)
+            records = self._update_record_rows(manager, removed, added, renamed)
+            stale = records is None and bool(removed or added)
+
+            with self._manifest_lock:
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                indexed = manifest.get("source_etags")
+                fingerprint = manifest.get("source_fingerprint")
+                up_to_date = False
+                if indexed is not None:
+                    unchanged = {k: v for k, v in indexed.items() if k not in keys}
+                    up_to_date = unchanged == {k: v for k, v in current.items() if k not in keys}
+                    indexed = {**unchanged, **{k: current[k] for k in keys if k in current}}
+                    if up_to_date:
+                        fingerprint = loader.fingerprint(objects)
+                    else:
+                        print(f"⚠️  Other documents of {tenant_id} changed since indexing; the next load rebuilds")
+                rubric_scores = manifest.get("rubric_scores")
+                if records is not None and self.rubric_engine:
+                    rubric_scores = self.rubric_engine.score(records)
+                index_version = manifest.get("index_version", 0) + 1
+                self._write_local_manifest(manager, {
+                    **manifest, "source_fingerprint": fingerprint, "source_etags": indexed,
+                    "rubric_scores": rubric_scores, "index_version": index_version,
+                    "needs_rebuild": stale or manifest.get("needs_rebuild", False)
+                })
+        finally:
+            if not resident:
+                manager.close()
+
+        if stale:
+            # No fingerprint matches a stale index, so the next load rebuilds it
+            fingerprint = None
+            up_to_date = False
+        if resident:
+            resident.fingerprint = fingerprint
+            resident.index_version = index_version
+            resident.rubric_scores = rubric_scores
+            if resident.rag_chain:
+                resident.rag_chain.set_rubric_scores(rubric_scores)
+            # Re-check S3 on the next request unless the whole listing is known to match
+            resident.verified_at = time.monotonic() if up_to_date else float('-inf')
+        if self.current_tenant == tenant_id:
+            self.current_fingerprint = fingerprint
+            self.current_index_version = index_version
+            self.rubric_scores = rubric_scores
+            if records is not None:
+                self.records = records
+        if not stale:
+            self._update_summaries_in_background(tenant_id, f"user/{user_id}/", removed, added, renamed)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"✓ Updated index for {tenant_id} in {elapsed_ms:.0f}ms: {result}")
+        return {"tenant_id": tenant_id, "indexed": True, **result, "index_version": index_version,
+                "elapsed_ms": round(elapsed_ms, 1)}
+
+    def _update_record_rows(
+        self,
+        manager: VectorStoreManager,
+        removed: Sequence[str],
+        added: Sequence,
+        renamed: Optional[tuple]
+    ) -> Optional[CommunicationRecords]:
+        """Swap one document's rows in the saved rubric records; None when the index has none saved"""
+        path = os.path.join(manager.persist_directory, RECORD_ROWS_FILE)
+        extractor = RecordExtractor.load(path, startup_domains=self._startup_domains())
+        if extractor is None:
+            return None
+        for source in removed:
+            extractor.remove_source(source)
+        if renamed:
+            extractor.rename_source(*renamed)
+        for doc in added:
+            extractor.add(doc.metadata.get("source", ""), doc.page_content)
+        extractor.save(path)
+        return extractor.build()
+
+    def _update_summaries_in_background(
+        self,
+        tenant_id: str,
+        tenant_key: str,
+        removed: Sequence[str],
+        added: Sequence,
+        renamed: Optional[tuple]
+    ):
+        """Redo the changed documents' summaries and re-roll the tenant summary from the cached ones"""
+        if not self.enable_summaries or not (removed or added or renamed):
+            return
+
+        resident = self.tenant_pool.acquire(tenant_id)
+        collection = resident.manager.vectorstore if resident else None
+
+        def update():
+            manager = resident.manager if resident else self._tenant_vectorstore(tenant_id)
+            try:
+                summarizer = self._summarizer(tenant_key)
+                if renamed:
+                    # The summary entry moved with the document's other entries
+                    summarizer.rename(*renamed)
+                if not (removed or added):
+                    return
+                summary_docs = summarizer.update(list(added), list(removed))
+                if resident and manager.vectorstore is not collection:
+                    print(f"⚠️  Index for {tenant_id} changed while summarizing; dropping its summaries")
+                    return
+                if not resident:
+                    manager.load_vectorstore()
+                manager.delete_source(TENANT_SUMMARY_SOURCE)
+                if summary_docs:
+                    manager.add_documents(summary_docs)
+                self._apply_tenant_summary(manager, tenant_id, resident, summarizer.tenant_summary)
+            except Exception as e:
+                print(f"⚠️  Could not update summaries for {tenant_id}: {e}")
+            finally:
+                if resident:
+                    self.tenant_pool.release(resident)
+                else:
+                    manager.close()
+
+        self.summary_executor.submit(update)
+
+    @staticmethod
+    def _tenant_id(user_id: str) -> str:
+        """Filesystem- and key-safe tenant identifier"""
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', str(user_id))
+
+    def _tenant_vectorstore(self, tenant_id: str) -> VectorStoreManager:
+        """Vector store in the tenant's own directory, sharing the already-initialized embeddings"""
+        return VectorStoreManager(
+            persist_directory=current_index_path(self.tenant_index_root, tenant_id),
+            embeddings=self.vectorstore_manager.embeddings,
+            embedding_model_name=self.vectorstore_manager.embedding_model_name,
+            index_config=IndexConfig.from_env(tenant_id)
+        )
+
+    def _open_tenant_index(self, manager: VectorStoreManager, tenant_id: str, fingerprint: str):
+        """Open the local index if it matches the S3 contents, else restore the latest snapshot"""
+        manifest_path = os.path.join(manager.persist_directory, 'manifest.json')
+        if os.path.exists(manifest_path) and os.path.exists(os.path.join(manager.persist_directory, 'chroma.sqlite3')):
+            try:
+                with open(manifest_path, 'r') as f:
+                    local = json.load(f)
+                # Indexes from before index settings were recorded were built with Chroma's defaults
+                built_with = local.get("index_settings", IndexConfig().build_settings())
+                if (local.get("source_fingerprint") == fingerprint
+                        and not local.get("needs_rebuild")
+                        and local.get("embedding_model") == manager.embedding_model_name
+                        and built_with == manager.index_config.build_settings()):
+                    print(f"✓ Reusing local index for {tenant_id}")
+                    manager.load_vectorstore()
+                    return local
+            except Exception as e:
+                print(f"⚠️  Could not open local index for {tenant_id}: {e}")
+
+        if not self.snapshot_store:
+            return None
+
+        try:
+            remote = self.snapshot_store.latest_manifest(tenant_id)
+            if not remote or remote.get("source_fingerprint") != fingerprint:
+                return None
+            restored = self.snapshot_store.restore(manager, tenant_id, remote)
+            if restored:
+                # Snapshots carry no rubric records; rows left from an older local build would not match
+                rows_path = os.path.join(manager.persist_directory, RECORD_ROWS_FILE)
+                if os.path.exists(rows_path):
+                    os.remove(rows_path)
+                # Restoring re-inserts the vectors, so the index is built with the current settings
+                restored = {**restored, "index_settings": manager.index_config.build_settings()}
+                self._write_local_manifest(manager, restored)
+            return restored
+        except Exception as e:
+            print(f"⚠️  Could not restore snapshot for {tenant_id}: {e}")
+            return None
+
+    @staticmethod
+    def _dedup_stats(loader: S3DocumentLoader) -> Optional[dict]:
+        return dict(loader.deduplicator.last_stats) if loader.deduplicator else None
+
+    @staticmethod
+    def _source_etags(objects: list) -> dict:
+        """Per-key ETags recorded in the manifest, so in-place updates can tell which keys changed"""
+        return {o["key"]: o["etag"] for o in objects}
+
+    def _save_tenant_index(
+        self,
+        manager: VectorStoreManager,
+        tenant_id: str,
+        fingerprint: str,
+        dedup_stats: Optional[dict] = None,
+        source_etags: Optional[dict] = None,
+        export: bool = True,
+        record_rows: Optional[RecordExtractor] = None
+    ):
+        """Record what the local index was built from and export it as a new snapshot.
+
+        With export=False the snapshot is left to the background summary job, so
+        it includes the summaries. record_rows are the extracted rubric records,
+        kept next to the index so one document can be rescored in place.
+        """
+        if record_rows is not None:
+            record_rows.save(os.path.join(manager.persist_directory, RECORD_ROWS_FILE))
+        manifest = {
+            "tenant_id": tenant_id,
+            "source_fingerprint": fingerprint,
+            "source_etags": source_etags,
+            "embedding_model": manager.embedding_model_name,
+            "rubric_scores": self.rubric_scores,
+            "tenant_summary": self.tenant_summary,
+            "dedup": dedup_stats,
+            "index_settings": manager.index_config.build_settings()
+        }
+        if export and self.snapshot_store:
+            try:
+                manifest = self.snapshot_store.export(manager, tenant_id, extra=manifest)
+            except Exception as e:
+                print(f"⚠️  Could not export snapshot for {tenant_id}: {e}")
+        with self._manifest_lock:
+            self._write_local_manifest(manager, manifest)
+
+    def _create_placeholder_index(self, text: str):
+        """Index a single system entry in place of documents.
+
+        The previous manifest is removed with the documents it described, so the
+        placeholder is never reused as that tenant's current index.
+        """
+        from langchain_core.documents import Document
+
+        self.vectorstore_manager.create_vectorstore([Document(page_content=text, metadata={"source": "system"})])
+        manifest_path = os.path.join(self.vectorstore_manager.persist_directory, 'manifest.json')
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    @staticmethod
+    def _read_local_manifest(manager: VectorStoreManager) -> Optional[dict]:
+        try:
+            with open(os.path.join(manager.persist_directory, 'manifest.json'), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Could not read manifest in {manager.persist_directory}: {e}")
+            return None
+
+    @staticmethod
+    def _write_local_manifest(manager: VectorStoreManager, manifest: dict):
+        os.makedirs(manager.persist_directory, exist_ok=True)
+        path = os.path.join(manager.persist_directory, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f, default=float)
+        os.replace(path + '.tmp', path)
 
     def _rebuild_rag_chain(self):
         """Rebuild the RAG chain with the current vector store"""
@@ -224,7 +897,13 @@ class YconicMentor:
         self.rag_chain = RAGChain(
             vectorstore_manager=self.vectorstore_manager,
             llm_wrapper=self.llm_wrapper,
-            rubrics_path=self.rubrics_path if os.path.exists(self.rubrics_path) else None
+            rubrics_path=self.rubrics_path if os.path.exists(self.rubrics_path) else None,
+            rubric_scores=self.rubric_scores,
+            tenant_summary=self.tenant_summary,
+            k=self.vectorstore_manager.index_config.k,
+            auto_filters=os.getenv('AUTO_DETECT_FILTERS', 'true').lower() == 'true',
+            history_turns=int(os.getenv('PROMPT_HISTORY_TURNS', 2)),
+            retrieval_metrics=self.retrieval_metrics
         )
         print("✓ RAG chain rebuilt")
 
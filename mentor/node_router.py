@@ -0,0 +1,311 @@
+"""
+Tenant-affinity router for several Mentor API nodes
+Sits in front of multiple api.py instances and sends every request for a
+user_id to the same node, chosen on a consistent-hash ring (src/cluster/ring.py),
+so each node keeps its own tenants' indexes, chains and summaries warm instead
+of every node loading every tenant. When the owner is down the request goes to
+the next node on the ring, which is the same fallback node for that user every
+time. Adding or removing a node moves only the tenants on its arcs.
+
+Usage:
+    # Three local nodes (separate index directories), then the router on :8000
+    CHROMA_PERSIST_DIRECTORY=./chroma_db_1 TENANT_INDEX_DIRECTORY=./chroma_tenants_1 uvicorn api:app --port 8001
+    CHROMA_PERSIST_DIRECTORY=./chroma_db_2 TENANT_INDEX_DIRECTORY=./chroma_tenants_2 uvicorn api:app --port 8002
+    CHROMA_PERSIST_DIRECTORY=./chroma_db_3 TENANT_INDEX_DIRECTORY=./chroma_tenants_3 uvicorn api:app --port 8003
+    MENTOR_NODES=http://localhost:8001,http://localhost:8002,http://localhost:8003 python node_router.py
+
+Requests are routed by the JSON body's user_id (or a user_id query parameter,
+or an X-User-Id header); other requests go to any healthy node, or to the node
+named in an X-Mentor-Node header. GET /router/nodes?user_id=... returns a
+user's node order for callers (e.g. the Next.js proxy) that route themselves;
+GET /router/status reports per-node health, tenants and index-cache hit rates.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from src.cluster.ring import HashRing
+
+load_dotenv()
+
+# Headers that describe one hop, not the message
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "host", "content-length"}
+
+
+class NodeState:
+    """Health and traffic of one Mentor node as seen by the router"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.down_until = 0.0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.requests = 0
+        self.failovers_from = 0
+        self.tenants: set = set()
+        self.health: dict = {}
+
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.down_until
+
+    def record_failure(self, reason: str, cooldown_seconds: float):
+        self.consecutive_failures += 1
+        self.last_error = reason
+        self.down_until = time.monotonic() + cooldown_seconds
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    def status(self) -> dict:
+        tenant_pool = self.health.get("tenants") or {}
+        lookups = (tenant_pool.get("hits") or 0) + (tenant_pool.get("misses") or 0)
+        return {
+            "available": self.available(),
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "requests": self.requests,
+            "failovers_from": self.failovers_from,
+            "tenants_routed": len(self.tenants),
+            "resident_tenants": tenant_pool.get("resident"),
+            "tenant_cache_hit_rate": round(tenant_pool["hits"] / lookups, 3) if lookups else None
+        }
+
+
+class NodeRouter:
+    """Consistent-hash routing with passive (request errors) and active (/health) failure detection"""
+
+    def __init__(
+        self,
+        nodes: List[str],
+        virtual_nodes: int = 160,
+        replicas: int = 2,
+        cooldown_seconds: float = 10.0,
+        timeout_seconds: float = 120.0,
+        connect_timeout_seconds: float = 2.0
+    ):
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self.states: Dict[str, NodeState] = {}
+        self.replicas = replicas
+        self.cooldown_seconds = cooldown_seconds
+        self.timeout = httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds)
+        self.client: Optional[httpx.AsyncClient] = None
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, url: str) -> bool:
+        url = url.rstrip("/")
+        self.states.setdefault(url, NodeState(url))
+        return self.ring.add(url)
+
+    def remove_node(self, url: str) -> bool:
+        url = url.rstrip("/")
+        self.states.pop(url, None)
+        return self.ring.remove(url)
+
+    def candidates(self, user_id: Optional[str], pinned: Optional[str] = None) -> List[NodeState]:
+        """Nodes to try in order: the user's owner and replicas (available ones first), then the rest"""
+        if pinned:
+            state = self.states.get(pinned.rstrip("/"))
+            return [state] if state else []
+
+        ordered = [self.states[url] for url in self.ring.nodes_for(user_id or "")]
+        preferred, rest = ordered[:self.replicas], ordered[self.replicas:]
+        # Unavailable replicas stay at the end as a last resort rather than failing outright
+        return (
+            [s for s in preferred if s.available()]
+            + [s for s in rest if s.available()]
+            + [s for s in preferred + rest if not s.available()]
+        )
+
+    async def forward(self, request: Request, body: bytes, user_id: Optional[str], pinned: Optional[str]):
+        candidates = self.candidates(user_id, pinned)
+        if not candidates:
+            raise HTTPException(status_code=503, detail="No mentor nodes configured")
+
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        url_path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        last_error = "no node answered"
+
+        for attempt, state in enumerate(candidates):
+            outgoing = self.client.build_request(request.method, state.url + url_path, headers=headers, content=body)
+            try:
+                response = await self.client.send(outgoing, stream=True)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # The node never took the request, so another node can safely answer it
+                state.record_failure(f"{type(e).__name__}: {e}"[:120], self.cooldown_seconds)
+                state.failovers_from += 1
+                last_error = f"{state.url}: {type(e).__name__}"
+                continue
+            except httpx.RemoteProtocolError as e:
+                # The connection dropped after the request was sent; the node may have acted on it
+                state.record_failure(f"{type(e).__name__}: {e}"[:120], self.cooldown_seconds)
+                raise HTTPException(status_code=502, detail=f"Mentor node {state.url} dropped the connection")
+            except httpx.TimeoutException:
+                # The node may still be working on it; retrying would duplicate the LLM call
+                state.record_failure("timeout", self.cooldown_seconds)
+                raise HTTPException(status_code=504, detail=f"Mentor node {state.url} timed out")
+
+            if response.status_code == 503 and attempt < len(candidates) - 1:
+                # Initializing or no LLM backend on that node: try the next one
+                await response.aclose()
+                state.record_failure("503 from node", self.cooldown_seconds)
+                state.failovers_from += 1
+                last_error = f"{state.url}: 503"
+                continue
+
+            state.record_success()
+            state.requests += 1
+            if user_id:
+                state.tenants.add(user_id)
+            response_headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+            response_headers["x-mentor-node"] = state.url
+            return StreamingResponse(
+                response.aiter_raw(),
+                status_code=response.status_code,
+                headers=response_headers,
+                background=BackgroundTask(response.aclose)
+            )
+
+        raise HTTPException(status_code=503, detail=f"All mentor nodes failed ({last_error})")
+
+    async def check_health(self):
+        """Poll each node's /health; a node still initializing takes no traffic"""
+        async def check(state: NodeState):
+            try:
+                response = await self.client.get(f"{state.url}/health", timeout=self.timeout.connect + 3)
+                state.health = response.json() if response.status_code == 200 else {}
+                state.healthy = state.health.get("status") == "healthy"
+                if state.healthy:
+                    state.record_success()
+                else:
+                    state.last_error = f"health: {state.health.get('status', response.status_code)}"
+            except (httpx.HTTPError, ValueError) as e:
+                state.healthy = False
+                state.last_error = f"health: {type(e).__name__}"
+
+        await asyncio.gather(*(check(state) for state in list(self.states.values())))
+
+    def status(self) -> dict:
+        nodes = {url: state.status() for url, state in self.states.items()}
+        hits = sum((s.health.get("tenants") or {}).get("hits") or 0 for s in self.states.values())
+        misses = sum((s.health.get("tenants") or {}).get("misses") or 0 for s in self.states.values())
+        return {
+            "nodes": nodes,
+            "virtual_nodes": self.ring.virtual_nodes,
+            "replicas": self.replicas,
+            "tenants_routed": sum(n["tenants_routed"] for n in nodes.values()),
+            "tenant_cache_hit_rate": round(hits / (hits + misses), 3) if hits + misses else None
+        }
+
+
+def user_id_of(request: Request, body: bytes) -> Optional[str]:
+    """The tenant a request belongs to: JSON body user_id, then query parameter, then X-User-Id"""
+    if body and "json" in request.headers.get("content-type", ""):
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict) and payload.get("user_id"):
+                return str(payload["user_id"])
+        except ValueError:
+            pass
+    return request.query_params.get("user_id") or request.headers.get("x-user-id")
+
+
+router = NodeRouter(
+    nodes=[n.strip() for n in os.getenv('MENTOR_NODES', 'http://localhost:8001').split(',') if n.strip()],
+    virtual_nodes=int(os.getenv('ROUTER_VIRTUAL_NODES', 160)),
+    replicas=int(os.getenv('ROUTER_REPLICAS', 2)),
+    cooldown_seconds=float(os.getenv('ROUTER_NODE_COOLDOWN_SECONDS', 10)),
+    timeout_seconds=float(os.getenv('ROUTER_TIMEOUT_SECONDS', 120)),
+    connect_timeout_seconds=float(os.getenv('ROUTER_CONNECT_TIMEOUT_SECONDS', 2))
+)
+HEALTH_INTERVAL_SECONDS = float(os.getenv('ROUTER_HEALTH_INTERVAL_SECONDS', 5))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+
+app = FastAPI(title="Yconic Mentor Router", description="Tenant-affinity routing across Mentor API nodes")
+
+
+@app.on_event("startup")
+async def startup_event():
+    router.client = httpx.AsyncClient(timeout=router.timeout)
+
+    async def poll():
+        while True:
+            await router.check_health()
+            await asyncio.sleep(HEALTH_INTERVAL_SECONDS)
+
+    app.state.health_task = asyncio.create_task(poll())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.health_task.cancel()
+    await router.client.aclose()
+
+
+class NodeChange(BaseModel):
+    url: str
+
+
+def _require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/router/status")
+async def router_status():
+    """Per-node availability, requests, tenants routed and tenant-index cache hit rate"""
+    return router.status()
+
+
+@app.get("/router/nodes")
+async def router_nodes(user_id: Optional[str] = None):
+    """All nodes, or the order a user's requests try them in (owner first)"""
+    if user_id is None:
+        return {"nodes": router.ring.nodes}
+    return {"user_id": user_id, "nodes": [state.url for state in router.candidates(user_id)]}
+
+
+@app.post("/router/nodes")
+async def add_node(change: NodeChange, x_admin_token: Optional[str] = Header(None)):
+    """Add a node; only the tenants on its new arcs move to it"""
+    _require_admin(x_admin_token)
+    added = router.add_node(change.url)
+    await router.check_health()
+    return {"added": added, "nodes": router.ring.nodes}
+
+
+@app.delete("/router/nodes")
+async def remove_node(url: str, x_admin_token: Optional[str] = Header(None)):
+    """Remove a node (e.g. before draining it); its tenants move to their next node on the ring"""
+    _require_admin(x_admin_token)
+    return {"removed": router.remove_node(url), "nodes": router.ring.nodes}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy(request: Request, x_mentor_node: Optional[str] = Header(None)):
+    body = await request.body()
+    return await router.forward(request, body, user_id_of(request, body), x_mentor_node)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    port = int(os.getenv('ROUTER_PORT', 8000))
+    print(f"🔀 Routing across {len(router.ring)} mentor node(s): {', '.join(router.ring.nodes)}")
+    print(f"🔗 Status: http://localhost:{port}/router/status")
+
+    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
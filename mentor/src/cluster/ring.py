@@ -0,0 +1,99 @@
+"""
+Consistent Hash Ring
+Maps a key (a user/tenant id) to an ordered list of distinct nodes. Each node
+owns many virtual points on the ring, so load spreads evenly and a node joining
+or leaving only moves the keys on its own arcs (about 1/N of them).
+"""
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+
+def ring_hash(text: str) -> int:
+    """64-bit position on the ring (blake2b, so every process and language agrees)"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes.
+
+    A node's points are hashes of "<node>#<i>" for i in range(virtual_nodes).
+    Lookups walk clockwise from the key's position and return each node the
+    first time it is seen, which gives the primary owner followed by the
+    replicas a key falls back to, always in the same order.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 160):
+        if virtual_nodes < 1:
+            raise ValueError("virtual_nodes must be a positive integer")
+        self.virtual_nodes = virtual_nodes
+        self._nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def add(self, node: str) -> bool:
+        """Add a node; returns False if it was already on the ring"""
+        if node in self._nodes:
+            return False
+        self._rebuild(self._nodes + [node])
+        return True
+
+    def remove(self, node: str) -> bool:
+        """Remove a node; returns False if it was not on the ring"""
+        if node not in self._nodes:
+            return False
+        self._rebuild([n for n in self._nodes if n != node])
+        return True
+
+    def _rebuild(self, nodes: List[str]):
+        points = sorted(
+            (ring_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(self.virtual_nodes)
+        )
+        # Swap in whole lists so concurrent readers never see a half-built ring
+        self._nodes = nodes
+        self._points = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    def nodes_for(self, key: str, count: Optional[int] = None) -> List[str]:
+        """Distinct nodes for a key in fallback order: owner first, then the next nodes clockwise"""
+        points, owners, nodes = self._points, self._owners, self._nodes
+        if not nodes:
+            return []
+        count = len(nodes) if count is None else min(count, len(nodes))
+
+        start = bisect.bisect(points, ring_hash(key))
+        chosen: List[str] = []
+        for offset in range(len(points)):
+            owner = owners[(start + offset) % len(points)]
+            if owner not in chosen:
+                chosen.append(owner)
+                if len(chosen) == count:
+                    break
+        return chosen
+
+    def owner(self, key: str) -> Optional[str]:
+        found = self.nodes_for(key, 1)
+        return found[0] if found else None
+
+    def distribution(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Keys owned per node, to check balance for a set of tenants"""
+        counts = {node: 0 for node in self._nodes}
+        for key in keys:
+            owner = self.owner(key)
+            if owner is not None:
+                counts[owner] += 1
+        return counts
@@ -0,0 +1,167 @@
+"""
+In-Process Embedding Backends
+Local alternatives to the Ollama/OpenAI HTTP embedders: an ONNX model run
+with batched CPU inference, and a deterministic hashing embedder for tests.
+Both implement the LangChain Embeddings interface.
+"""
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+    HAS_ONNX = True
+except ImportError:
+    HAS_ONNX = False
+
+LOCAL_BACKENDS = ("onnx", "hashing")
+HASH_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed unigrams and bigrams: deterministic, dependency-free, no model download.
+
+    Texts sharing words get similar vectors, which is enough for tests and
+    load generation but not for real semantic retrieval.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.model_name = f"hashing:{dimension}"
+
+    def _embed_one(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = HASH_TOKEN_RE.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_one(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-embedding model exported to ONNX, run on CPU inside the process.
+
+    The model directory holds model.onnx and a Hugging Face tokenizer.json.
+    Texts are tokenized in batches, padded to the longest text in the batch,
+    mean-pooled over the attention mask and L2-normalized. Batches run
+    concurrently (onnxruntime releases the GIL), so ingestion scales with cores.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        threads: Optional[int] = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+        query_prefix: str = "",
+        document_prefix: str = ""
+    ):
+        if not HAS_ONNX:
+            raise ImportError("ONNX embeddings need onnxruntime and tokenizers: pip install onnxruntime tokenizers")
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX embedding model is missing {path}")
+
+        self.threads = threads or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        # Threads are split between concurrent batches and each batch's operators
+        self.workers = max(1, min(self.threads, 4))
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = max(1, self.threads // self.workers)
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        with open(model_path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        self.model_name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}:{version}"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        output = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        if output.ndim == 3:
+            # Token embeddings: mean over real (unpadded) tokens
+            mask = attention_mask[:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / np.maximum(norms, 1e-12)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Sorting by length keeps padding within each batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+        if len(batches) == 1 or self.workers == 1:
+            results = [self._embed_batch([texts[i] for i in batch]) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(lambda batch: self._embed_batch([texts[i] for i in batch]), batches))
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, embedded in zip(batches, results):
+            for i, vector in zip(batch, embedded):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.document_prefix}{t}" for t in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([f"{self.query_prefix}{text}"])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.query_prefix}{t}" for t in texts])
+
+
+def create_local_embeddings(backend: str) -> Embeddings:
+    """Build the in-process backend named by EMBEDDING_BACKEND (onnx | hashing)"""
+    if backend == "hashing":
+        return HashingEmbeddings(dimension=int(os.getenv('EMBEDDING_DIMENSION', 384)))
+    if backend == "onnx":
+        model_dir = os.getenv('EMBEDDING_MODEL_PATH')
+        if not model_dir:
+            raise ValueError("EMBEDDING_BACKEND=onnx needs EMBEDDING_MODEL_PATH (directory with model.onnx and tokenizer.json)")
+        threads = os.getenv('EMBEDDING_THREADS')
+        return OnnxEmbeddings(
+            model_dir=model_dir,
+            threads=int(threads) if threads else None,
+            batch_size=int(os.getenv('EMBEDDING_BATCH_SIZE', 32)),
+            max_length=int(os.getenv('EMBEDDING_MAX_LENGTH', 512)),
+            query_prefix=os.getenv('EMBEDDING_QUERY_PREFIX', ''),
+            document_prefix=os.getenv('EMBEDDING_DOCUMENT_PREFIX', '')
+        )
+    raise ValueError(f"Unknown local embedding backend '{backend}'; expected one of {list(LOCAL_BACKENDS)}")
@@ -0,0 +1,99 @@
+"""
+Vector Index Configuration
+HNSW parameters (distance space, M, construction/search ef) and retrieval k,
+from environment defaults with optional per-tenant overrides in a JSON file
+"""
+import json
+import os
+from typing import Optional
+
+SPACES = ("l2", "cosine", "ip")
+
+# Space for new indexes unless INDEX_HNSW_SPACE says otherwise. Relevance is then
+# 1 - cosine distance, the [0, 1] scale the retrieval and routing thresholds assume.
+DEFAULT_SPACE = "cosine"
+
+
+class IndexConfig:
+    """Unset HNSW values (None) leave Chroma's own defaults in place (l2 space);
+    from_env builds new indexes in DEFAULT_SPACE.
+
+    space, m and construction_ef are fixed when a collection is built; changing
+    them means rebuilding the index. search_ef and k apply to existing indexes.
+    """
+
+    def __init__(
+        self,
+        space: Optional[str] = None,
+        m: Optional[int] = None,
+        construction_ef: Optional[int] = None,
+        search_ef: Optional[int] = None,
+        k: int = 6
+    ):
+        if space is not None and space not in SPACES:
+            raise ValueError(f"Unknown HNSW space '{space}'; expected one of {list(SPACES)}")
+        for name, value in (("m", m), ("construction_ef", construction_ef), ("search_ef", search_ef), ("k", k)):
+            if value is not None and int(value) < 1:
+                raise ValueError(f"{name} must be a positive integer")
+
+        self.space = space
+        self.m = int(m) if m is not None else None
+        self.construction_ef = int(construction_ef) if construction_ef is not None else None
+        self.search_ef = int(search_ef) if search_ef is not None else None
+        self.k = int(k)
+
+    @classmethod
+    def from_env(cls, tenant_id: Optional[str] = None) -> "IndexConfig":
+        """INDEX_HNSW_* / RETRIEVAL_K defaults, then the INDEX_CONFIG_PATH file's "default" and tenant entries"""
+        def env_int(name):
+            value = os.getenv(name)
+            return int(value) if value else None
+
+        config = cls(
+            space=os.getenv('INDEX_HNSW_SPACE') or DEFAULT_SPACE,
+            m=env_int('INDEX_HNSW_M'),
+            construction_ef=env_int('INDEX_HNSW_CONSTRUCTION_EF'),
+            search_ef=env_int('INDEX_HNSW_SEARCH_EF'),
+            k=env_int('RETRIEVAL_K') or 6
+        )
+
+        path = os.getenv('INDEX_CONFIG_PATH')
+        if not path or not os.path.exists(path):
+            return config
+        with open(path, 'r') as f:
+            overrides = json.load(f)
+        config = config.merged(overrides.get("default", {}))
+        if tenant_id:
+            config = config.merged(overrides.get("tenants", {}).get(tenant_id, {}))
+        return config
+
+    def merged(self, overrides: dict) -> "IndexConfig":
+        return IndexConfig(**{**self.to_dict(), **overrides})
+
+    def to_dict(self) -> dict:
+        return {
+            "space": self.space,
+            "m": self.m,
+            "construction_ef": self.construction_ef,
+            "search_ef": self.search_ef,
+            "k": self.k
+        }
+
+    def build_settings(self) -> dict:
+        """The parameters an existing index must have been built with to be reused"""
+        return {"space": self.space or "l2", "m": self.m, "construction_ef": self.construction_ef}
+
+    def collection_metadata(self) -> Optional[dict]:
+        """Chroma collection metadata for a new collection, or None for all defaults"""
+        metadata = {
+            key: value for key, value in (
+                ("hnsw:space", self.space),
+                ("hnsw:M", self.m),
+                ("hnsw:construction_ef", self.construction_ef),
+                ("hnsw:search_ef", self.search_ef)
+            ) if value is not None
+        }
+        return metadata or None
+
+    def describe(self) -> str:
+        return ", ".join(f"{key}={value}" for key, value in self.to_dict().items() if value is not None)
@@ -0,0 +1,47 @@
+"""
+Tenant Index Versions
+A tenant's index can be rebuilt in a new directory next to the one being
+served and then switched to in one step. `<tenant>@current` names the version
+directory in use and is replaced atomically; tenants without a pointer use
+their original `<tenant>` directory. Tenant ids never contain '@'.
+"""
+import json
+import os
+from typing import Optional
+
+POINTER_SUFFIX = "@current"
+
+
+def _pointer_path(root: str, tenant_id: str) -> str:
+    return os.path.join(root, f"{tenant_id}{POINTER_SUFFIX}")
+
+
+def current_version(root: str, tenant_id: str) -> Optional[str]:
+    """Directory name of the tenant's current index version, or None for the original directory"""
+    try:
+        with open(_pointer_path(root, tenant_id), 'r') as f:
+            return json.load(f).get("version") or None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️  Could not read index pointer for {tenant_id}: {e}")
+        return None
+
+
+def current_index_path(root: str, tenant_id: str) -> str:
+    """Directory of the index that should be served for the tenant"""
+    return os.path.join(root, current_version(root, tenant_id) or tenant_id)
+
+
+def version_index_path(root: str, tenant_id: str, version: str) -> str:
+    """Directory for a new index version built alongside the current one"""
+    return os.path.join(root, f"{tenant_id}@{version}")
+
+
+def switch_index_version(root: str, tenant_id: str, path: str):
+    """Point the tenant at a version directory; readers see either the old or the new one"""
+    os.makedirs(root, exist_ok=True)
+    pointer = _pointer_path(root, tenant_id)
+    with open(pointer + '.tmp', 'w') as f:
+        json.dump({"version": os.path.basename(path.rstrip(os.sep))}, f)
+    os.replace(pointer + '.tmp', pointer)
@@ -0,0 +1,152 @@
+"""
+Tenant Index Residency
+Keeps recently used tenant indexes (and their chains) open within a memory
+budget, evicting least-recently-used tenants and reopening them on demand
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from src.embeddings.vector_store import VectorStoreManager
+
+
+class ResidentTenant:
+    """One open tenant index plus the warm state built on top of it"""
+
+    def __init__(
+        self,
+        tenant_id: str,
+        manager: VectorStoreManager,
+        rag_chain: Any = None,
+        rubric_scores: Optional[dict] = None,
+        tenant_summary: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+        index_version: int = 0
+    ):
+        self.tenant_id = tenant_id
+        self.manager = manager
+        self.rag_chain = rag_chain
+        self.rubric_scores = rubric_scores
+        self.tenant_summary = tenant_summary
+        self.fingerprint = fingerprint
+        # Bumped by in-place document changes (delete/rename/replace) so answer caches invalidate
+        self.index_version = index_version
+        self.verified_at = time.monotonic()
+        self.estimated_bytes = 0
+        # Open streams using this entry; its manager is only closed once none are left
+        self.pins = 0
+        self.retired = False
+
+
+class TenantIndexPool:
+    def __init__(self, budget_bytes: int = 1024 * 1024 * 1024, max_resident: Optional[int] = None, latency_window: int = 500):
+        self.budget_bytes = budget_bytes
+        self.max_resident = max_resident
+
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, ResidentTenant]" = OrderedDict()
+        self._evicted = set()
+        self._reopen_latencies = deque(maxlen=latency_window)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reopens = 0
+
+    def get(self, tenant_id: str) -> Optional[ResidentTenant]:
+        """Resident entry for the tenant (marked most recently used), or None"""
+        with self._lock:
+            entry = self._resident.get(tenant_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._resident.move_to_end(tenant_id)
+            self.hits += 1
+            return entry
+
+    def acquire(self, tenant_id: str) -> Optional[ResidentTenant]:
+        """Pin the tenant's resident entry (e.g. for a streaming response) so it isn't closed until released"""
+        with self._lock:
+            entry = self._resident.get(tenant_id)
+            if entry is not None:
+                entry.pins += 1
+            return entry
+
+    def release(self, entry: ResidentTenant):
+        with self._lock:
+            entry.pins -= 1
+            close = entry.retired and entry.pins == 0
+        if close:
+            entry.manager.close()
+
+    def _retire(self, entry: ResidentTenant) -> bool:
+        """Mark a replaced or evicted entry; True if its manager can be closed now (caller holds the lock)"""
+        entry.retired = True
+        return entry.pins == 0
+
+    def put(self, entry: ResidentTenant, open_seconds: Optional[float] = None):
+        """Make the tenant resident, then evict least-recently-used tenants until within budget"""
+        entry.estimated_bytes = entry.manager.estimated_bytes()
+
+        victims = []
+        with self._lock:
+            previous = self._resident.pop(entry.tenant_id, None)
+            if previous is not None and previous.manager is not entry.manager and self._retire(previous):
+                victims.append(previous)
+            self._resident[entry.tenant_id] = entry
+
+            if entry.tenant_id in self._evicted and open_seconds is not None:
+                self._evicted.discard(entry.tenant_id)
+                self.reopens += 1
+                self._reopen_latencies.append(open_seconds)
+
+            while len(self._resident) > 1 and self._over_budget():
+                # Least recently used first; pinned tenants stay until their streams finish
+                tenant_id = next((t for t, e in self._resident.items() if not e.pins and t != entry.tenant_id), None)
+                if tenant_id is None:
+                    break
+                victim = self._resident.pop(tenant_id)
+                self._evicted.add(tenant_id)
+                self.evictions += 1
+                if self._retire(victim):
+                    victims.append(victim)
+
+        # Close outside the lock; closing releases the tenant's Chroma system
+        for victim in victims:
+            print(f"♻️  Evicting tenant index {victim.tenant_id} (~{victim.estimated_bytes / 1024 / 1024:.1f} MB)")
+            victim.manager.close()
+
+    def evict(self, tenant_id: str):
+        with self._lock:
+            entry = self._resident.pop(tenant_id, None)
+            close = False
+            if entry is not None:
+                self._evicted.add(tenant_id)
+                self.evictions += 1
+                close = self._retire(entry)
+        if close:
+            entry.manager.close()
+
+    def _over_budget(self) -> bool:
+        if self.max_resident and len(self._resident) > self.max_resident:
+            return True
+        return sum(e.estimated_bytes for e in self._resident.values()) > self.budget_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = np.array(self._reopen_latencies, dtype=float) * 1000.0
+            return {
+                "resident": len(self._resident),
+                "resident_tenants": list(self._resident),
+                "resident_bytes": sum(e.estimated_bytes for e in self._resident.values()),
+                "budget_bytes": self.budget_bytes,
+                "max_resident": self.max_resident,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "reopens": self.reopens,
+                "reopen_p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies.size else None,
+                "reopen_p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies.size else None
+            }
@@ -0,0 +1,185 @@
+"""
+Index Snapshots
+Exports a compact, versioned per-tenant copy of the vector index (vectors,
+texts, metadata, manifest, checksums) to S3-compatible storage so a fresh
+node can restore it instead of re-parsing and re-embedding documents
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Optional
+
+import boto3
+import numpy as np
+
+from src.embeddings.vector_store import VectorStoreManager
+
+
+SNAPSHOT_FORMAT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl.gz"
+MANIFEST_FILE = "manifest.json"
+LATEST_POINTER = "latest.json"
+
+
+def create_s3_client(
+    aws_access_key_id: str = None,
+    aws_secret_access_key: str = None,
+    region_name: str = None,
+    endpoint_url: str = None
+):
+    """S3 client; S3_ENDPOINT_URL points it at a local stand-in (MinIO, moto server, ...)"""
+    return boto3.client(
+        's3',
+        aws_access_key_id=aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=region_name or os.getenv('AWS_REGION', 'us-east-1'),
+        endpoint_url=endpoint_url or os.getenv('S3_ENDPOINT_URL') or None
+    )
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class IndexSnapshotStore:
+    def __init__(self, bucket_name: str, prefix: str = "index-snapshots", s3_client=None, keep: int = 3):
+        self.bucket_name = bucket_name
+        self.prefix = prefix.strip("/")
+        self.s3_client = s3_client or create_s3_client()
+        # Versions kept per tenant after an export; older ones are deleted (0 keeps all)
+        self.keep = keep
+
+    def _key(self, tenant_id: str, *parts: str) -> str:
+        return "/".join([self.prefix, tenant_id, *parts])
+
+    def export(self, manager: VectorStoreManager, tenant_id: str, extra: Optional[dict] = None) -> dict:
+        """Upload a new snapshot version, flip the tenant's latest pointer to it and prune old versions"""
+        start = time.perf_counter()
+        data = manager.export_data()
+
+        vectors_buffer = io.BytesIO()
+        np.save(vectors_buffer, data["embeddings"], allow_pickle=False)
+        vectors_bytes = vectors_buffer.getvalue()
+
+        records = "\n".join(
+            json.dumps({"id": i, "text": t, "metadata": m})
+            for i, t, m in zip(data["ids"], data["documents"], data["metadatas"])
+        )
+        records_bytes = gzip.compress(records.encode("utf-8"), mtime=0)
+
+        version = f"v{int(time.time() * 1000)}"
+        manifest = {
+            **(extra or {}),
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "tenant_id": tenant_id,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "count": len(data["ids"]),
+            "dimension": int(data["embeddings"].shape[1]) if data["embeddings"].ndim == 2 else 0,
+            "embedding_model": manager.embedding_model_name,
+            "files": {
+                VECTORS_FILE: {"sha256": _sha256(vectors_bytes), "bytes": len(vectors_bytes)},
+                RECORDS_FILE: {"sha256": _sha256(records_bytes), "bytes": len(records_bytes)}
+            }
+        }
+
+        # Data files and manifest first; the pointer last, so readers never see a partial snapshot
+        self._put(self._key(tenant_id, version, VECTORS_FILE), vectors_bytes)
+        self._put(self._key(tenant_id, version, RECORDS_FILE), records_bytes)
+        self._put(self._key(tenant_id, version, MANIFEST_FILE), json.dumps(manifest, default=float).encode("utf-8"))
+        self._put(self._key(tenant_id, LATEST_POINTER), json.dumps({"version": version}).encode("utf-8"))
+        self._prune(tenant_id, version)
+
+        size_kb = (len(vectors_bytes) + len(records_bytes)) / 1024
+        print(f"📤 Exported snapshot {version} for {tenant_id} "
+              f"({manifest['count']} vectors, {size_kb:.0f} KB) in {time.perf_counter() - start:.2f}s")
+        return manifest
+
+    def latest_manifest(self, tenant_id: str) -> Optional[dict]:
+        """Manifest of the tenant's current snapshot, or None if there is none"""
+        pointer = self._get(self._key(tenant_id, LATEST_POINTER))
+        if pointer is None:
+            return None
+        version = json.loads(pointer)["version"]
+        manifest = self._get(self._key(tenant_id, version, MANIFEST_FILE))
+        return json.loads(manifest) if manifest else None
+
+    def restore(self, manager: VectorStoreManager, tenant_id: str, manifest: Optional[dict] = None) -> Optional[dict]:
+        """Load the latest snapshot into the manager, verifying checksums and embedding model"""
+        start = time.perf_counter()
+        manifest = manifest or self.latest_manifest(tenant_id)
+        if not manifest:
+            return None
+
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            print(f"⚠️  Snapshot format {manifest.get('format_version')} not supported")
+            return None
+        if manifest.get("embedding_model") != manager.embedding_model_name:
+            print(f"⚠️  Snapshot embedded with {manifest.get('embedding_model')}, "
+                  f"current model is {manager.embedding_model_name}; not restoring")
+            return None
+
+        payloads = {}
+        for name, info in manifest["files"].items():
+            payload = self._get(self._key(tenant_id, manifest["version"], name))
+            if payload is None or _sha256(payload) != info["sha256"]:
+                print(f"⚠️  Snapshot file {name} missing or corrupt; not restoring")
+                return None
+            payloads[name] = payload
+
+        embeddings = np.load(io.BytesIO(payloads[VECTORS_FILE]), allow_pickle=False)
+        records = [json.loads(line) for line in gzip.decompress(payloads[RECORDS_FILE]).decode("utf-8").splitlines() if line]
+
+        manager.import_data(
+            ids=[r["id"] for r in records],
+            embeddings=embeddings,
+            documents=[r["text"] for r in records],
+            metadatas=[r["metadata"] for r in records]
+        )
+        print(f"📥 Restored snapshot {manifest['version']} for {tenant_id} in {time.perf_counter() - start:.2f}s")
+        return manifest
+
+    def _prune(self, tenant_id: str, current: str):
+        """Delete all but the newest `keep` versions; the one the pointer names is never deleted"""
+        if self.keep <= 0:
+            return
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            versions = set()
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self._key(tenant_id, ""), Delimiter="/"):
+                for common in page.get('CommonPrefixes', []):
+                    name = common['Prefix'].rstrip("/").rsplit("/", 1)[-1]
+                    if name.startswith("v") and name[1:].isdigit():
+                        versions.add(name)
+            # A node that read the pointer just before the flip may still be restoring the previous version
+            newest = sorted(versions, key=lambda v: int(v[1:]), reverse=True)[:self.keep]
+            expired = versions - set(newest) - {current}
+            keys = [
+                obj['Key']
+                for version in sorted(expired)
+                for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self._key(tenant_id, version, ""))
+                for obj in page.get('Contents', [])
+            ]
+            for i in range(0, len(keys), 1000):
+                self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True}
+                )
+            if expired:
+                print(f"🧹 Deleted {len(expired)} old snapshot versions for {tenant_id}")
+        except Exception as e:
+            # The new snapshot is already live; pruning is retried on the next export
+            print(f"⚠️  Could not prune old snapshots for {tenant_id}: {e}")
+
+    def _put(self, key: str, body: bytes):
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=body)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.s3_client.get_object(Bucket=self.bucket_name, Key=key)['Body'].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
@@ -3,13 +3,40 @@ Vector Store Manager using ChromaDB
 Handles embeddings and retrieval
 """
 import os
-import shutil
-from typing import List
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
+from src.embeddings.backends import LOCAL_BACKENDS, create_local_embeddings
+from src.embeddings.index_config import IndexConfig
+
+# Chunks embedded and written per add call while building an index
+INGEST_BATCH_SIZE = 1024
+
+
+def release_chroma_client(client):
+    """Stop and forget the Chroma system behind a client.
+
+    Chroma shares one system per path across clients; dropping it means a later
+    open starts from disk instead of reusing (or leaking) the loaded index.
+    """
+    identifier = getattr(client, "_identifier", None)
+    systems = getattr(type(client), "_identifier_to_system", None)
+    if identifier is None or systems is None:
+        return
+    system = systems.pop(identifier, None)
+    getattr(type(client), "_identifier_to_refcount", {}).pop(identifier, None)
+    if system is not None:
+        try:
+            system.stop()
+        except Exception as e:
+            print(f"⚠️  Could not stop Chroma system for {identifier}: {e}")
+
 
 class VectorStoreManager:
     def __init__(
@@ -17,13 +44,29 @@ class VectorStoreManager:
         persist_directory: str = "./chroma_db",
         use_ollama: bool = True,
         ollama_model: str = "nomic-embed-text",
-        ollama_base_url: str = "http://localhost:11434"
+        ollama_base_url: str = "http://localhost:11434",
+        embeddings: Optional[Embeddings] = None,
+        embedding_model_name: Optional[str] = None,
+        index_config: Optional[IndexConfig] = None,
+        embedding_backend: Optional[str] = None
     ):
         self.persist_directory = persist_directory
         self.use_ollama = use_ollama
+        # HNSW parameters and retrieval k (see INDEX_HNSW_* / INDEX_CONFIG_PATH)
+        self.index_config = index_config or IndexConfig.from_env()
+
+        # In-process backends (onnx, hashing) take precedence over use_ollama when configured
+        backend = (embedding_backend or os.getenv('EMBEDDING_BACKEND', '')).lower()
 
-        # Initialize embeddings
-        if use_ollama:
+        # Initialize embeddings (reuse an existing, already-tested instance when given)
+        if embeddings is not None:
+            self.embeddings = embeddings
+            self.embedding_model_name = embedding_model_name or type(embeddings).__name__
+        elif backend in LOCAL_BACKENDS:
+            self.embeddings = create_local_embeddings(backend)
+            self.embedding_model_name = self.embeddings.model_name
+            print(f"✓ Using in-process embeddings: {self.embedding_model_name}")
+        elif use_ollama:
             try:
                 print(f"Using Ollama embeddings: {ollama_model}")
                 self.embeddings = OllamaEmbeddings(
@@ -33,79 +76,230 @@ class VectorStoreManager:
                 # Test connection
                 test = self.embeddings.embed_query("test")
                 print(f"✓ Ollama embeddings working (dimension: {len(test)})")
+                self.embedding_model_name = f"ollama:{ollama_model}"
             except Exception as e:
                 print(f"✗ Ollama embeddings failed: {e}")
                 print("Falling back to OpenAI embeddings")
                 self.embeddings = OpenAIEmbeddings()
+                self.embedding_model_name = f"openai:{self.embeddings.model}"
         else:
             print("Using OpenAI embeddings")
             self.embeddings = OpenAIEmbeddings()
+            self.embedding_model_name = f"openai:{self.embeddings.model}"
 
         # Initialize or load vector store
         self.vectorstore = None
 
-    def create_vectorstore(self, documents: List[Document]) -> Chroma:
-        """Create a new vector store from documents"""
+    def create_vectorstore(self, documents: Sequence) -> Chroma:
+        """Create a new vector store from Documents or chunk records (src/loaders/chunk_records.py).
+
+        Text and metadata are materialized one batch at a time, so only the
+        batch being embedded exists as full strings and dicts.
+        """
         if not documents:
             raise ValueError("No documents provided")
 
-        # Clear existing vector store first to prevent data leakage between users
-        if self.vectorstore is not None:
-            try:
-                print("🗑️  Clearing old vector store...")
-                self.vectorstore.delete_collection()
-                self.vectorstore = None
-            except Exception as e:
-                print(f"⚠️  Could not clear old collection: {e}")
-
-        # Also delete the persist directory to ensure clean slate
-        if os.path.exists(self.persist_directory):
-            try:
-                print("🗑️  Deleting old ChromaDB directory...")
-                shutil.rmtree(self.persist_directory)
-            except Exception as e:
-                print(f"⚠️  Could not delete old directory: {e}")
+        self._clear_existing()
 
         print(f"Creating vector store with {len(documents)} documents...")
 
-        self.vectorstore = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory
+        self.vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+            collection_metadata=self.index_config.collection_metadata()
         )
+        self._add_batches(documents)
 
         print(f"✓ Vector store created and persisted to {self.persist_directory}")
         return self.vectorstore
 
+    def _add_batches(self, documents: Sequence):
+        for start in range(0, len(documents), INGEST_BATCH_SIZE):
+            batch = documents[start:start + INGEST_BATCH_SIZE]
+            self.vectorstore.add_texts(
+                texts=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata for doc in batch]
+            )
+
+    def _clear_existing(self):
+        """Drop the existing collection to prevent data leakage between loads.
+
+        The collection is deleted through the client rather than removing the
+        directory, because Chroma caches one client per path and cannot write
+        to a directory deleted underneath it.
+        """
+        if self.vectorstore is None and os.path.exists(os.path.join(self.persist_directory, 'chroma.sqlite3')):
+            self.load_vectorstore()
+
+        if self.vectorstore is not None:
+            try:
+                print("🗑️  Clearing old vector store...")
+                self.vectorstore.delete_collection()
+            except Exception as e:
+                print(f"⚠️  Could not clear old collection: {e}")
+            self.vectorstore = None
+
     def load_vectorstore(self) -> Chroma:
         """Load existing vector store"""
         print(f"Loading vector store from {self.persist_directory}...")
 
         self.vectorstore = Chroma(
             persist_directory=self.persist_directory,
-            embedding_function=self.embeddings
+            embedding_function=self.embeddings,
+            collection_metadata=self.index_config.collection_metadata()
         )
+        self._apply_search_ef()
 
         print("✓ Vector store loaded")
         return self.vectorstore
 
-    def add_documents(self, documents: List[Document]):
-        """Add new documents to existing vector store"""
+    def _apply_search_ef(self):
+        """Update search ef on an existing collection; the other HNSW parameters need a rebuild.
+
+        Chroma reads ef when it loads the index into memory, so this only takes
+        effect on a freshly opened directory, which is how indexes are loaded here.
+        """
+        wanted = self.index_config.search_ef
+        collection = self.vectorstore._collection
+        current = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+        if wanted is None or current.get("ef_search") in (None, wanted):
+            return
+        try:
+            # Only the configuration is modified; replacing metadata would drop hnsw:space,
+            # which LangChain reads to pick the relevance score function
+            collection.modify(configuration={"hnsw": {"ef_search": wanted}})
+        except Exception as e:
+            print(f"⚠️  Could not change search ef to {wanted}: {e}")
+
+    def add_documents(self, documents: Sequence):
+        """Add new Documents or chunk records to existing vector store"""
         if not self.vectorstore:
             raise ValueError("Vector store not initialized. Call create_vectorstore or load_vectorstore first")
 
         print(f"Adding {len(documents)} documents to vector store...")
-        self.vectorstore.add_documents(documents)
+        self._add_batches(documents)
         print("✓ Documents added")
 
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Search for similar documents"""
+    def delete_source(self, source: str) -> int:
+        """Remove every entry derived from one source key (its chunks and summary); returns how many"""
         if not self.vectorstore:
             raise ValueError("Vector store not initialized")
 
-        results = self.vectorstore.similarity_search(query, k=k)
+        collection = self.vectorstore._collection
+        ids = collection.get(where={"source": source}, include=[])["ids"]
+        if ids:
+            collection.delete(ids=ids)
+        return len(ids)
+
+    def rename_source(self, source: str, new_source: str) -> int:
+        """Point a source's entries at a new key in place; vectors and texts are untouched"""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized")
+
+        collection = self.vectorstore._collection
+        entries = collection.get(where={"source": source}, include=["metadatas"])
+        if entries["ids"]:
+            collection.update(
+                ids=entries["ids"],
+                metadatas=[{**(metadata or {}), "source": new_source} for metadata in entries["metadatas"]]
+            )
+        return len(entries["ids"])
+
+    def similarity_search(self, query: str, k: int = 4, where: Optional[dict] = None) -> List[Document]:
+        """Search for similar documents, optionally pre-filtered by metadata"""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized")
+
+        results = self.vectorstore.similarity_search(query, k=k, filter=where)
         return results
 
+    def similarity_search_with_relevance_scores(
+        self,
+        query: str,
+        k: int = 4,
+        where: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """Search for similar documents with relevance scores in [0, 1] (higher is better).
+        The metadata `where` filter narrows candidates before vector scoring."""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized")
+
+        relevance = self._relevance_score_fn()
+        return [
+            (doc, relevance(distance))
+            for doc, distance in self.vectorstore.similarity_search_with_score(query, k=k, filter=where)
+        ]
+
+    def _relevance_score_fn(self):
+        """Distance -> relevance for the collection's space (LangChain's conversion, unclamped)"""
+        return self.vectorstore._select_relevance_score_fn()
+
+    def built_space(self) -> str:
+        """HNSW space the open collection was built in; collections built with Chroma's defaults are l2"""
+        collection = self.vectorstore._collection
+        space = (collection.metadata or {}).get("hnsw:space")
+        if not space:
+            space = ((getattr(collection, "configuration", None) or {}).get("hnsw") or {}).get("space")
+        return space or "l2"
+
+    def matches_index_config(self) -> bool:
+        """Whether the open collection was built in the configured space; the space is fixed at build time"""
+        return self.built_space() == self.index_config.build_settings()["space"]
+
+    @property
+    def normalized_scores(self) -> bool:
+        """Relevance is 1 - cosine distance, the scale absolute score thresholds assume.
+
+        LangChain's l2 and ip conversions only land in [0, 1] for unit-length
+        embeddings (Ollama's are not), so their scores are only comparable
+        with each other.
+        """
+        return self.vectorstore is not None and self.built_space() == "cosine"
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries in one batch call"""
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(queries)
+        # OllamaEmbeddings prefixes queries and documents differently; keep the query prefix
+        if hasattr(self.embeddings, "query_instruction") and hasattr(self.embeddings, "_embed"):
+            return self.embeddings._embed([f"{self.embeddings.query_instruction}{q}" for q in queries])
+        return self.embeddings.embed_documents(queries)
+
+    def batch_similarity_search(
+        self,
+        queries: List[str],
+        k: int = 4,
+        where: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Embed all queries in one batch and search them in one index call, with relevance scores"""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized")
+        if not queries:
+            return []
+
+        embeddings = self.embed_queries(queries)
+        results = self.vectorstore._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        relevance = self._relevance_score_fn()
+
+        # Documents retrieved for several queries are shared rather than duplicated
+        shared: dict = {}
+        batch = []
+        for ids, texts, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"]
+        ):
+            hits = []
+            for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances):
+                if doc_id not in shared:
+                    shared[doc_id] = Document(page_content=text, metadata=metadata or {})
+                hits.append((shared[doc_id], relevance(distance)))
+            batch.append(hits)
+        return batch
+
     def as_retriever(self, search_kwargs: dict = None):
         """Return vectorstore as a retriever for LangChain"""
         if not self.vectorstore:
@@ -114,6 +308,71 @@ class VectorStoreManager:
         search_kwargs = search_kwargs or {"k": 4}
         return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
 
+    def count(self) -> int:
+        """Number of entries in the vector store"""
+        return self.vectorstore._collection.count() if self.vectorstore else 0
+
+    def estimated_bytes(self, sample_size: int = 20, hnsw_links: int = 16) -> int:
+        """Rough resident size: float32 vectors, HNSW links, and texts/metadata sampled from the collection"""
+        count = self.count()
+        if not count:
+            return 0
+
+        sample = self.vectorstore._collection.peek(limit=min(sample_size, count))
+        embeddings = sample.get("embeddings")
+        dimension = len(embeddings[0]) if embeddings is not None and len(embeddings) else 0
+        payload = [
+            len(text or "") + len(str(metadata or {}))
+            for text, metadata in zip(sample.get("documents") or [], sample.get("metadatas") or [])
+        ]
+        per_entry = dimension * 4 + hnsw_links * 2 * 4 + (sum(payload) / len(payload) if payload else 0)
+        return int(count * per_entry)
+
+    def close(self):
+        """Release the Chroma client for this directory so its index is dropped from memory"""
+        if not self.vectorstore:
+            return
+
+        client = self.vectorstore._client
+        self.vectorstore = None
+        release_chroma_client(client)
+
+    def export_data(self) -> dict:
+        """Dump ids, vectors, texts and metadata (used for index snapshots)"""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized")
+
+        data = self.vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data.get("embeddings")
+        return {
+            "ids": list(data["ids"]),
+            "embeddings": np.asarray(embeddings if embeddings is not None else [], dtype=np.float32),
+            "documents": list(data["documents"]),
+            "metadatas": [m or {} for m in data["metadatas"]]
+        }
+
+    def import_data(self, ids: List[str], embeddings: np.ndarray, documents: List[str], metadatas: List[dict]) -> Chroma:
+        """Replace the vector store with precomputed vectors, skipping embedding entirely"""
+        self._clear_existing()
+
+        self.vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+            collection_metadata=self.index_config.collection_metadata()
+        )
+        batch_size = self.vectorstore._client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            self.vectorstore._collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+
+        print(f"✓ Imported {len(ids)} precomputed vectors into {self.persist_directory}")
+        return self.vectorstore
+
     def clear(self):
         """Clear the vector store"""
         if self.vectorstore:
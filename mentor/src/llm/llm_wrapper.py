@@ -2,11 +2,16 @@
 LLM Wrapper with Ollama and OpenAI fallback
 """
 import os
-from typing import Optional
+import time
+from typing import Dict, List, Optional
 from langchain_community.llms import Ollama
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseLanguageModel
 
+from src.llm.prompt_cache import PromptCacheMetrics, parse_keep_alive
+from src.llm.resilience import Backend, CircuitBreaker, ResilientInvoker
+from src.llm.router import FAST_ROUTE, STRONG_ROUTE, RouteMetrics
+
 
 class LLMWrapper:
     def __init__(
@@ -16,20 +21,54 @@ class LLMWrapper:
         ollama_base_url: str = "http://localhost:11434",
         openai_model: str = "gpt-4o-mini",
         temperature: float = 0.3,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        fast_ollama_model: Optional[str] = None,
+        fast_openai_model: Optional[str] = None,
+        timeout_seconds: float = 60.0,
+        breaker_failures: int = 3,
+        latency_slo_seconds: Optional[float] = None,
+        breaker_reset_seconds: float = 30.0,
+        hedge: bool = False,
+        attempt_fraction: float = 0.5,
+        workers_per_backend: int = 8,
+        ollama_keep_alive: Optional[str] = "30m",
+        ollama_num_ctx: Optional[int] = None
     ):
         self.use_ollama = use_ollama
         self.llm: Optional[BaseLanguageModel] = None
         self.model_name = ""
+        self.timeout_seconds = timeout_seconds
+
+        # Keep Ollama models resident between bursts so the prompt-prefix KV cache survives;
+        # a fixed context size avoids reloads and front-truncation of the shared prefix
+        self.ollama_keep_alive = parse_keep_alive(ollama_keep_alive)
+        self.ollama_num_ctx = ollama_num_ctx
+        self.prompt_cache = PromptCacheMetrics()
+
+        # Optional small model for easy questions (see src/llm/router.py)
+        self.fast_llm: Optional[BaseLanguageModel] = None
+        self.fast_model_name = ""
+        self.route_metrics = RouteMetrics()
+
+        # Runtime failover: the other backend, guarded by one circuit breaker per backend
+        self.failover_llm: Optional[BaseLanguageModel] = None
+        self.failover_model_name = ""
+        self.invoker = ResilientInvoker(
+            deadline_seconds=timeout_seconds,
+            hedge=hedge,
+            attempt_fraction=attempt_fraction,
+            workers_per_backend=workers_per_backend,
+            usage_recorder=self.prompt_cache.record
+        )
+        self.breakers = {
+            "Ollama": CircuitBreaker("Ollama", breaker_failures, latency_slo_seconds, breaker_reset_seconds),
+            "OpenAI": CircuitBreaker("OpenAI", breaker_failures, latency_slo_seconds, breaker_reset_seconds)
+        }
 
         if use_ollama:
             try:
                 print(f"Attempting to use Ollama: {ollama_model}")
-                self.llm = Ollama(
-                    model=ollama_model,
-                    base_url=ollama_base_url,
-                    temperature=temperature
-                )
+                self.llm = self._create_ollama(ollama_model, ollama_base_url, temperature)
 
                 # Test connection with a simple query
                 test_response = self.llm.invoke("Say 'OK'")
@@ -43,37 +82,140 @@ class LLMWrapper:
         else:
             self._init_openai(openai_model, temperature, max_tokens)
 
-    def _init_openai(self, model: str, temperature: float, max_tokens: int):
-        """Initialize OpenAI LLM"""
-        print(f"Using OpenAI: {model}")
-        self.llm = ChatOpenAI(
+        self._init_failover(use_ollama, ollama_model, ollama_base_url, openai_model, temperature, max_tokens)
+        self._init_fast_model(ollama_base_url, fast_ollama_model, fast_openai_model, temperature, max_tokens)
+        self._backends = self._build_routes()
+
+    def _create_ollama(self, model: str, base_url: str, temperature: float) -> Ollama:
+        return Ollama(
+            model=model,
+            base_url=base_url,
+            temperature=temperature,
+            timeout=int(self.timeout_seconds),
+            keep_alive=self.ollama_keep_alive,
+            num_ctx=self.ollama_num_ctx
+        )
+
+    def _create_openai(self, model: str, temperature: float, max_tokens: int) -> ChatOpenAI:
+        return ChatOpenAI(
             model=model,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            request_timeout=self.timeout_seconds,
+            max_retries=1
         )
+
+    def _init_failover(
+        self,
+        use_ollama: bool,
+        ollama_model: str,
+        ollama_base_url: str,
+        openai_model: str,
+        temperature: float,
+        max_tokens: int
+    ):
+        """Keep the other backend ready so a mid-day stall fails over instead of failing the request"""
+        try:
+            if "Ollama" in self.model_name and os.getenv('OPENAI_API_KEY'):
+                self.failover_llm = self._create_openai(openai_model, temperature, max_tokens)
+                self.failover_model_name = f"OpenAI ({openai_model})"
+            elif "OpenAI" in self.model_name and use_ollama:
+                # Ollama failed its startup check; keep it as a secondary so it can recover
+                self.failover_llm = self._create_ollama(ollama_model, ollama_base_url, temperature)
+                self.failover_model_name = f"Ollama ({ollama_model})"
+            else:
+                return
+            print(f"✓ Failover backend: {self.failover_model_name}")
+        except Exception as e:
+            print(f"✗ Failover backend unavailable: {e}")
+            self.failover_llm = None
+            self.failover_model_name = ""
+
+    def _init_fast_model(
+        self,
+        ollama_base_url: str,
+        fast_ollama_model: Optional[str],
+        fast_openai_model: Optional[str],
+        temperature: float,
+        max_tokens: int
+    ):
+        """Initialize the fast model on the same backend as the primary model"""
+        try:
+            if "Ollama" in self.model_name and fast_ollama_model:
+                self.fast_llm = self._create_ollama(fast_ollama_model, ollama_base_url, temperature)
+                self.fast_model_name = f"Ollama ({fast_ollama_model})"
+            elif "OpenAI" in self.model_name and fast_openai_model:
+                self.fast_llm = self._create_openai(fast_openai_model, temperature, max_tokens)
+                self.fast_model_name = f"OpenAI ({fast_openai_model})"
+            else:
+                return
+            print(f"✓ Fast model for easy questions: {self.fast_model_name}")
+        except Exception as e:
+            print(f"✗ Fast model unavailable, routing everything to {self.model_name}: {e}")
+            self.fast_llm = None
+            self.fast_model_name = ""
+
+    def _init_openai(self, model: str, temperature: float, max_tokens: int):
+        """Initialize OpenAI LLM"""
+        print(f"Using OpenAI: {model}")
+        self.llm = self._create_openai(model, temperature, max_tokens)
         self.model_name = f"OpenAI ({model})"
         print(f"✓ OpenAI initialized")
 
-    def get_llm(self) -> BaseLanguageModel:
-        """Get the active LLM instance"""
-        if not self.llm:
-            raise ValueError("LLM not initialized")
-        return self.llm
+    def _backend(self, name: str, llm: BaseLanguageModel) -> Backend:
+        kind = "Ollama" if name.startswith("Ollama") else "OpenAI"
+        return Backend(name=name, llm=llm, breaker=self.breakers[kind])
 
-    def invoke(self, prompt: str) -> str:
-        """Simple invoke method"""
+    def _build_routes(self) -> Dict[str, List[Backend]]:
+        """Ordered backends per route: preferred model first, then failover"""
+        strong = [self._backend(self.model_name, self.llm)] if self.llm else []
+        if self.failover_llm:
+            strong.append(self._backend(self.failover_model_name, self.failover_llm))
+
+        fast = [self._backend(self.fast_model_name, self.fast_llm)] if self.fast_llm else []
+        return {STRONG_ROUTE: strong, FAST_ROUTE: fast + strong}
+
+    def invoke(self, prompt: str, route: Optional[str] = None, record_metrics: bool = True) -> str:
+        """Invoke with a per-call deadline, failing over across backends whose circuits are closed"""
         if not self.llm:
             raise ValueError("LLM not initialized")
-        return self.llm.invoke(prompt)
+
+        start = time.perf_counter()
+        text, backend = self.invoker.invoke(self._backends[route or STRONG_ROUTE], prompt)
+        if route and record_metrics:
+            self.route_metrics.record(route, time.perf_counter() - start)
+        return text
 
     def get_model_info(self) -> dict:
         """Get information about the active model"""
         return {
             "model_name": self.model_name,
+            "fast_model_name": self.fast_model_name or None,
+            "failover_model_name": self.failover_model_name or None,
             "is_ollama": "Ollama" in self.model_name,
             "is_openai": "OpenAI" in self.model_name
         }
 
+    def get_backend_status(self) -> dict:
+        """Circuit breaker state per backend"""
+        return {name: breaker.status() for name, breaker in self.breakers.items()}
+
+    def get_prompt_cache_stats(self) -> dict:
+        """Prefix cache reuse and cold model loads per model, where the backend reports them"""
+        return self.prompt_cache.snapshot()
+
+    def warm_prefix(self, prefix: str):
+        """Prefill a shared prompt prefix on the Ollama models so the first real request finds it cached"""
+        for name, llm in ((self.model_name, self.llm), (self.fast_model_name, self.fast_llm)):
+            if llm is None or not name.startswith("Ollama"):
+                continue
+            try:
+                start = time.perf_counter()
+                llm.invoke(prefix, num_predict=1)
+                print(f"✓ Prompt prefix cached on {name} ({time.perf_counter() - start:.1f}s)")
+            except Exception as e:
+                print(f"⚠️  Could not warm prompt prefix on {name}: {e}")
+
 
 if __name__ == "__main__":
     # Test the LLM wrapper
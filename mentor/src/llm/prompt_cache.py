@@ -0,0 +1,110 @@
+"""
+Prompt Cache Reporting
+Reads prompt-processing usage from LLM responses (Ollama's prompt_eval_count
+and load_duration, OpenAI's cached_tokens) and aggregates per-backend prefix
+cache reuse and cold model loads
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.language_models.llms import BaseLLM
+
+# Ollama reports a few milliseconds of load_duration even for a resident model
+COLD_LOAD_MS = 500.0
+
+
+def invoke_with_usage(llm: BaseLanguageModel, prompt: str) -> Tuple[str, dict]:
+    """Call the model and return (text, usage); usage is empty when the backend reports nothing"""
+    if isinstance(llm, BaseLLM):
+        # Completion models (Ollama) only expose response details through generate()
+        generation = llm.generate([prompt]).generations[0][0]
+        return generation.text, _ollama_usage(generation.generation_info or {})
+
+    response = llm.invoke(prompt)
+    # Chat models return a message object, completion models a plain string
+    return getattr(response, "content", response), _openai_usage(getattr(response, "response_metadata", None) or {})
+
+
+def _ollama_usage(info: dict) -> dict:
+    if "prompt_eval_count" not in info and "context" not in info:
+        return {}
+    evaluated = info.get("prompt_eval_count")
+    usage = {
+        "evaluated_prompt_tokens": evaluated,
+        "prompt_eval_ms": info.get("prompt_eval_duration", 0) / 1e6,
+        "load_ms": info.get("load_duration", 0) / 1e6
+    }
+    # The returned context holds the prompt and answer tokens; whatever was not evaluated came from the cache
+    context, generated = info.get("context"), info.get("eval_count")
+    if context is not None and generated is not None and evaluated is not None:
+        prompt_tokens = max(len(context) - generated, evaluated)
+        usage["prompt_tokens"] = prompt_tokens
+        usage["cached_prompt_tokens"] = prompt_tokens - evaluated
+    return usage
+
+
+def _openai_usage(metadata: dict) -> dict:
+    token_usage = metadata.get("token_usage") or {}
+    if "prompt_tokens" not in token_usage:
+        return {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": token_usage["prompt_tokens"],
+        "cached_prompt_tokens": details.get("cached_tokens") or 0
+    }
+
+
+class PromptCacheMetrics:
+    """Per-backend totals of prompt tokens, tokens served from the prefix cache, and cold loads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends: Dict[str, dict] = {}
+
+    def record(self, backend: str, usage: dict):
+        if not usage:
+            return
+        with self._lock:
+            stats = self._backends.setdefault(backend, {
+                "calls": 0, "calls_with_cache_info": 0, "cache_hits": 0,
+                "prompt_tokens": 0, "cached_prompt_tokens": 0,
+                "prompt_eval_ms": 0.0, "cold_loads": 0
+            })
+            stats["calls"] += 1
+            if "cached_prompt_tokens" in usage:
+                stats["calls_with_cache_info"] += 1
+                stats["prompt_tokens"] += usage["prompt_tokens"]
+                stats["cached_prompt_tokens"] += usage["cached_prompt_tokens"]
+                stats["cache_hits"] += 1 if usage["cached_prompt_tokens"] > 0 else 0
+            stats["prompt_eval_ms"] += usage.get("prompt_eval_ms", 0.0)
+            if usage.get("load_ms", 0.0) >= COLD_LOAD_MS:
+                stats["cold_loads"] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: self._summarize(stats) for name, stats in self._backends.items()}
+
+    @staticmethod
+    def _summarize(stats: dict) -> dict:
+        known = stats["calls_with_cache_info"]
+        summary = {
+            "calls": stats["calls"],
+            "cache_hit_rate": round(stats["cache_hits"] / known, 3) if known else None,
+            "cached_token_share": round(stats["cached_prompt_tokens"] / stats["prompt_tokens"], 3)
+            if stats["prompt_tokens"] else None,
+            "prompt_tokens": stats["prompt_tokens"],
+            "cached_prompt_tokens": stats["cached_prompt_tokens"],
+            "cold_loads": stats["cold_loads"]
+        }
+        if stats["prompt_eval_ms"]:
+            summary["avg_prompt_eval_ms"] = round(stats["prompt_eval_ms"] / stats["calls"], 1)
+        return summary
+
+
+def parse_keep_alive(value: Optional[str]):
+    """Ollama keep_alive: a duration string ("30m", "1h") or seconds ("-1" keeps the model loaded)"""
+    if not value:
+        return None
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else value
@@ -0,0 +1,246 @@
+"""
+LLM Resilience
+Per-call deadlines, per-backend circuit breakers, runtime failover and
+optional hedged requests across LLM backends
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.language_models import BaseLanguageModel
+
+from src.llm.prompt_cache import invoke_with_usage
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when every backend for a call failed or is circuit-open"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        latency_slo_seconds: Optional[float] = None,
+        reset_timeout_seconds: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_slo_seconds = latency_slo_seconds
+        self.reset_timeout_seconds = reset_timeout_seconds
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Closed: allow. Open: reject until the reset timeout, then let one half-open probe through."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency_seconds: float):
+        # A response slower than the SLO counts against the backend like a failure
+        if self.latency_slo_seconds and latency_seconds > self.latency_slo_seconds:
+            self.record_failure(reason=f"latency {latency_seconds:.1f}s > SLO {self.latency_slo_seconds:.1f}s")
+            return
+
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"🟢 Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, reason: str = ""):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"🔴 Circuit for {self.name} opened after {self.consecutive_failures} failure(s) {reason}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures}
+
+
+class Backend:
+    """One model on one backend; the breaker is shared by all models on the same backend"""
+
+    def __init__(self, name: str, llm: BaseLanguageModel, breaker: CircuitBreaker, latency_window: int = 200):
+        self.name = name
+        self.llm = llm
+        self.breaker = breaker
+        self.latencies = deque(maxlen=latency_window)
+
+    def p95(self, min_samples: int = 20) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        return float(np.percentile(np.array(self.latencies), 95))
+
+
+class BackendSaturatedError(RuntimeError):
+    """Raised instead of queueing when every worker of a backend is still busy"""
+
+
+class ResilientInvoker:
+    def __init__(
+        self,
+        deadline_seconds: float = 60.0,
+        hedge: bool = False,
+        workers_per_backend: int = 8,
+        attempt_fraction: float = 0.5,
+        usage_recorder: Optional[Callable[[str, dict], None]] = None
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.hedge = hedge
+        # Largest share of the call's deadline one attempt may use while a failover backend remains
+        self.attempt_fraction = attempt_fraction
+        # Receives (backend name, usage) for responses that report prompt usage
+        self.usage_recorder = usage_recorder
+        # One bounded pool per backend, so calls abandoned on a stalled backend cannot starve the others
+        self.workers_per_backend = workers_per_backend
+        self._pools: Dict[str, Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]] = {}
+        self._pools_lock = threading.Lock()
+
+    def invoke(
+        self,
+        backends: List[Backend],
+        prompt: str,
+        deadline_seconds: Optional[float] = None,
+        hedge: Optional[bool] = None
+    ) -> Tuple[str, Backend]:
+        """Try backends in order, skipping open circuits, all within one deadline for the whole call.
+
+        While a later backend remains, an attempt is capped at the backend's
+        latency SLO (or its p95) and at attempt_fraction of the deadline, so a
+        stalled primary leaves budget for failover.
+        """
+        deadline = deadline_seconds or self.deadline_seconds
+        hedge = self.hedge if hedge is None else hedge
+        errors: List[str] = []
+        expires_at = time.monotonic() + deadline
+
+        for i, backend in enumerate(backends):
+            # Each failover attempt only gets what is left of the call's deadline
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                errors.append(f"{backend.name}: not tried, {deadline:.0f}s deadline exceeded")
+                break
+            # Checked lazily so a half-open probe is only claimed when a call is really made
+            if not backend.breaker.allow_request():
+                errors.append(f"{backend.name}: circuit open")
+                continue
+
+            cap = self._attempt_cap(backend, deadline) if i + 1 < len(backends) else deadline
+            budget = min(remaining, cap)
+            hedge_backend = backends[i + 1] if hedge and i + 1 < len(backends) else None
+            try:
+                return self._attempt(backend, prompt, budget, hedge_backend, full_budget=budget >= cap * 0.999)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e or type(e).__name__}")
+                if i + 1 < len(backends):
+                    print(f"⚠️  {backend.name} failed ({e or type(e).__name__}), failing over")
+
+        raise LLMUnavailableError("; ".join(errors))
+
+    def _attempt_cap(self, backend: Backend, deadline: float) -> float:
+        expected = backend.breaker.latency_slo_seconds or backend.p95() or deadline
+        return min(expected, deadline * self.attempt_fraction)
+
+    def _attempt(
+        self,
+        backend: Backend,
+        prompt: str,
+        deadline: float,
+        hedge_backend: Optional[Backend],
+        full_budget: bool = True
+    ) -> Tuple[str, Backend]:
+        start = time.monotonic()
+        futures: Dict[Future, Backend] = {self._submit(backend, prompt, deadline): backend}
+
+        # Hedge: once the primary passes its own p95, race a second request on the next backend
+        hedge_after = backend.p95() if hedge_backend else None
+        if hedge_after is not None and hedge_after < deadline:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done and hedge_backend.breaker.allow_request():
+                print(f"⏱️  {backend.name} past p95 ({hedge_after:.1f}s), hedging on {hedge_backend.name}")
+                futures[self._submit(hedge_backend, prompt, deadline)] = hedge_backend
+
+        pending = set(futures)
+        last_error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - (time.monotonic() - start)
+            done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), futures[future]
+                last_error = future.exception()
+
+        if last_error and not pending:
+            raise last_error
+
+        # Attempt budget passed: count it against every backend still running, unless this attempt
+        # only had the remainder of the call's deadline (that says nothing about the backend)
+        if full_budget:
+            for future in pending:
+                futures[future].breaker.record_failure(reason=f"deadline {deadline:.0f}s exceeded")
+        raise TimeoutError(f"no response within {deadline:.1f}s")
+
+    def _pool(self, backend: Backend) -> Tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+        with self._pools_lock:
+            if backend.name not in self._pools:
+                self._pools[backend.name] = (
+                    ThreadPoolExecutor(max_workers=self.workers_per_backend, thread_name_prefix=f"llm-{backend.name}"),
+                    threading.BoundedSemaphore(self.workers_per_backend)
+                )
+            return self._pools[backend.name]
+
+    def _submit(self, backend: Backend, prompt: str, deadline: float) -> Future:
+        executor, slots = self._pool(backend)
+        # Abandoned calls keep their worker until the backend answers; fail over rather than queue behind them
+        if not slots.acquire(blocking=False):
+            future: Future = Future()
+            future.set_exception(BackendSaturatedError(f"all {self.workers_per_backend} workers busy"))
+            return future
+
+        def call():
+            start = time.monotonic()
+            try:
+                text, usage = invoke_with_usage(backend.llm, prompt)
+            except Exception as e:
+                backend.breaker.record_failure(reason=str(e)[:80])
+                raise
+            finally:
+                slots.release()
+            latency = time.monotonic() - start
+            backend.latencies.append(latency)
+            if latency <= deadline:
+                backend.breaker.record_success(latency)
+            # Late answers were already counted as deadline failures by the caller
+            if self.usage_recorder:
+                self.usage_recorder(backend.name, usage)
+            return text
+
+        return executor.submit(call)
@@ -0,0 +1,128 @@
+"""
+Question Router
+Cheaply classifies each question so easy lookups go to a small fast model
+and synthesis/rubric questions go to the strong model
+"""
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+FAST_ROUTE = "fast"
+STRONG_ROUTE = "strong"
+
+# Matched as whole words; a trailing * also matches any word ending ("analy*" covers "analysis")
+DEFAULT_HARD_KEYWORDS = [
+    "rubric*", "score*", "evaluat*", "assess*", "strateg*", "recommend*", "advice",
+    "should we", "why", "compar*", "trade-off*", "tradeoff*", "prioriti*", "improv*", "risk*",
+    "plan*", "analy*", "opportunit*", "weakness*", "strength*", "overall"
+]
+EASY_QUESTION_RE = re.compile(
+    r"^\s*(when|who|where|which|what (time|date|day)|how (many|much)|what('s| is) (the|our) (date|name|number|email))\b",
+    re.IGNORECASE
+)
+
+
+class RoutingThresholds:
+    """min_top_score and min_score_gap are on the cosine relevance scale (see adaptive.py)"""
+
+    def __init__(
+        self,
+        max_fast_words: int = 14,
+        min_top_score: float = 0.55,
+        min_score_gap: float = 0.08,
+        max_fast_history_turns: int = 3,
+        hard_keywords: Optional[List[str]] = None
+    ):
+        self.max_fast_words = max_fast_words
+        self.min_top_score = min_top_score
+        self.min_score_gap = min_score_gap
+        self.max_fast_history_turns = max_fast_history_turns
+        self.hard_keywords = [k.lower() for k in (hard_keywords or DEFAULT_HARD_KEYWORDS)]
+        self.hard_keyword_re = re.compile(r"\b(?:" + "|".join(
+            re.escape(k[:-1]) + r"\w*" if k.endswith("*") else re.escape(k) + r"\b"
+            for k in sorted(self.hard_keywords, key=len, reverse=True)
+        ) + ")")
+
+    @classmethod
+    def from_env(cls) -> "RoutingThresholds":
+        keywords = [k.strip() for k in os.getenv('ROUTER_HARD_KEYWORDS', '').split(',') if k.strip()]
+        return cls(
+            max_fast_words=int(os.getenv('ROUTER_MAX_FAST_WORDS', 14)),
+            min_top_score=float(os.getenv('ROUTER_MIN_TOP_SCORE', 0.55)),
+            min_score_gap=float(os.getenv('ROUTER_MIN_SCORE_GAP', 0.08)),
+            max_fast_history_turns=int(os.getenv('ROUTER_MAX_FAST_HISTORY', 3)),
+            hard_keywords=keywords or None
+        )
+
+
+class QuestionRouter:
+    def __init__(self, thresholds: Optional[RoutingThresholds] = None):
+        self.thresholds = thresholds or RoutingThresholds.from_env()
+
+    def classify(
+        self,
+        question: str,
+        scores: List[float],
+        history_turns: int = 0,
+        normalized: bool = True
+    ) -> Tuple[str, str]:
+        """Return (route, reason) from question text, retrieval relevance scores and history depth.
+
+        Unnormalized scores (indexes not built in cosine space) are not compared with the thresholds.
+        """
+        t = self.thresholds
+        text = question.lower()
+        words = len(text.split())
+
+        keyword = t.hard_keyword_re.search(text)
+        if keyword:
+            return STRONG_ROUTE, f"hard keyword '{keyword.group(0)}'"
+        if words > t.max_fast_words:
+            return STRONG_ROUTE, f"{words} words > {t.max_fast_words}"
+        if history_turns > t.max_fast_history_turns:
+            return STRONG_ROUTE, f"history depth {history_turns} > {t.max_fast_history_turns}"
+
+        if EASY_QUESTION_RE.match(question):
+            return FAST_ROUTE, "factual lookup pattern"
+
+        # A single clearly-best chunk suggests a lookup; a flat score profile suggests synthesis
+        ranked = sorted(scores, reverse=True) if normalized else []
+        if ranked and ranked[0] >= t.min_top_score:
+            gap = ranked[0] - ranked[1] if len(ranked) > 1 else ranked[0]
+            if gap >= t.min_score_gap:
+                return FAST_ROUTE, f"dominant match (top {ranked[0]:.2f}, gap {gap:.2f})"
+
+        return STRONG_ROUTE, "default"
+
+
+class RouteMetrics:
+    """Thread-safe per-route volume and latency tracking"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._latencies: Dict[str, deque] = {}
+        self.window = window
+
+    def record(self, route: str, latency_seconds: float):
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+            self._latencies.setdefault(route, deque(maxlen=self.window)).append(latency_seconds)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for route, count in self._counts.items():
+                samples = np.array(self._latencies.get(route, []), dtype=float) * 1000.0
+                result[route] = {
+                    "count": count,
+                    "p50_ms": round(float(np.percentile(samples, 50)), 1) if samples.size else None,
+                    "p95_ms": round(float(np.percentile(samples, 95)), 1) if samples.size else None,
+                    "mean_ms": round(float(samples.mean()), 1) if samples.size else None
+                }
+            return result
@@ -0,0 +1,106 @@
+"""
+Compact Chunk Records
+Ingestion-time chunk representation: each chunk is a small slotted record
+holding offsets into its source's text instead of its own copy of the text and
+metadata. Chunk text and metadata are materialized only when a batch is handed
+to the vector store; LangChain Documents are created at the retriever boundary.
+"""
+from typing import Any, Optional
+
+from langchain_core.documents import Document
+
+
+class SourceText:
+    """One loaded (and cleaned) document: the text buffer and the metadata all its chunks share"""
+
+    __slots__ = ("text", "metadata")
+
+    def __init__(self, text: str, metadata: dict):
+        self.text = text
+        self.metadata = metadata
+
+    @classmethod
+    def from_document(cls, doc: Document) -> "SourceText":
+        # References the document's string and dict; nothing is copied
+        return cls(doc.page_content, doc.metadata)
+
+
+class ChunkRecord:
+    """A chunk as text[start:end] of its source, optionally preceded by a header span.
+
+    Oversized email sections are split into pieces that each repeat the
+    message's header block; that block is a second span (head_start, head_end)
+    rather than a copy. Chunks whose text is not a slice of the source (after
+    paragraph-level dedup) keep their own text in `text_override`.
+    """
+
+    __slots__ = ("source", "start", "end", "head_start", "head_end", "index", "section", "text_override", "extra")
+
+    def __init__(
+        self,
+        source: SourceText,
+        start: int,
+        end: int,
+        index: int,
+        section: Optional[str] = None,
+        head_start: int = 0,
+        head_end: int = 0,
+        text_override: Optional[str] = None,
+        extra: Optional[dict] = None
+    ):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.head_start = head_start
+        self.head_end = head_end
+        self.index = index
+        self.section = section
+        self.text_override = text_override
+        self.extra = extra
+
+    @property
+    def page_content(self) -> str:
+        if self.text_override is not None:
+            return self.text_override
+        body = self.source.text[self.start:self.end]
+        if self.head_end > self.head_start:
+            return f"{self.source.text[self.head_start:self.head_end]}\n\n{body}"
+        return body
+
+    @property
+    def metadata(self) -> dict:
+        """A fresh dict: the source's metadata plus this chunk's position (and any extra fields)"""
+        metadata = {**self.source.metadata, "chunk_index": self.index}
+        if self.section is not None:
+            metadata["section"] = self.section
+        if self.extra:
+            metadata.update(self.extra)
+        return metadata
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """One metadata value without building the whole dict"""
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return self.source.metadata.get(key, default)
+
+    def derive(self, text: Optional[str] = None, **extra) -> "ChunkRecord":
+        """A copy with replaced text and/or additional metadata fields"""
+        return ChunkRecord(
+            self.source, self.start, self.end, self.index, self.section,
+            head_start=self.head_start,
+            head_end=self.head_end,
+            text_override=text if text is not None and text != self.page_content else self.text_override,
+            extra={**(self.extra or {}), **extra} or None
+        )
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.page_content, metadata=self.metadata)
+
+
+def strip_span(text: str, start: int, end: int):
+    """Shrink [start, end) to exclude surrounding whitespace, like str.strip() on the slice"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
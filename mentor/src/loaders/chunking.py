@@ -0,0 +1,336 @@
+"""
+Chunking Strategies
+Token-aware, structure-aware splitting of loaded documents into chunks
+"""
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.loaders.chunk_records import ChunkRecord, SourceText, strip_span
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+    print("⚠️  tiktoken not installed. Token counts will be estimated. Install with: pip install tiktoken")
+
+
+# Default overlap (in tokens) per format. Structured formats split on real
+# boundaries, so they need little or no overlap.
+DEFAULT_OVERLAP_TOKENS = {"eml": 0, "md": 0, "txt": 40, "default": 60}
+
+EMAIL_HEADER_RE = re.compile(r"^(From|To|Cc|Subject|Date|Sent):\s*.*$", re.IGNORECASE)
+EMAIL_BOUNDARY_RE = re.compile(
+    r"^(-{2,}\s*(Original Message|Forwarded message)\s*-{2,}|On .+wrote:\s*)$",
+    re.IGNORECASE
+)
+ESTIMATE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+WORD_RE = re.compile(r"\S+")
+# Characters str.splitlines() breaks on
+LINE_BREAKS = "\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+# Chunks without a repeated header block
+NO_HEAD = (0, 0)
+MARKDOWN_HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+# Meeting minutes: "=== SECTION ===", "**Name (Role):**", numbered agenda items, "Topics Discussed:" style labels
+MINUTES_SECTION_RE = re.compile(
+    r"^(={2,}.*={2,}|\*\*[^*]+:\*\*\s*$|\d+\.\s+\S.*|[A-Z][A-Za-z /&-]{2,40}:\s*$|[A-Z][A-Z /&-]{3,}$)"
+)
+
+
+def build_token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """Token counter backed by tiktoken, falling back to a word/punctuation estimate"""
+    if HAS_TIKTOKEN:
+        try:
+            encoding = tiktoken.get_encoding(encoding_name)
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            print(f"⚠️  Could not load tiktoken encoding {encoding_name}: {e}")
+    return lambda text: len(ESTIMATE_TOKEN_RE.findall(text))
+
+
+def _line_spans(text: str) -> List[Tuple[str, int]]:
+    """(line without its line break, offset of the line in text)"""
+    spans, position = [], 0
+    for line in text.splitlines(keepends=True):
+        spans.append((line.rstrip(LINE_BREAKS), position))
+        position += len(line)
+    return spans
+
+
+def _locate(text: str, piece: str, cursor: int, end: int) -> int:
+    """Offset of a splitter piece in text, searching forward from cursor; -1 if it is not a verbatim slice"""
+    index = text.find(piece, cursor, end)
+    return index if index >= 0 else text.find(piece, 0, end)
+
+
+class ChunkingStrategy:
+    """Base interface: split full documents into chunk records and report per-file stats"""
+
+    def __init__(self):
+        self.last_stats: Dict[str, dict] = {}
+
+    def split_documents(self, documents: List[Document]) -> List[ChunkRecord]:
+        raise NotImplementedError
+
+    def _record_stats(self, source: str, chunks: List[ChunkRecord], count_tokens: Callable[[str], int]):
+        tokens = [count_tokens(c.page_content) for c in chunks]
+        self.last_stats[source] = {
+            "chunks": len(chunks),
+            "tokens": sum(tokens),
+            "max_chunk_tokens": max(tokens) if tokens else 0
+        }
+
+    def print_stats(self):
+        total_chunks = sum(s["chunks"] for s in self.last_stats.values())
+        total_tokens = sum(s["tokens"] for s in self.last_stats.values())
+        for source, stats in self.last_stats.items():
+            print(f"  ✂️  {source.split('/')[-1]}: {stats['chunks']} chunks, "
+                  f"{stats['tokens']} tokens (max {stats['max_chunk_tokens']})")
+        print(f"Split into {total_chunks} chunks ({total_tokens} tokens)")
+
+
+class CharacterChunker(ChunkingStrategy):
+    """Original fixed-size character splitter"""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        super().__init__()
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        )
+        self.count_tokens = build_token_counter()
+
+    def split_documents(self, documents: List[Document]) -> List[ChunkRecord]:
+        self.last_stats = {}
+        all_chunks = []
+        for doc in documents:
+            source = SourceText.from_document(doc)
+            chunks, cursor = [], 0
+            for i, piece in enumerate(self.text_splitter.split_text(source.text)):
+                start = _locate(source.text, piece, cursor, len(source.text))
+                if start < 0:
+                    chunks.append(ChunkRecord(source, 0, 0, i, text_override=piece))
+                    continue
+                chunks.append(ChunkRecord(source, start, start + len(piece), i))
+                cursor = start + 1
+            self._record_stats(doc.metadata.get("source", "unknown"), chunks, self.count_tokens)
+            all_chunks.extend(chunks)
+        return all_chunks
+
+
+class StructureAwareChunker(ChunkingStrategy):
+    """Splits on email messages, Markdown headings and meeting-minute sections, sized in tokens.
+
+    Sections and chunks are spans of the document text: packed sections keep
+    the text between them as written, and overlap starts at a word boundary
+    inside the previous section.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 400,
+        overlap_tokens: Optional[Dict[str, int]] = None,
+        encoding_name: str = "cl100k_base"
+    ):
+        super().__init__()
+        self.max_tokens = max_tokens
+        self.overlap_tokens = {**DEFAULT_OVERLAP_TOKENS, **(overlap_tokens or {})}
+        self.count_tokens = build_token_counter(encoding_name)
+        self._fallback_splitters: Dict[Tuple[int, int], RecursiveCharacterTextSplitter] = {}
+
+    def split_documents(self, documents: List[Document]) -> List[ChunkRecord]:
+        self.last_stats = {}
+        all_chunks = []
+        for doc in documents:
+            source = SourceText.from_document(doc)
+            fmt = self._detect_format(doc.metadata.get("source", "unknown"))
+            sections = self._sections(source.text, fmt)
+            packed = self._pack(source.text, sections, self.overlap_tokens.get(fmt, self.overlap_tokens["default"]))
+
+            chunks = [
+                ChunkRecord(source, start, end, i, section=title, head_start=head[0], head_end=head[1], text_override=override)
+                for i, (title, start, end, head, override) in enumerate(packed)
+            ]
+            self._record_stats(doc.metadata.get("source", "unknown"), chunks, self.count_tokens)
+            all_chunks.extend(chunks)
+        return all_chunks
+
+    @staticmethod
+    def _detect_format(source: str) -> str:
+        extension = os.path.splitext(source.lower())[1].lstrip(".")
+        return extension if extension in ("eml", "md", "txt") else "default"
+
+    # ------------------------------------------------------------------
+    # Structure detection: each returns [(section title, start, end)] spans of text
+    # ------------------------------------------------------------------
+
+    def _sections(self, text: str, fmt: str) -> List[Tuple[str, int, int]]:
+        if fmt == "eml":
+            return self._email_sections(text)
+        if fmt == "md":
+            return self._split_on(text, MARKDOWN_HEADING_RE)
+        if fmt == "txt":
+            return self._split_on(text, MINUTES_SECTION_RE)
+
+        sections, start = [], 0
+        for separator in PARAGRAPH_BREAK_RE.finditer(text):
+            sections.append(("", *strip_span(text, start, separator.start())))
+            start = separator.end()
+        sections.append(("", *strip_span(text, start, len(text))))
+        return [section for section in sections if section[2] > section[1]]
+
+    @staticmethod
+    def _split_on(text: str, heading_re: re.Pattern) -> List[Tuple[str, int, int]]:
+        sections, title = [], ""
+        first, last, has_content = None, 0, False
+        for line, position in _line_spans(text):
+            is_heading = heading_re.match(line.strip())
+            if is_heading and has_content:
+                sections.append((title, *strip_span(text, first, last)))
+                first, has_content = None, False
+            if is_heading:
+                title = line.strip().strip("#=* ").rstrip(":")
+            if first is None:
+                first = position
+            last = position + len(line)
+            has_content = has_content or bool(line.strip())
+        if has_content:
+            sections.append((title, *strip_span(text, first, last)))
+        return sections
+
+    @staticmethod
+    def _email_sections(text: str) -> List[Tuple[str, int, int]]:
+        """One section per message; each message keeps its header block with its body"""
+        sections = []
+        first, last, has_content, subject = None, 0, False, None
+        in_headers = True
+        for line, position in _line_spans(text):
+            is_boundary = EMAIL_BOUNDARY_RE.match(line.strip())
+            is_header = EMAIL_HEADER_RE.match(line)
+            starts_headers = is_header and not in_headers and line.lower().startswith("from:")
+            if (is_boundary or starts_headers) and has_content:
+                sections.append((subject or "", *strip_span(text, first, last)))
+                first, has_content, subject = None, False, None
+                in_headers = True
+            if in_headers and line.strip() and not is_header and not is_boundary:
+                in_headers = False
+            if subject is None and is_header and line.lower().startswith("subject:"):
+                subject = line.split(":", 1)[1].strip()
+            if first is None:
+                first = position
+            last = position + len(line)
+            has_content = has_content or bool(line.strip())
+        if has_content:
+            sections.append((subject or "", *strip_span(text, first, last)))
+        return sections
+
+    # ------------------------------------------------------------------
+    # Packing: returns [(title, start, end, (head_start, head_end), text override)]
+    # ------------------------------------------------------------------
+
+    def _pack(self, text: str, sections: List[Tuple[str, int, int]], overlap: int) -> list:
+        """Greedily merge whole sections up to max_tokens; only oversized sections are split further"""
+        chunks = []
+        current_title, current_start, current_end, current_tokens = "", None, 0, 0
+        last_section = None
+
+        def flush():
+            if current_start is not None:
+                chunks.append((current_title, current_start, current_end, NO_HEAD, None))
+
+        for title, start, end in sections:
+            tokens = self.count_tokens(text[start:end])
+            if tokens > self.max_tokens:
+                flush()
+                current_title, current_start, current_tokens, last_section = "", None, 0, None
+                for piece_start, piece_end, head, override in self._split_oversized(text, start, end, overlap):
+                    chunks.append((title, piece_start, piece_end, head, override))
+                continue
+
+            if current_start is not None and current_tokens + tokens > self.max_tokens:
+                flush()
+                tail_start = self._tail_start(text, *last_section, overlap)
+                current_title = title
+                current_start = tail_start
+                current_tokens = self.count_tokens(text[tail_start:last_section[1]]) if tail_start is not None else 0
+
+            if current_start is None:
+                current_title, current_start = title, start
+            current_end = end
+            current_tokens += tokens
+            last_section = (start, end)
+
+        flush()
+        return chunks
+
+    def _split_oversized(self, text: str, start: int, end: int, overlap: int) -> list:
+        """Token-sized recursive split; email continuations keep the header block for context"""
+        header_end = start
+        for line, position in _line_spans(text[start:end]):
+            if not EMAIL_HEADER_RE.match(line):
+                break
+            header_end = start + position + len(line)
+        head = (start, header_end) if header_end > start else NO_HEAD
+        body_start, body_end = strip_span(text, header_end, end) if head != NO_HEAD else (start, end)
+        budget = self.max_tokens - (self.count_tokens(text[start:header_end]) if head != NO_HEAD else 0)
+
+        splitter = self._fallback_splitters.get((budget, overlap))
+        if splitter is None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=max(budget, 50),
+                chunk_overlap=min(overlap, max(budget, 50) // 2),
+                length_function=self.count_tokens,
+                separators=["\n\n", "\n", ". ", " ", ""]
+            )
+            self._fallback_splitters[(budget, overlap)] = splitter
+
+        pieces, cursor = [], body_start
+        for piece in splitter.split_text(text[body_start:body_end]):
+            piece_start = _locate(text, piece, cursor, body_end)
+            if piece_start < 0:
+                override = f"{text[head[0]:head[1]]}\n\n{piece}" if head != NO_HEAD else piece
+                pieces.append((0, 0, NO_HEAD, override))
+                continue
+            pieces.append((piece_start, piece_start + len(piece), head, None))
+            cursor = piece_start + 1
+        return pieces
+
+    def _tail_start(self, text: str, start: int, end: int, overlap: int) -> Optional[int]:
+        """Offset where the last ~overlap tokens of text[start:end] begin, on a word boundary"""
+        if overlap <= 0:
+            return None
+        word_starts = [match.start() for match in WORD_RE.finditer(text, start, end)]
+        tail_start = None
+        while word_starts and (tail_start is None or self.count_tokens(text[tail_start:end]) < overlap):
+            tail_start = word_starts.pop()
+        return tail_start
+
+
+def create_chunker(strategy: Optional[str] = None) -> ChunkingStrategy:
+    """Build the chunker selected by CHUNK_STRATEGY (structure | character)"""
+    strategy = (strategy or os.getenv('CHUNK_STRATEGY', 'structure')).lower()
+
+    if strategy == "character":
+        return CharacterChunker(
+            chunk_size=int(os.getenv('CHUNK_SIZE_CHARS', 1000)),
+            chunk_overlap=int(os.getenv('CHUNK_OVERLAP_CHARS', 200))
+        )
+
+    # CHUNK_OVERLAP_TOKENS format: "eml=0,md=0,txt=40,default=60"
+    overlap = {}
+    for pair in os.getenv('CHUNK_OVERLAP_TOKENS', '').split(','):
+        if '=' in pair:
+            fmt, value = pair.split('=', 1)
+            overlap[fmt.strip()] = int(value)
+
+    return StructureAwareChunker(
+        max_tokens=int(os.getenv('CHUNK_MAX_TOKENS', 400)),
+        overlap_tokens=overlap
+    )
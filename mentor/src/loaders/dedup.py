@@ -0,0 +1,269 @@
+"""
+Redundancy Elimination
+Strips quoted reply chains and signatures from email bodies before chunking,
+then drops exact and near-duplicate chunks across the corpus (64-bit SimHash
+with banded lookup) so repeated text is embedded and retrieved only once
+"""
+import hashlib
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.loaders.chunk_records import ChunkRecord
+from src.loaders.chunking import EMAIL_HEADER_RE, build_token_counter
+
+
+# Everything from one of these lines on is the quoted previous message
+REPLY_BOUNDARY_RE = re.compile(
+    r"^(On .{4,200}wrote:|-{2,}\s*Original Message\s*-{2,}|_{10,})\s*$",
+    re.IGNORECASE
+)
+OUTLOOK_QUOTE_RE = re.compile(r"^From:\s.+$", re.IGNORECASE)
+# "Sent:" rather than "Date:" tells an Outlook quote apart from the next message of a thread export
+OUTLOOK_QUOTE_NEXT_RE = re.compile(r"^Sent:\s.+$", re.IGNORECASE)
+QUOTED_LINE_RE = re.compile(r"^\s*>")
+RFC822_HEADER_RE = re.compile(r"^[A-Za-z][A-Za-z0-9-]*:\s")
+SIGNATURE_DELIMITER_RE = re.compile(r"^--\s?$")
+MOBILE_SIGNATURE_RE = re.compile(r"^(Sent from my .+|Get Outlook for .+|Sent via .+)$", re.IGNORECASE)
+SIGN_OFF_RE = re.compile(
+    r"^(best|best regards|regards|kind regards|warm regards|thanks|thank you|many thanks|cheers|sincerely|talk soon|-\s*\w+)[,!.]?$",
+    re.IGNORECASE
+)
+SHINGLE_WORD_RE = re.compile(r"\w+")
+
+HASH_BITS = 64
+# Signatures are only looked for this close to the end of the message
+SIGNATURE_MAX_TRAILING_LINES = 12
+SIGN_OFF_MAX_TRAILING_LINES = 6
+
+
+def _header_end(lines: List[str]) -> int:
+    """Index of the first body line: a leading header block ends at the first blank line"""
+    if not lines or not RFC822_HEADER_RE.match(lines[0]):
+        return 0
+    for i, line in enumerate(lines):
+        if not line.strip():
+            return i + 1
+        if not (RFC822_HEADER_RE.match(line) or line[:1] in (" ", "\t")):
+            return i
+    return len(lines)
+
+
+def _is_email(doc: Document) -> bool:
+    return doc.metadata.get("doc_type") == "email" or doc.metadata.get("source", "").lower().endswith(".eml")
+
+
+def strip_quoted_reply(text: str) -> str:
+    """Drop '>' quoted lines and everything after the first reply boundary in the body.
+
+    Only reply quoting is removed; forwarded messages are the payload of the
+    email and are left for chunk deduplication to handle.
+    """
+    lines = text.splitlines()
+    body_start = _header_end(lines)
+    kept = lines[:body_start]
+    for i in range(body_start, len(lines)):
+        line, stripped = lines[i], lines[i].strip()
+        if REPLY_BOUNDARY_RE.match(stripped):
+            break
+        # Outlook quotes the previous message as a bare "From: ... / Sent: ..." block
+        if OUTLOOK_QUOTE_RE.match(stripped) and i + 1 < len(lines) and OUTLOOK_QUOTE_NEXT_RE.match(lines[i + 1].strip()):
+            break
+        if QUOTED_LINE_RE.match(line):
+            continue
+        kept.append(line)
+    return "\n".join(kept).rstrip()
+
+
+def strip_signature(text: str) -> str:
+    """Cut a trailing signature: the '-- ' delimiter, a mobile footer, or a sign-off near the end"""
+    lines = text.rstrip().splitlines()
+    body_start = _header_end(lines)
+
+    for i in range(len(lines) - 1, max(body_start, len(lines) - SIGNATURE_MAX_TRAILING_LINES - 1), -1):
+        stripped = lines[i].strip()
+        if SIGNATURE_DELIMITER_RE.match(lines[i].rstrip()) or MOBILE_SIGNATURE_RE.match(stripped):
+            return "\n".join(lines[:i]).rstrip()
+
+    for i in range(max(body_start + 1, len(lines) - SIGN_OFF_MAX_TRAILING_LINES), len(lines)):
+        if SIGN_OFF_RE.match(lines[i].strip()):
+            # Keep the sign-off word itself; drop the name/title/phone block below it
+            return "\n".join(lines[:i + 1]).rstrip()
+    return text.rstrip()
+
+
+def _normalize(text: str) -> str:
+    """Content used for duplicate detection: no header lines, quote markers or spacing differences"""
+    body = [
+        QUOTED_LINE_RE.sub("", line) for line in text.splitlines()
+        if not EMAIL_HEADER_RE.match(line)
+    ]
+    return " ".join(" ".join(body).lower().split())
+
+
+def simhash(text: str, shingle_size: int = 3) -> Tuple[int, int]:
+    """64-bit SimHash over word shingles; also returns the shingle count"""
+    words = SHINGLE_WORD_RE.findall(text)
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * HASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return fingerprint, len(shingles) if words else 0
+
+
+class ChunkDeduplicator:
+    """Email body cleanup before chunking and near-duplicate chunk removal after it"""
+
+    def __init__(
+        self,
+        strip_quotes: bool = True,
+        strip_signatures: bool = True,
+        max_distance: int = 3,
+        min_shingles: int = 8,
+        min_paragraph_words: int = 12,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.strip_quotes = strip_quotes
+        self.strip_signatures = strip_signatures
+        self.max_distance = max_distance
+        self.min_shingles = min_shingles
+        self.min_paragraph_words = min_paragraph_words
+        self.count_tokens = count_tokens or build_token_counter()
+        # Pigeonhole: fingerprints within max_distance bits agree exactly on at least one of max_distance + 1 bands
+        self.bands = max_distance + 1
+        self.last_stats: Dict[str, int] = {}
+
+    def clean_documents(self, documents: List[Document]) -> List[Document]:
+        """Copies of the documents with quoted replies and signatures removed from emails"""
+        stripped_tokens = 0
+        cleaned = []
+        for doc in documents:
+            text = doc.page_content
+            if _is_email(doc):
+                if self.strip_quotes:
+                    text = strip_quoted_reply(text)
+                if self.strip_signatures:
+                    text = strip_signature(text)
+                if text != doc.page_content:
+                    stripped_tokens += self.count_tokens(doc.page_content) - self.count_tokens(text)
+            cleaned.append(Document(page_content=text, metadata=dict(doc.metadata)) if text != doc.page_content else doc)
+
+        self.last_stats = {"stripped_tokens": stripped_tokens}
+        return cleaned
+
+    def dedupe_chunks(self, chunks: List[ChunkRecord]) -> List[ChunkRecord]:
+        """Keep the earliest copy of repeated text.
+
+        Chunks are visited oldest first (by the timestamp metadata) so the
+        original message wins over the replies and forwards that repeat it.
+        Whole chunks are dropped when they match a kept chunk exactly or within
+        max_distance SimHash bits; repeated paragraphs are cut out of chunks
+        that also say something new (e.g. a forward with a note on top).
+        """
+        order = sorted(range(len(chunks)), key=lambda i: (chunks[i].get("timestamp", float("inf")), i))
+        exact: Dict[str, int] = {}
+        paragraphs: Dict[str, int] = {}
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        fingerprints: Dict[int, int] = {}
+        duplicates_of: Dict[int, int] = {}
+        rewritten: Dict[int, str] = {}
+
+        band_bits = HASH_BITS // self.bands
+        for i in order:
+            normalized = _normalize(chunks[i].page_content)
+            digest = hashlib.sha1(normalized.encode()).hexdigest()
+            if digest in exact:
+                duplicates_of[i] = exact[digest]
+                continue
+
+            text, owners, new_paragraphs = self._drop_seen_paragraphs(chunks[i].page_content, paragraphs)
+            if owners:
+                normalized = _normalize(text)
+                if len(SHINGLE_WORD_RE.findall(normalized)) < self.min_shingles:
+                    duplicates_of[i] = owners[0]  # nothing new beyond headers and a line or two
+                    continue
+                rewritten[i] = text
+
+            fingerprint, shingles = simhash(normalized)
+            keys = [(band, fingerprint >> (band * band_bits) & ((1 << band_bits) - 1)) for band in range(self.bands)]
+            # Too-short chunks only take part in exact matching
+            if shingles >= self.min_shingles:
+                match = next((
+                    kept for key in keys for kept in buckets.get(key, [])
+                    if bin(fingerprint ^ fingerprints[kept]).count("1") <= self.max_distance
+                ), None)
+                if match is not None:
+                    duplicates_of[i] = match
+                    continue
+                fingerprints[i] = fingerprint
+                for key in keys:
+                    buckets.setdefault(key, []).append(i)
+
+            exact[digest] = i
+            for paragraph_digest in new_paragraphs:
+                paragraphs.setdefault(paragraph_digest, i)
+
+        kept_counts: Dict[int, int] = {}
+        for original in duplicates_of.values():
+            kept_counts[original] = kept_counts.get(original, 0) + 1
+
+        result = []
+        tokens_removed = 0
+        for i, chunk in enumerate(chunks):
+            if i in duplicates_of:
+                tokens_removed += self.count_tokens(chunk.page_content)
+                continue
+            if i in rewritten:
+                tokens_removed += self.count_tokens(chunk.page_content) - self.count_tokens(rewritten[i])
+                chunk = chunk.derive(text=rewritten[i])
+            if i in kept_counts:
+                chunk = chunk.derive(duplicates=kept_counts[i])
+            result.append(chunk)
+
+        self.last_stats.update({
+            "chunks_in": len(chunks),
+            "chunks_removed": len(duplicates_of),
+            "chunks_trimmed": len(rewritten),
+            "tokens_removed": tokens_removed
+        })
+        return result
+
+    def _drop_seen_paragraphs(self, text: str, seen: Dict[str, int]) -> Tuple[str, List[int], List[str]]:
+        """Remove paragraphs already kept elsewhere; returns (text, owning chunks, new paragraph digests)"""
+        kept, owners, new = [], [], []
+        for paragraph in re.split(r"\n\s*\n", text):
+            normalized = _normalize(paragraph)
+            if len(SHINGLE_WORD_RE.findall(normalized)) < self.min_paragraph_words:
+                kept.append(paragraph)
+                continue
+            digest = hashlib.sha1(normalized.encode()).hexdigest()
+            if digest in seen:
+                owners.append(seen[digest])
+            else:
+                kept.append(paragraph)
+                new.append(digest)
+        return "\n\n".join(kept), owners, new
+
+    def print_stats(self):
+        stats = self.last_stats
+        if not stats:
+            return
+        print(f"🧹 Deduplication: stripped {stats.get('stripped_tokens', 0)} tokens of quoted replies/signatures, "
+              f"dropped {stats.get('chunks_removed', 0)}/{stats.get('chunks_in', 0)} duplicate chunks and "
+              f"trimmed {stats.get('chunks_trimmed', 0)} ({stats.get('tokens_removed', 0)} tokens)")
+
+
+def create_deduplicator() -> Optional[ChunkDeduplicator]:
+    """Build the deduplicator configured by DEDUP_* (None when DEDUP_ENABLED=false)"""
+    if os.getenv('DEDUP_ENABLED', 'true').lower() != 'true':
+        return None
+    return ChunkDeduplicator(
+        strip_quotes=os.getenv('DEDUP_STRIP_QUOTES', 'true').lower() == 'true',
+        strip_signatures=os.getenv('DEDUP_STRIP_SIGNATURES', 'true').lower() == 'true',
+        max_distance=int(os.getenv('DEDUP_MAX_DISTANCE', 3))
+    )
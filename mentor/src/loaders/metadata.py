@@ -0,0 +1,146 @@
+"""
+Document Metadata Extraction
+Derives document type, participants, timestamps and thread IDs from file
+names, .eml headers and meeting-minute headers so retrieval can pre-filter
+"""
+import json
+import os
+import re
+from datetime import datetime, timezone
+from email import policy
+from email.parser import Parser
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import List, Optional
+
+from src.rubrics.records import normalize_subject
+
+
+DOC_TYPES = ("email", "calendar", "meeting", "slack", "document")
+
+# "sync" only as its own word in a file name (weekly_sync.md, not async_notes.md)
+FILENAME_TYPE_HINTS = [
+    ("slack", re.compile(r"slack", re.IGNORECASE)),
+    ("calendar", re.compile(r"calendar|\bcal\b|schedule|\.ics$", re.IGNORECASE)),
+    ("meeting", re.compile(r"meeting|minutes|standup|stand-up|all[_ -]?hands|retro|(?<![a-z])sync(?![a-z])|1on1|one[_-]on[_-]one", re.IGNORECASE)),
+    ("email", re.compile(r"\.eml$|email|mail", re.IGNORECASE))
+]
+PARTICIPANTS_RE = re.compile(r"^\s*\**(attendees|participants|present)\**\s*:\s*\**(.+)$", re.IGNORECASE | re.MULTILINE)
+DATE_PATTERNS = [
+    (re.compile(r"\b(\d{4}-\d{2}-\d{2})\b"), "%Y-%m-%d"),
+    (re.compile(r"\b((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? \d{1,2}, \d{4})\b"), None)
+]
+EMAIL_HEADER_START_RE = re.compile(r"^(From|To|Subject|Date):", re.IGNORECASE)
+
+
+def _epoch(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _parse_date(text: str) -> Optional[datetime]:
+    """First recognizable date (ISO or 'October 18, 2024') in the text"""
+    for pattern, fmt in DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        value = match.group(1).replace(".", "")
+        formats = [fmt] if fmt else ["%B %d, %Y", "%b %d, %Y"]
+        for candidate in formats:
+            try:
+                return datetime.strptime(value, candidate).replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+    return None
+
+
+def _doc_type_from_name(source: str) -> Optional[str]:
+    name = os.path.basename(source)
+    return next((doc_type for doc_type, pattern in FILENAME_TYPE_HINTS if pattern.search(name)), None)
+
+
+def _join(values: List[str]) -> str:
+    # Chroma metadata values must be scalars, so lists are stored comma-separated
+    return ", ".join(dict.fromkeys(v for v in values if v))
+
+
+def extract_metadata(source: str, text: str) -> dict:
+    """Structured metadata for one full document; keys with no value are omitted"""
+    lowered = source.lower()
+    if lowered.endswith(".eml") or (text and EMAIL_HEADER_START_RE.match(text.lstrip())):
+        metadata = _email_metadata(text)
+    elif lowered.endswith(".json"):
+        metadata = _export_metadata(text)
+    else:
+        metadata = _text_metadata(source, text)
+
+    metadata.setdefault("doc_type", _doc_type_from_name(source) or "document")
+    return {key: value for key, value in metadata.items() if value not in (None, "")}
+
+
+def _email_metadata(text: str) -> dict:
+    msg = Parser(policy=policy.default).parsestr(text or "", headersonly=True)
+    subject = str(msg.get("Subject", "") or "")
+    references = str(msg.get("References", "") or "").split()
+    in_reply_to = str(msg.get("In-Reply-To", "") or "").strip()
+
+    senders = getaddresses([str(msg.get("From", "") or "")])
+    sender_name, sender = (senders[0][0], senders[0][1].lower()) if senders else ("", "")
+    recipients = getaddresses([str(msg.get(h, "") or "") for h in ("To", "Cc")])
+
+    metadata = {
+        "doc_type": "email",
+        "subject": subject,
+        "sender": sender,
+        "sender_name": sender_name.lower(),
+        "sender_domain": sender.rsplit("@", 1)[-1] if "@" in sender else "",
+        "participants": _join([sender] + [address.lower() for _, address in recipients]),
+        "thread_id": (references[0] if references else in_reply_to) or normalize_subject(subject)
+    }
+    if msg.get("Date"):
+        try:
+            sent = parsedate_to_datetime(str(msg["Date"]))
+            metadata["timestamp"] = _epoch(sent)
+            metadata["date"] = sent.date().isoformat()
+        except (TypeError, ValueError):
+            pass
+    return metadata
+
+
+def _export_metadata(text: str) -> dict:
+    """JSON exports: typed by which record collections they contain"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    present = [
+        doc_type for key, doc_type in
+        (("emails", "email"), ("calendar_entries", "calendar"), ("slack_messages", "slack"))
+        if data.get(key)
+    ]
+    return {"doc_type": present[0]} if len(present) == 1 else {}
+
+
+def _text_metadata(source: str, text: str) -> dict:
+    """Meeting minutes and notes: attendees and the meeting date from the header or filename"""
+    metadata = {}
+    head = "\n".join((text or "").splitlines()[:15])
+
+    participants = PARTICIPANTS_RE.search(head)
+    if participants:
+        names = re.split(r",|;|\band\b", participants.group(2))
+        metadata["participants"] = _join([re.sub(r"\s*\(.*?\)", "", n).strip(" *").lower() for n in names])
+        metadata["doc_type"] = "meeting"
+
+    held = _parse_date(head) or _parse_date(os.path.basename(source))
+    if held:
+        metadata["timestamp"] = _epoch(held)
+        metadata["date"] = held.date().isoformat()
+
+    hinted = _doc_type_from_name(source)
+    if hinted and hinted != "email":
+        metadata["doc_type"] = hinted
+    return metadata
@@ -4,10 +4,15 @@ Loads documents from S3 bucket and extracts text
 """
 import os
 import io
+import hashlib
 import boto3
-from typing import List
+from typing import List, Optional
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.loaders.chunk_records import ChunkRecord
+from src.loaders.chunking import ChunkingStrategy, create_chunker
+from src.loaders.dedup import ChunkDeduplicator, create_deduplicator
+from src.loaders.metadata import extract_metadata
 
 try:
     from docx import Document as DocxDocument
@@ -16,6 +21,9 @@ except ImportError:
     HAS_DOCX = False
     print("⚠️  python-docx not installed. Install with: pip install python-docx")
 
+# Formats read as UTF-8 text. .eml and .json are also parsed into rubric records.
+TEXT_EXTENSIONS = ('.txt', '.md', '.eml', '.json')
+
 
 class S3DocumentLoader:
     def __init__(
@@ -24,7 +32,10 @@ class S3DocumentLoader:
         prefix: str = "",
         aws_access_key_id: str = None,
         aws_secret_access_key: str = None,
-        region_name: str = "us-east-1"
+        region_name: str = "us-east-1",
+        chunker: ChunkingStrategy = None,
+        endpoint_url: str = None,
+        deduplicator: Optional[ChunkDeduplicator] = None
     ):
         self.bucket_name = bucket_name
         self.prefix = prefix
@@ -34,16 +45,15 @@ class S3DocumentLoader:
             's3',
             aws_access_key_id=aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=region_name or os.getenv('AWS_REGION', 'us-east-1')
+            region_name=region_name or os.getenv('AWS_REGION', 'us-east-1'),
+            endpoint_url=endpoint_url or os.getenv('S3_ENDPOINT_URL') or None
         )
 
-        # Text splitter for chunking
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        # Chunking strategy (structure- and token-aware by default, see CHUNK_STRATEGY)
+        self.chunker = chunker or create_chunker()
+
+        # Quoted-reply/signature stripping and near-duplicate removal (see DEDUP_*)
+        self.deduplicator = deduplicator if deduplicator is not None else create_deduplicator()
 
     def _extract_text_from_docx(self, file_content: bytes) -> str:
         """Extract text from a .docx file"""
@@ -81,27 +91,10 @@ class S3DocumentLoader:
         for i, key in enumerate(files, 1):
             try:
                 print(f"  [{i}/{len(files)}] Loading {key.split('/')[-1]}...")
-
-                # Download file from S3
-                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
-                file_content = response['Body'].read()
-
-                # Extract text based on file type
-                if key.endswith('.docx'):
-                    text = self._extract_text_from_docx(file_content)
-                elif key.endswith('.txt'):
-                    text = file_content.decode('utf-8')
-                else:
-                    print(f"  ⚠️  Unsupported file type: {key}")
-                    continue
-
-                if text:
-                    doc = Document(
-                        page_content=text,
-                        metadata={"source": key}
-                    )
+                doc = self.load_document(key)
+                if doc:
                     documents.append(doc)
-                    print(f"  ✓ Loaded {len(text)} characters")
+                    print(f"  ✓ Loaded {len(doc.page_content)} characters")
 
             except Exception as e:
                 print(f"  ❌ Error loading {key}: {e}")
@@ -110,37 +103,91 @@ class S3DocumentLoader:
         print(f"✓ Successfully loaded {len(documents)} documents from S3")
         return documents
 
-    def load_and_split(self) -> List[Document]:
+    def load_document(self, key: str) -> Optional[Document]:
+        """Download one object and extract its text; None for unsupported or empty files"""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        file_content = response['Body'].read()
+
+        # Extract text based on file type
+        if key.endswith('.docx'):
+            text = self._extract_text_from_docx(file_content)
+        elif key.endswith(TEXT_EXTENSIONS):
+            text = file_content.decode('utf-8')
+        else:
+            print(f"  ⚠️  Unsupported file type: {key}")
+            return None
+
+        if not text:
+            return None
+        # Type, participants, timestamp and thread ID are inherited by every chunk
+        return Document(
+            page_content=text,
+            metadata={"source": key, **extract_metadata(key, text)}
+        )
+
+    def load_and_split(self) -> List[ChunkRecord]:
         """Load documents and split into chunks"""
         documents = self.load_documents()
 
         if not documents:
             return []
 
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(documents)
-        print(f"Split into {len(chunks)} chunks")
+        return self.split_documents(documents)
 
-        return chunks
+    def split_documents(self, documents: List[Document]) -> List[ChunkRecord]:
+        """Split already-loaded documents into chunks.
 
-    def list_documents(self) -> List[str]:
-        """List all document keys in the S3 bucket"""
-        try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
+        Rubric records are extracted from the full documents before this, so
+        stripping quoted replies here only affects what gets embedded. Chunks
+        are compact records pointing into the (cleaned) document text; the
+        vector store turns them into text and metadata batch by batch.
+        """
+        if self.deduplicator:
+            documents = self.deduplicator.clean_documents(documents)
 
-            if 'Contents' not in response:
-                return []
+        chunks = self.chunker.split_documents(documents)
+        self.chunker.print_stats()
 
-            keys = [obj['Key'] for obj in response['Contents']]
-            print(f"Found {len(keys)} files in S3")
-            return keys
+        if self.deduplicator:
+            chunks = self.deduplicator.dedupe_chunks(chunks)
+            self.deduplicator.print_stats()
 
-        except Exception as e:
-            print(f"Error listing S3 objects: {e}")
-            return []
+        return chunks
+
+    def list_documents(self) -> List[str]:
+        """List all document keys in the S3 bucket"""
+        keys = [obj['key'] for obj in self.list_document_objects()]
+        print(f"Found {len(keys)} files in S3")
+        return keys
+
+    def list_document_objects(self) -> List[dict]:
+        """List key, ETag and size of every object under the prefix (paginated).
+
+        Listing errors are raised rather than reported as an empty prefix, so a
+        transient failure never looks like a user whose documents were all deleted.
+        """
+        objects = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith('/'):
+                    continue
+                objects.append({"key": obj['Key'], "etag": obj.get('ETag', ''), "size": obj.get('Size', 0)})
+        return objects
+
+    def list_prefixes(self) -> List[str]:
+        """List the "folders" directly under the prefix (e.g. user/<id>/), paginated"""
+        prefixes = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix, Delimiter='/'):
+            prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+        return prefixes
+
+    def fingerprint(self, objects: Optional[List[dict]] = None) -> str:
+        """Hash of the keys and ETags under the prefix (or of an existing listing); changes whenever a document changes"""
+        objects = sorted(self.list_document_objects() if objects is None else objects, key=lambda o: o["key"])
+        listing = "\n".join(f"{o['key']}:{o['etag']}" for o in objects)
+        return hashlib.sha256(listing.encode('utf-8')).hexdigest()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,306 @@
+"""
+Request Profiling
+Opt-in per-request CPU profiles (cProfile) and allocation snapshots
+(tracemalloc), automatic stack-sample capture of slow requests, and a
+bounded on-disk ring of the results
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+PROFILE_FILES = ("meta.json", "cpu.prof", "cpu.txt", "alloc.txt", "stacks.folded", "stacks.txt")
+
+
+class ProfileStore:
+    """Ring of profile directories; the oldest are deleted beyond max_entries"""
+
+    def __init__(self, root: str = "./profiles", max_entries: int = 50):
+        self.root = root
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        # Millisecond prefix keeps directory names in capture order
+        return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profile_id: str, meta: dict, files: Dict[str, bytes]):
+        directory = os.path.join(self.root, profile_id)
+        os.makedirs(directory, exist_ok=True)
+        for name, content in files.items():
+            with open(os.path.join(directory, name), "wb") as f:
+                f.write(content)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({**meta, "id": profile_id, "files": sorted(files)}, f)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            entries = sorted(e for e in os.listdir(self.root) if PROFILE_ID_RE.match(e))
+            for stale in entries[:max(0, len(entries) - self.max_entries)]:
+                shutil.rmtree(os.path.join(self.root, stale), ignore_errors=True)
+
+    def list(self) -> List[dict]:
+        """Metadata of stored profiles, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        profiles = []
+        for entry in sorted(os.listdir(self.root), reverse=True):
+            meta_path = os.path.join(self.root, entry, "meta.json")
+            if PROFILE_ID_RE.match(entry) and os.path.exists(meta_path):
+                try:
+                    with open(meta_path) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return profiles
+
+    def path(self, profile_id: str, name: str) -> Optional[str]:
+        """Path of one stored file, or None (ids and names are validated against traversal)"""
+        if not PROFILE_ID_RE.match(profile_id) or name not in PROFILE_FILES:
+            return None
+        path = os.path.join(self.root, profile_id, name)
+        return path if os.path.exists(path) else None
+
+
+class StackSampler:
+    """One background thread sampling the stacks of registered threads at a fixed interval.
+
+    Sampling costs one frame walk per registered thread per tick, so it can stay
+    armed for every request and the result is kept only when a request is slow.
+    """
+
+    def __init__(self, interval_seconds: float = 0.01, max_depth: int = 64):
+        self.interval_seconds = interval_seconds
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._targets: Dict[str, tuple] = {}  # token -> (thread id, Counter of folded stacks)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: int) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._targets[token] = (thread_id, Counter())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        return token
+
+    def stop(self, token: str) -> Counter:
+        with self._lock:
+            _, stacks = self._targets.pop(token, (None, Counter()))
+        return stacks
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_seconds)
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = list(self._targets.values())
+            frames = sys._current_frames()
+            for thread_id, stacks in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[self._fold(frame)] += 1
+
+    def _fold(self, frame) -> str:
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+
+def format_stacks(stacks: Counter, interval_seconds: float, top: int = 30) -> str:
+    """Self and inclusive time per frame from folded stack samples"""
+    total = sum(stacks.values())
+    if not total:
+        return "No samples captured\n"
+
+    self_time, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_time[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+
+    lines = [f"{total} stack samples, one every {interval_seconds * 1000:.0f} ms", ""]
+    for title, counter in (("SELF", self_time), ("INCLUSIVE", inclusive)):
+        lines.append(f"{title:<10}{'samples':>8}{'share':>8}  frame")
+        for frame, count in counter.most_common(top):
+            lines.append(f"{'':<10}{count:>8}{count / total:>8.1%}  {frame}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: full profiles on demand or by sampling, stack samples kept for slow requests.
+
+    When nothing is configured the only per-request cost is a path check.
+    Endpoints run their synchronous work on the event loop thread, which is the
+    thread profiled; work a streaming response does in the threadpool is not.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        paths: List[str],
+        sample_rate: float = 0.0,
+        slow_ms: float = 0.0,
+        admin_token: Optional[str] = None,
+        sample_interval_ms: float = 10.0,
+        trace_allocations: bool = True
+    ):
+        self.app = app
+        self.store = store
+        self.paths = set(paths)
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.admin_token = admin_token
+        self.trace_allocations = trace_allocations
+        self.sampler = StackSampler(interval_seconds=sample_interval_ms / 1000.0) if slow_ms > 0 else None
+        # cProfile and tracemalloc are process-wide enough that one full profile at a time is the safe limit
+        self._full_profile_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sample_rate > 0 or self.sampler or self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or not self.enabled:
+            return await self.app(scope, receive, send)
+
+        if self._wants_full_profile(scope) and self._full_profile_lock.acquire(blocking=False):
+            try:
+                return await self._full_profile(scope, receive, send)
+            finally:
+                self._full_profile_lock.release()
+
+        if self.sampler:
+            return await self._sampled(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    def _wants_full_profile(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if not self.admin_token:
+            return False
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        return headers.get("x-profile") in ("1", "true") and headers.get("x-admin-token") == self.admin_token
+
+    async def _full_profile(self, scope, receive, send):
+        profile_id = self.store.new_id()
+        status = {"code": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        started_tracing = self.trace_allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            after = tracemalloc.take_snapshot() if before is not None else None
+            peak = tracemalloc.get_traced_memory()[1] if before is not None else None
+            if started_tracing:
+                tracemalloc.stop()
+
+            files = {"cpu.prof": self._dump_stats(profiler), "cpu.txt": self._format_stats(profiler).encode()}
+            if after is not None:
+                files["alloc.txt"] = self._format_allocations(before, after, peak).encode()
+            self._save(profile_id, scope, "full", elapsed_ms, status["code"], files)
+
+    async def _sampled(self, scope, receive, send):
+        status = {"code": None}
+
+        async def capture_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = self.sampler.start(threading.get_ident())
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture_status)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stacks = self.sampler.stop(token)
+            if elapsed_ms >= self.slow_ms:
+                folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+                files = {
+                    "stacks.folded": folded.encode(),
+                    "stacks.txt": format_stacks(stacks, self.sampler.interval_seconds).encode()
+                }
+                self._save(self.store.new_id(), scope, "slow", elapsed_ms, status["code"], files)
+
+    def _save(self, profile_id: str, scope, trigger: str, elapsed_ms: float, status_code, files: Dict[str, bytes]):
+        meta = {
+            "path": scope["path"],
+            "method": scope.get("method"),
+            "trigger": trigger,
+            "duration_ms": round(elapsed_ms, 1),
+            "status": status_code,
+            "captured_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }
+        try:
+            self.store.save(profile_id, meta, files)
+            print(f"🔬 Saved {trigger} profile {profile_id} for {scope['path']} ({elapsed_ms:.0f} ms)")
+        except OSError as e:
+            print(f"⚠️  Could not save profile: {e}")
+
+    @staticmethod
+    def _dump_stats(profiler: cProfile.Profile) -> bytes:
+        # pstats can only dump to a path; go through a temporary file
+        import tempfile
+        with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as f:
+            path = f.name
+        try:
+            profiler.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def _format_stats(profiler: cProfile.Profile, top: int = 40) -> str:
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(top)
+        stats.sort_stats("tottime").print_stats(top)
+        return out.getvalue()
+
+    @staticmethod
+    def _format_allocations(before, after, peak: Optional[int], top: int = 25) -> str:
+        lines = [f"Peak traced memory during request: {peak / 1024 / 1024:.1f} MB" if peak else "", ""]
+        lines.append("Largest net allocations during the request:")
+        for stat in after.compare_to(before, "lineno")[:top]:
+            lines.append(str(stat))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,145 @@
+"""
+Adaptive Retrieval Depth
+Fetches a wider candidate set with relevance scores and keeps only the chunks
+that stand out: those within a relative margin of the best match, cut at the
+largest score drop (the elbow), between a configurable min and max k. When no
+chunk is relevant the caller answers with a canned response instead of the LLM.
+
+Scores are VectorStoreManager relevance scores. In the default cosine space
+they are 1 - cosine distance, on which min_relevance is an absolute floor and
+relative_score a fraction of the best score. Indexes still built in l2 or ip
+space have unnormalized scores; they keep a fixed max_k and never hit the floor.
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Metadata source of the "No documents loaded yet." placeholder chunks
+PLACEHOLDER_SOURCE = "system"
+
+NO_DOCUMENTS_ANSWER = (
+    "No documents have been loaded for your startup yet, so I have nothing to base an answer on. "
+    "Upload your emails, meeting notes or other documents and ask again."
+)
+NO_MATCH_ANSWER = (
+    "I couldn't find anything in your documents that relates to this question. "
+    "Try rephrasing it, or upload the emails, meeting notes or documents that cover it."
+)
+
+
+class CutoffSettings:
+    def __init__(
+        self,
+        max_k: int = 6,
+        min_k: int = 2,
+        candidate_k: int = 12,
+        relative_score: float = 0.8,
+        elbow_gap: float = 0.1,
+        min_relevance: float = 0.15,
+        enabled: bool = True
+    ):
+        if min_k < 1 or max_k < min_k:
+            raise ValueError("Retrieval depth needs 1 <= min_k <= max_k")
+        self.max_k = max_k
+        self.min_k = min_k
+        self.candidate_k = max(candidate_k, max_k)
+        self.relative_score = relative_score
+        self.elbow_gap = elbow_gap
+        self.min_relevance = min_relevance
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls, max_k: int = 6) -> "CutoffSettings":
+        """RETRIEVAL_* settings; max_k defaults to the tenant's retrieval k"""
+        max_k = int(os.getenv('RETRIEVAL_MAX_K', 0)) or max_k
+        return cls(
+            max_k=max_k,
+            min_k=min(int(os.getenv('RETRIEVAL_MIN_K', 2)), max_k),
+            candidate_k=int(os.getenv('RETRIEVAL_CANDIDATE_K', 12)),
+            relative_score=float(os.getenv('RETRIEVAL_RELATIVE_SCORE', 0.8)),
+            elbow_gap=float(os.getenv('RETRIEVAL_ELBOW_GAP', 0.1)),
+            min_relevance=float(os.getenv('RETRIEVAL_MIN_RELEVANCE', 0.15)),
+            enabled=os.getenv('RETRIEVAL_ADAPTIVE', 'true').lower() == 'true'
+        )
+
+
+class ScoreCutoff:
+    def __init__(self, settings: Optional[CutoffSettings] = None):
+        self.settings = settings or CutoffSettings.from_env()
+
+    @property
+    def fetch_k(self) -> int:
+        """How many candidates to retrieve"""
+        s = self.settings
+        return s.candidate_k if s.enabled else s.max_k
+
+    def select(self, docs_and_scores: List[tuple], normalized: bool = True) -> Tuple[List[tuple], str, str]:
+        """Return (kept (doc, score) pairs, cutoff kind, reason); nothing kept means answer without the LLM.
+
+        normalized=False (scores not on the cosine scale) skips every score threshold and keeps max_k.
+        """
+        s = self.settings
+        ranked = sorted(docs_and_scores, key=lambda pair: pair[1], reverse=True)
+        if not s.enabled:
+            return ranked[:s.max_k], "fixed", f"fixed k={s.max_k}"
+
+        real = [pair for pair in ranked if pair[0].metadata.get("source") != PLACEHOLDER_SOURCE]
+        if not real:
+            return [], "no_documents", "only placeholder documents in the index" if ranked else "empty index"
+        if not normalized:
+            return real[:s.max_k], "fixed", f"unnormalized scores, fixed k={s.max_k}"
+        relevant = [pair for pair in real if pair[1] >= s.min_relevance]
+        if not relevant:
+            return [], "no_match", f"best score {real[0][1]:.2f} < {s.min_relevance}"
+
+        scores = [score for _, score in relevant]
+        top = scores[0]
+        # Chunks close enough to the best match, never fewer than min_k or more than max_k
+        keep = sum(1 for score in scores if score >= top * s.relative_score)
+        kind, reason = "relative", f"{keep} within {s.relative_score:.0%} of top {top:.2f}"
+
+        # The biggest drop past min_k separates the matches from the rest
+        gaps = [(scores[i] - scores[i + 1], i + 1) for i in range(s.min_k - 1, min(keep, len(scores)) - 1)]
+        if gaps:
+            gap, position = max(gaps)
+            if gap >= s.elbow_gap:
+                keep, kind, reason = position, "elbow", f"score drop {gap:.2f} after {position}"
+
+        if keep < s.min_k:
+            keep, kind = min(s.min_k, len(relevant)), "min_k"
+            reason = f"min_k={s.min_k}" if keep == s.min_k else f"only {keep} above min relevance"
+        if keep > s.max_k:
+            keep, kind, reason = s.max_k, "max_k", f"max_k={s.max_k}"
+        return relevant[:keep], kind, reason
+
+
+class RetrievalMetrics:
+    """Thread-safe totals of chunks used per answer, prompt context size and cutoff reasons"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = 0
+        self._chunks = 0
+        self._candidates = 0
+        self._context_chars = 0
+        self._kinds: Dict[str, int] = {}
+
+    def record(self, kind: str, chunks: int, candidates: int, context_chars: int):
+        with self._lock:
+            self._queries += 1
+            self._chunks += chunks
+            self._candidates += candidates
+            self._context_chars += context_chars
+            self._kinds[kind] = self._kinds.get(kind, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            queries = self._queries
+            return {
+                "queries": queries,
+                "avg_chunks": round(self._chunks / queries, 2) if queries else None,
+                "avg_candidates": round(self._candidates / queries, 2) if queries else None,
+                "avg_context_chars": round(self._context_chars / queries) if queries else None,
+                "answered_without_llm": self._kinds.get("no_documents", 0) + self._kinds.get("no_match", 0),
+                "cutoffs": dict(self._kinds)
+            }
@@ -0,0 +1,159 @@
+"""
+Retrieval Filters
+Metadata pre-filters (document type, sender, date range, thread) given
+explicitly on a request or detected from the question text
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from src.loaders.metadata import DOC_TYPES
+
+
+DOC_TYPE_KEYWORDS = [
+    ("email", re.compile(r"\b(e-?mails?|e-?mailed|inbox|wrote to|replied)\b", re.IGNORECASE)),
+    ("meeting", re.compile(r"\b(meetings?|minutes|standups?|stand-ups?|all[- ]hands|retros?)\b", re.IGNORECASE)),
+    ("calendar", re.compile(r"\b(calendar|scheduled)\b", re.IGNORECASE)),
+    ("slack", re.compile(r"\bslack\b", re.IGNORECASE))
+]
+SENDER_RE = re.compile(r"\bfrom\s+@?([\w.+-]+@[\w-]+(?:\.[\w-]+)+|[\w-]+(?:\.[\w-]+)*\.(?:com|io|ai|co|org|net|vc|dev))\b", re.IGNORECASE)
+LAST_N_DAYS_RE = re.compile(r"\b(?:last|past)\s+(\d{1,3})\s+days?\b", re.IGNORECASE)
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+MONTH_RE = re.compile(r"\bin\s+(" + "|".join(MONTHS) + r")(?:\s+(\d{4}))?\b", re.IGNORECASE)
+
+
+def parse_date(value: str, end_of_day: bool = False) -> datetime:
+    """ISO date or datetime; bare dates cover the whole day when used as an upper bound"""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end_of_day and len(value.strip()) == 10:
+        parsed += timedelta(days=1) - timedelta(seconds=1)
+    return parsed
+
+
+class RetrievalFilters:
+    def __init__(
+        self,
+        doc_types: Optional[List[str]] = None,
+        sender: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        thread_id: Optional[str] = None
+    ):
+        unknown = [t for t in (doc_types or []) if t not in DOC_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown document type(s) {unknown}; expected one of {list(DOC_TYPES)}")
+        if since and until and since > until:
+            raise ValueError("'since' must be before 'until'")
+
+        self.doc_types = list(doc_types or [])
+        self.sender = sender.strip().lower().lstrip("@") if sender else None
+        self.since = since
+        self.until = until
+        self.thread_id = thread_id
+
+    @classmethod
+    def from_request(
+        cls,
+        doc_type: Optional[str] = None,
+        sender: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        thread_id: Optional[str] = None
+    ) -> "RetrievalFilters":
+        """Build from API fields; doc_type may be comma-separated"""
+        return cls(
+            doc_types=[t.strip().lower() for t in (doc_type or "").split(",") if t.strip()],
+            sender=sender,
+            since=parse_date(since) if since else None,
+            until=parse_date(until, end_of_day=True) if until else None,
+            thread_id=thread_id
+        )
+
+    @classmethod
+    def detect(cls, question: str, now: Optional[datetime] = None) -> "RetrievalFilters":
+        """Infer filters from phrases like 'emails from acme.com last week'"""
+        now = now or datetime.now(timezone.utc)
+        doc_types = [doc_type for doc_type, pattern in DOC_TYPE_KEYWORDS if pattern.search(question)]
+        sender = SENDER_RE.search(question)
+        since, until = cls._detect_window(question, now)
+        return cls(doc_types=doc_types, sender=sender.group(1) if sender else None, since=since, until=until)
+
+    @staticmethod
+    def _detect_window(question: str, now: datetime):
+        text = question.lower()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+
+        match = LAST_N_DAYS_RE.search(text)
+        if match:
+            return now - timedelta(days=int(match.group(1))), None
+        if "yesterday" in text:
+            return today - timedelta(days=1), today - timedelta(seconds=1)
+        if "today" in text:
+            return today, None
+        if "last week" in text:
+            return week_start - timedelta(days=7), week_start - timedelta(seconds=1)
+        if "this week" in text:
+            return week_start, None
+        if "last month" in text:
+            previous = (month_start - timedelta(days=1)).replace(day=1)
+            return previous, month_start - timedelta(seconds=1)
+        if "this month" in text:
+            return month_start, None
+
+        match = MONTH_RE.search(text)
+        if match:
+            month = MONTHS.index(match.group(1).lower()) + 1
+            year = int(match.group(2)) if match.group(2) else (now.year if month <= now.month else now.year - 1)
+            start = datetime(year, month, 1, tzinfo=timezone.utc)
+            end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+            return start, end - timedelta(seconds=1)
+        return None, None
+
+    def merged_with(self, other: "RetrievalFilters") -> "RetrievalFilters":
+        """Fields set here win; unset fields are taken from other"""
+        return RetrievalFilters(
+            doc_types=self.doc_types or other.doc_types,
+            sender=self.sender or other.sender,
+            since=self.since or (other.since if not self.until else None),
+            until=self.until or (other.until if not self.since else None),
+            thread_id=self.thread_id or other.thread_id
+        )
+
+    def is_empty(self) -> bool:
+        return not (self.doc_types or self.sender or self.since or self.until or self.thread_id)
+
+    def to_where(self) -> Optional[dict]:
+        """Chroma metadata filter, or None when nothing is set"""
+        clauses = []
+        if len(self.doc_types) == 1:
+            clauses.append({"doc_type": self.doc_types[0]})
+        elif self.doc_types:
+            clauses.append({"doc_type": {"$in": self.doc_types}})
+        if self.sender:
+            clauses.append({"sender": self.sender} if "@" in self.sender else {"sender_domain": self.sender})
+        if self.since:
+            clauses.append({"timestamp": {"$gte": int(self.since.timestamp())}})
+        if self.until:
+            clauses.append({"timestamp": {"$lte": int(self.until.timestamp())}})
+        if self.thread_id:
+            clauses.append({"thread_id": self.thread_id})
+
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def describe(self) -> dict:
+        return {
+            key: value for key, value in {
+                "doc_types": self.doc_types,
+                "sender": self.sender,
+                "since": self.since.isoformat() if self.since else None,
+                "until": self.until.isoformat() if self.until else None,
+                "thread_id": self.thread_id
+            }.items() if value
+        }
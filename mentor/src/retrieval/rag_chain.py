@@ -4,14 +4,26 @@ Combines vector retrieval with LLM to answer questions based on documents
 """
 import os
 import json
-from typing import List, Optional
-from langchain.chains import ConversationalRetrievalChain
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain.memory import ConversationBufferMemory
-from langchain_core.prompts import PromptTemplate
+from langchain_core.messages import get_buffer_string
 from langchain_core.documents import Document
 
 from src.embeddings.vector_store import VectorStoreManager
 from src.llm.llm_wrapper import LLMWrapper
+from src.llm.router import FAST_ROUTE, STRONG_ROUTE, QuestionRouter
+from src.retrieval.adaptive import (
+    NO_DOCUMENTS_ANSWER, NO_MATCH_ANSWER, CutoffSettings, RetrievalMetrics, ScoreCutoff
+)
+from src.retrieval.filters import RetrievalFilters
+from src.retrieval.summarizer import TENANT_SUMMARY_SOURCE, is_broad_question
+from src.rubrics.engine import RubricEngine
+
+
+# Route reported for questions answered without the LLM (nothing relevant retrieved)
+NO_CONTEXT_ROUTE = "none"
 
 
 class RAGChain:
@@ -19,16 +31,35 @@ class RAGChain:
         self,
         vectorstore_manager: VectorStoreManager,
         llm_wrapper: LLMWrapper,
-        rubrics_path: Optional[str] = None
+        rubrics_path: Optional[str] = None,
+        rubric_scores: Optional[dict] = None,
+        tenant_summary: Optional[str] = None,
+        router: Optional[QuestionRouter] = None,
+        k: int = 6,
+        auto_filters: bool = True,
+        history_turns: int = 2,
+        cutoff: Optional[ScoreCutoff] = None,
+        retrieval_metrics: Optional[RetrievalMetrics] = None
     ):
         self.vectorstore_manager = vectorstore_manager
-        self.llm = llm_wrapper.get_llm()
         self.model_info = llm_wrapper.get_model_info()
 
         # Load rubrics if provided
         self.rubrics = self._load_rubrics(rubrics_path) if rubrics_path else {}
-
-        # Create system prompt with rubrics
+        self.rubric_scores = rubric_scores
+        self.tenant_summary = tenant_summary
+        self.llm_wrapper = llm_wrapper
+        self.router = router or QuestionRouter()
+        self.k = k
+        self.auto_filters = auto_filters
+        # Candidates are fetched wider than k and cut by score (see RETRIEVAL_*)
+        self.cutoff = cutoff or ScoreCutoff(CutoffSettings.from_env(max_k=k))
+        self.retrieval_metrics = retrieval_metrics or RetrievalMetrics()
+        # Recent turns included after the context so follow-ups are answered as asked;
+        # the condensed rewrite of a follow-up is only used for retrieval
+        self.history_turns = history_turns
+
+        # Create system prompt with rubrics; every answer prompt starts with it unchanged
         self.system_prompt = self._create_system_prompt()
 
         # Initialize conversation memory
@@ -37,9 +68,7 @@ class RAGChain:
             return_messages=True,
             output_key="answer"
         )
-
-        # Create the conversational retrieval chain
-        self.chain = self._create_chain()
+        print(f"✓ RAG Chain created using {self.model_info['model_name']}")
 
     def _load_rubrics(self, rubrics_path: str) -> dict:
         """Load rubrics from JSON file"""
@@ -53,7 +82,13 @@ class RAGChain:
             return {}
 
     def _create_system_prompt(self) -> str:
-        """Create system prompt with rubrics context"""
+        """Create system prompt with rubrics context.
+
+        Ordered from most to least shared: fixed instructions, the rubric
+        framework, then the tenant's computed scores. The result depends only
+        on those inputs, so it is byte-identical across requests and chain
+        rebuilds and the model server can reuse its KV cache for the prefix.
+        """
         base_prompt = """You are an expert startup mentor and business advisor.
 You have access to detailed information about the startup from their meeting minutes, emails, and calendar data.
 
@@ -78,51 +113,71 @@ Your role is to:
             rubrics_text += "\nUse these evaluation criteria to inform your analysis and recommendations.\n"
             base_prompt += rubrics_text
 
+        if self.rubric_scores:
+            # Scores are computed over the full corpus, so the LLM should cite them rather than estimate
+            base_prompt += "\nCOMPUTED RUBRIC SCORES (measured over all of the startup's records, not estimates):\n"
+            base_prompt += RubricEngine.format_scores(self.rubric_scores) + "\n"
+            base_prompt += "When asked about these areas, use these scores as ground truth and explain them with the context.\n"
+
         return base_prompt
 
-    def _create_chain(self) -> ConversationalRetrievalChain:
-        """Create the conversational retrieval chain"""
+    def set_rubric_scores(self, rubric_scores: Optional[dict]):
+        """Serve rescored rubric results (e.g. after one document changed) from the next answer on"""
+        self.rubric_scores = rubric_scores
+        self.system_prompt = self._create_system_prompt()
+
+    def _answer_prompt(self, context: str, question: str, history: Optional[list] = None) -> str:
+        """Stable system prompt first, then the per-request parts: context, recent history, question"""
+        history_block = ""
+        if history and self.history_turns > 0:
+            history_block = f"RECENT CONVERSATION:\n{get_buffer_string(history[-2 * self.history_turns:])}\n\n"
 
-        # Custom prompt template
-        prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
-            template=f"""{self.system_prompt}
+        return f"""{self.system_prompt}
 
 CONTEXT FROM DOCUMENTS:
-{{context}}
+{context}
 
-QUESTION: {{question}}
+{history_block}QUESTION: {question}
 
 ANSWER (be specific, reference the context, and provide actionable insights):
 """
-        )
 
-        # Create the chain
-        chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.vectorstore_manager.as_retriever(
-                search_kwargs={"k": 6}  # Retrieve top 6 relevant chunks
-            ),
-            memory=self.memory,
-            return_source_documents=True,
-            combine_docs_chain_kwargs={"prompt": prompt_template},
-            verbose=True
-        )
+    def ask(self, question: str, filters: Optional[RetrievalFilters] = None) -> dict:
+        """Ask a question and get an answer with sources, optionally pre-filtered by metadata"""
+        print(f"\n🤔 Question: {question}")
+        filters = filters or RetrievalFilters()
 
-        print(f"✓ RAG Chain created using {self.model_info['model_name']}")
-        return chain
+        if self.tenant_summary and filters.is_empty() and is_broad_question(question):
+            return self._ask_from_summary(question)
 
-    def ask(self, question: str) -> dict:
-        """Ask a question and get an answer with sources"""
-        print(f"\n🤔 Question: {question}")
+        history = self.memory.chat_memory.messages
+        search_query = self._condense_question(question, history)
+
+        # Retrieve once with scores; the scores also feed the router
+        docs_and_scores, applied = self._filtered_search(search_query, filters)
+        kept, canned_answer = self._select_context(docs_and_scores)
+        docs = [doc for doc, _ in kept]
 
-        response = self.chain.invoke({"question": question})
+        if canned_answer:
+            route, answer = NO_CONTEXT_ROUTE, canned_answer
+        else:
+            route, reason = self.router.classify(
+                question, [score for _, score in docs_and_scores], len(history) // 2,
+                normalized=self.vectorstore_manager.normalized_scores
+            )
+            print(f"🧭 Route: {route} ({reason})")
+
+            context = "\n\n".join(doc.page_content for doc in docs)
+            answer = self.llm_wrapper.invoke(self._answer_prompt(context, question, history), route=route)
+        self.memory.save_context({"question": question}, {"answer": answer})
 
         result = {
             "question": question,
-            "answer": response["answer"],
-            "sources": [doc.metadata.get("source", "unknown") for doc in response["source_documents"]],
-            "source_documents": response["source_documents"]
+            "answer": answer,
+            "sources": [doc.metadata.get("source", "unknown") for doc in docs],
+            "source_documents": docs,
+            "route": route,
+            "filters": applied.describe()
         }
 
         print(f"\n✓ Answer: {result['answer'][:200]}...")
@@ -130,6 +185,175 @@ ANSWER (be specific, reference the context, and provide actionable insights):
 
         return result
 
+    def _filtered_search(self, query: str, filters: RetrievalFilters) -> Tuple[list, RetrievalFilters]:
+        """Search with explicit plus detected filters; detected ones are dropped if they match nothing"""
+        detected = RetrievalFilters.detect(query) if self.auto_filters else RetrievalFilters()
+        combined = filters.merged_with(detected)
+
+        for candidate in ([combined, filters] if not detected.is_empty() else [filters]):
+            where = candidate.to_where()
+            if where:
+                print(f"🔎 Pre-filter: {candidate.describe()}")
+            docs_and_scores = self.vectorstore_manager.similarity_search_with_relevance_scores(
+                query, k=self.cutoff.fetch_k, where=where
+            )
+            if docs_and_scores or candidate is filters:
+                return docs_and_scores, candidate
+        return [], filters
+
+    def _select_context(self, docs_and_scores: list) -> Tuple[list, Optional[str]]:
+        """Cut the candidates down to the chunks worth sending; returns (kept pairs, canned answer or None)"""
+        kept, kind, reason = self.cutoff.select(docs_and_scores, normalized=self.vectorstore_manager.normalized_scores)
+        self.retrieval_metrics.record(
+            kind, len(kept), len(docs_and_scores), sum(len(doc.page_content) for doc, _ in kept)
+        )
+        print(f"📏 Using {len(kept)}/{len(docs_and_scores)} chunks ({reason})")
+
+        if kind == "no_documents":
+            return kept, NO_DOCUMENTS_ANSWER
+        if kind == "no_match":
+            return kept, NO_MATCH_ANSWER
+        return kept, None
+
+    def _condense_question(self, question: str, history: list) -> str:
+        """Rephrase a follow-up into a standalone question (fast model) so retrieval sees full intent"""
+        if not history:
+            return question
+
+        prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=get_buffer_string(history), question=question)
+        return self.llm_wrapper.invoke(prompt, route=FAST_ROUTE, record_metrics=False).strip() or question
+
+    def ask_many(self, questions: List[str], max_concurrency: int = 4) -> List[dict]:
+        """Answer independent questions with shared retrieval and parallel generation, in input order"""
+        results: List[Optional[dict]] = [None] * len(questions)
+        for index, result in self.iter_many(questions, max_concurrency):
+            results[index] = result
+        return results
+
+    def iter_many(self, questions: List[str], max_concurrency: int = 4) -> Iterator[Tuple[int, dict]]:
+        """Yield (index, result) as each answer completes. Batch questions do not touch conversation memory.
+
+        A question whose generation fails yields {"question", "error"} instead of
+        an answer; the rest of the batch carries on.
+        """
+        if not questions:
+            return
+        print(f"\n📦 Batch of {len(questions)} questions (concurrency {max_concurrency})")
+
+        retrievals, applied = self._batch_search(questions)
+
+        # Identical question + context pairs are generated once and shared
+        jobs = {}
+        for index, (question, docs_and_scores) in enumerate(zip(questions, retrievals)):
+            docs = [doc for doc, _ in docs_and_scores]
+            key = (question.strip().lower(), tuple(id(doc) for doc in docs))
+            jobs.setdefault(key, (question, docs_and_scores, applied[index], []))[3].append(index)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            futures = {
+                executor.submit(self._answer_one, question, docs_and_scores, filters): indexes
+                for question, docs_and_scores, filters, indexes in jobs.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ Batch question failed: {type(e).__name__}: {e}")
+                    result = {"error": str(e) or type(e).__name__}
+                for index in futures[future]:
+                    yield index, {**result, "question": questions[index]}
+
+    def _batch_search(self, questions: List[str]) -> Tuple[list, list]:
+        """Retrieve for a batch with each question's detected filters; returns (results, applied filters).
+
+        Questions with the same filter share one embedding call and one index
+        query. As in ask, a detected filter that matches nothing is dropped.
+        """
+        unfiltered = RetrievalFilters()
+        applied = [RetrievalFilters.detect(q) if self.auto_filters else unfiltered for q in questions]
+        retrievals: List[list] = [[] for _ in questions]
+
+        groups = {}
+        for index, filters in enumerate(applied):
+            where = filters.to_where()
+            key = json.dumps(where, sort_keys=True, default=str)
+            groups.setdefault(key, (where, filters, []))[2].append(index)
+        for where, filters, indexes in groups.values():
+            if where:
+                print(f"🔎 Pre-filter for {len(indexes)} questions: {filters.describe()}")
+            hits = self.vectorstore_manager.batch_similarity_search(
+                [questions[i] for i in indexes], k=self.cutoff.fetch_k, where=where
+            )
+            for index, docs_and_scores in zip(indexes, hits):
+                retrievals[index] = docs_and_scores
+
+        unmatched = [i for i, filters in enumerate(applied) if not retrievals[i] and not filters.is_empty()]
+        if unmatched:
+            hits = self.vectorstore_manager.batch_similarity_search(
+                [questions[i] for i in unmatched], k=self.cutoff.fetch_k
+            )
+            for index, docs_and_scores in zip(unmatched, hits):
+                retrievals[index], applied[index] = docs_and_scores, unfiltered
+        return retrievals, applied
+
+    def _answer_one(self, question: str, docs_and_scores: list, filters: Optional[RetrievalFilters] = None) -> dict:
+        """Route and generate for a pre-retrieved question without using conversation memory"""
+        filters = filters or RetrievalFilters()
+        if self.tenant_summary and filters.is_empty() and is_broad_question(question):
+            return self._ask_from_summary(question, save_to_memory=False)
+
+        kept, canned_answer = self._select_context(docs_and_scores)
+        docs = [doc for doc, _ in kept]
+        if canned_answer:
+            route, answer = NO_CONTEXT_ROUTE, canned_answer
+        else:
+            route, reason = self.router.classify(
+                question, [score for _, score in docs_and_scores], normalized=self.vectorstore_manager.normalized_scores
+            )
+            context = "\n\n".join(doc.page_content for doc in docs)
+            answer = self.llm_wrapper.invoke(self._answer_prompt(context, question), route=route)
+
+        return {
+            "question": question,
+            "answer": answer,
+            "sources": [doc.metadata.get("source", "unknown") for doc in docs],
+            "source_documents": docs,
+            "route": route,
+            "filters": filters.describe()
+        }
+
+    def _ask_from_summary(self, question: str, save_to_memory: bool = True) -> dict:
+        """Answer a broad question from the precomputed tenant summary in a single LLM call"""
+        print("🗂️  Broad question - answering from tenant summary")
+
+        prompt = f"""{self.system_prompt}
+
+COMPANY OVERVIEW (summarized from all documents):
+{self.tenant_summary}
+
+QUESTION: {question}
+
+ANSWER (be specific, reference the overview, and provide actionable insights):
+"""
+        answer = self.llm_wrapper.invoke(prompt, route=STRONG_ROUTE)
+        if save_to_memory:
+            self.memory.save_context({"question": question}, {"answer": answer})
+
+        summary_doc = Document(
+            page_content=self.tenant_summary,
+            metadata={"source": TENANT_SUMMARY_SOURCE, "summary_level": "tenant"}
+        )
+        result = {
+            "question": question,
+            "answer": answer,
+            "sources": [TENANT_SUMMARY_SOURCE],
+            "source_documents": [summary_doc],
+            "route": STRONG_ROUTE
+        }
+
+        print(f"\n✓ Answer: {result['answer'][:200]}...")
+        return result
+
     def get_conversation_history(self) -> List[dict]:
         """Get the conversation history"""
         return self.memory.chat_memory.messages
@@ -0,0 +1,203 @@
+"""
+Rubric Report
+Builds a per-category mentor assessment across every rubric category, with
+categories generated in parallel and cached per tenant. A category is
+regenerated only when its prompt changes: its computed score or the evidence
+retrieved for it (i.e. its supporting documents changed). Repeat requests for
+an unchanged document set are served straight from the cache.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.embeddings.vector_store import VectorStoreManager
+from src.llm.llm_wrapper import LLMWrapper
+from src.llm.router import STRONG_ROUTE
+from src.retrieval.adaptive import PLACEHOLDER_SOURCE
+
+REPORT_PROMPT = """You are an expert startup mentor writing one section of an evaluation report for the founders.
+Assess the startup on the rubric category below using only the computed score and the evidence excerpts.
+Write 3 short parts: "Assessment" (2-3 sentences), "Evidence" (bullets citing the [source] names),
+and "Next steps" (2-3 concrete actions). Do not invent facts that are not in the evidence.
+
+CATEGORY: {label} ({weight:.0f}% of the overall score)
+WHAT IS MEASURED:
+{metrics}
+
+COMPUTED SCORE: {score}
+
+EVIDENCE FROM THE STARTUP'S DOCUMENTS:
+{evidence}
+
+SECTION:
+"""
+
+NO_EVIDENCE_ASSESSMENT = "Not enough evidence in the uploaded documents to assess this category yet."
+
+# Serializes report builds per cache file so concurrent requests don't generate the same sections twice
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _build_locks_guard:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+class RubricReportBuilder:
+    def __init__(
+        self,
+        llm_wrapper: LLMWrapper,
+        vectorstore_manager: VectorStoreManager,
+        cache_path: str,
+        evidence_k: int = 8,
+        max_workers: int = 4
+    ):
+        self.llm_wrapper = llm_wrapper
+        self.vectorstore_manager = vectorstore_manager
+        self.cache_path = cache_path
+        self.evidence_k = evidence_k
+        self.max_workers = max_workers
+
+    def _load_cache(self) -> dict:
+        """Load the cached report and per-category sections"""
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️  Could not read report cache: {e}")
+        return {"version": None, "report": None, "categories": {}}
+
+    def _save_cache(self, cache: dict):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def build(
+        self,
+        categories: List[dict],
+        rubric_scores: Optional[dict],
+        document_version: Optional[str],
+        refresh: bool = False
+    ) -> dict:
+        """Return the report for the current documents, regenerating only the sections that changed.
+
+        document_version is the tenant's document-set fingerprint; when it and
+        the model match the cached report, nothing is retrieved or generated.
+        """
+        model = self.llm_wrapper.get_model_info()["model_name"]
+        version = self._hash(json.dumps([document_version, model, categories])) if document_version else None
+
+        with _lock_for(self.cache_path):
+            cache = self._load_cache()
+            if version and not refresh and cache.get("version") == version and cache.get("report"):
+                return {**cache["report"], "cached": True, "regenerated": []}
+
+            start = time.perf_counter()
+            scored = {c.get("key"): c for c in (rubric_scores or {}).get("categories", [])}
+            prompts = self._category_prompts(categories, scored)
+
+            sections = cache.setdefault("categories", {})
+            pending = [
+                key for key, (prompt, _) in prompts.items()
+                if refresh or sections.get(key, {}).get("prompt_hash") != self._hash(f"{model}\n{prompt}")
+            ]
+            print(f"📋 Report: generating {len(pending)} of {len(prompts)} categories "
+                  f"({len(prompts) - len(pending)} unchanged)")
+
+            with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                generated = list(executor.map(lambda key: self._generate(prompts[key][0]), pending))
+            for key, assessment in zip(pending, generated):
+                prompt, sources = prompts[key]
+                sections[key] = {
+                    "prompt_hash": self._hash(f"{model}\n{prompt}"),
+                    "assessment": assessment,
+                    "sources": sources,
+                    "generated_at": time.time()
+                }
+            # Categories removed from the rubric
+            for key in list(sections):
+                if key not in prompts:
+                    del sections[key]
+
+            report = {
+                "document_version": document_version,
+                "model": model,
+                "overall": (rubric_scores or {}).get("overall"),
+                "categories": [
+                    {
+                        "key": category.get("key"),
+                        "label": category.get("label"),
+                        "score": scored.get(category.get("key"), {}).get("score"),
+                        "tier": scored.get(category.get("key"), {}).get("tier"),
+                        "assessment": sections[category.get("key")]["assessment"],
+                        "sources": sections[category.get("key")]["sources"],
+                        "generated_at": sections[category.get("key")]["generated_at"]
+                    }
+                    for category in categories
+                ],
+                "prioritized_actions": (rubric_scores or {}).get("prioritized_actions", []),
+                "generated_at": time.time(),
+                "build_seconds": round(time.perf_counter() - start, 2)
+            }
+            # A report containing failed sections is not reused as a whole; those sections retry next time
+            failed = [key for key in pending if not sections[key]["assessment"]]
+            for key in failed:
+                sections[key]["prompt_hash"] = None
+            cache.update({"version": version if not failed else None, "report": report})
+            self._save_cache(cache)
+
+        return {**report, "cached": False, "regenerated": pending}
+
+    def _category_prompts(self, categories: List[dict], scored: Dict[str, dict]) -> Dict[str, tuple]:
+        """Per category: (prompt, evidence sources). Evidence for all categories is retrieved in one batch."""
+        queries = [
+            " ".join([category.get("label", "")] + [m.get("description", "") for m in category.get("metrics", [])])
+            for category in categories
+        ]
+        retrievals = self.vectorstore_manager.batch_similarity_search(queries, k=self.evidence_k)
+
+        prompts = {}
+        for category, hits in zip(categories, retrievals):
+            docs = [doc for doc, _ in hits if doc.metadata.get("source") != PLACEHOLDER_SOURCE]
+            # Same evidence in a stable order, so unchanged documents give an identical prompt
+            docs.sort(key=lambda doc: (doc.metadata.get("source", ""), doc.page_content))
+            sources = sorted({doc.metadata.get("source", "unknown") for doc in docs})
+            if not docs:
+                prompts[category.get("key")] = ("", sources)
+                continue
+
+            result = scored.get(category.get("key"))
+            score = "not computed"
+            if result:
+                details = "; ".join(f"{m['name']}: {m['score']:.0f}/100 ({m['details']})" for m in result.get("metrics", []))
+                score = f"{result['score']:.0f}/100 ({result['tier']}). {details}"
+
+            prompts[category.get("key")] = (REPORT_PROMPT.format(
+                label=category.get("label", category.get("key", "")),
+                weight=category.get("weight", 0) * 100,
+                metrics="\n".join(f"- {m.get('name', '')}: {m.get('description', '')}" for m in category.get("metrics", [])),
+                score=score,
+                evidence="\n\n".join(f"[{doc.metadata.get('source', 'unknown')}]\n{doc.page_content}" for doc in docs)
+            ), sources)
+        return prompts
+
+    def _generate(self, prompt: str) -> str:
+        if not prompt:
+            return NO_EVIDENCE_ASSESSMENT
+        try:
+            return self.llm_wrapper.invoke(prompt, route=STRONG_ROUTE).strip()
+        except Exception as e:
+            print(f"  ⚠️  Could not generate report section: {e}")
+            return ""
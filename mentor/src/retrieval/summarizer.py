@@ -0,0 +1,240 @@
+"""
+Corpus Summarizer
+Builds per-document summaries and one rolled-up tenant summary (map-reduce)
+at ingestion time so broad questions can be answered from a compact context
+"""
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from src.llm.llm_wrapper import LLMWrapper
+
+
+TENANT_SUMMARY_SOURCE = "summary:tenant"
+
+DOCUMENT_SUMMARY_PROMPT = """Summarize the following startup document for a mentor who will advise the founders.
+Keep names, dates, numbers, decisions, risks and open action items. Use at most 8 concise bullet points.
+
+DOCUMENT ({source}):
+{text}
+
+SUMMARY:
+"""
+
+COMBINE_SUMMARY_PROMPT = """Combine these document summaries into one overview of the startup.
+Cover: overall status, key metrics, product and engineering, go-to-market, team, risks and upcoming milestones.
+Keep concrete names, dates and numbers. Use short sections with bullet points, at most 300 words.
+
+SUMMARIES:
+{text}
+
+COMPANY OVERVIEW:
+"""
+
+BROAD_QUESTION_RE = re.compile(
+    r"how (is|are) (the company|we|things|our startup|the startup|the business) doing"
+    r"|\b(overview|big picture|overall|summar(y|ize|ise)|state of the (company|business|startup)|status update)\b"
+    r"|what('s| is) going on",
+    re.IGNORECASE
+)
+
+
+def is_broad_question(question: str) -> bool:
+    """Heuristic for questions about the whole company rather than a specific fact"""
+    return bool(BROAD_QUESTION_RE.search(question or ""))
+
+
+class CorpusSummarizer:
+    def __init__(
+        self,
+        llm_wrapper: LLMWrapper,
+        cache_path: str,
+        max_chars_per_call: int = 12000,
+        combine_batch_size: int = 20,
+        max_workers: int = 4
+    ):
+        self.llm_wrapper = llm_wrapper
+        self.cache_path = cache_path
+        self.max_chars_per_call = max_chars_per_call
+        self.combine_batch_size = combine_batch_size
+        self.max_workers = max_workers
+        self.cache = self._load_cache()
+        self.last_stats: Dict[str, int] = {}
+
+    def _load_cache(self) -> dict:
+        """Load cached summaries keyed by source and content hash"""
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️  Could not read summary cache: {e}")
+        return {"documents": {}, "tenant": {}}
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def summarize(self, documents: List[Document]) -> List[Document]:
+        """Return per-document summaries plus the tenant summary, regenerating only what changed"""
+        if not documents:
+            return []
+
+        cached = self.cache.setdefault("documents", {})
+        pending, failed = self._summarize_changed(documents)
+
+        # Drop summaries for documents that no longer exist
+        current_sources = {doc.metadata.get("source", "unknown") for doc in documents}
+        for source in list(cached):
+            if source not in current_sources:
+                del cached[source]
+
+        self.last_stats = {
+            "documents": len(current_sources),
+            "cached": len(documents) - pending,
+            "summarized": pending - len(failed),
+            "failed": len(failed)
+        }
+        if failed:
+            print(f"⚠️  {len(failed)} document summaries failed and will be retried on the next build")
+
+        doc_summaries = [(source, cached[source]["summary"]) for source in sorted(current_sources) if source in cached]
+        tenant_summary = self._tenant_summary(doc_summaries)
+        self._save_cache()
+        return self._summary_documents(doc_summaries, tenant_summary)
+
+    def update(self, changed: List[Document], removed: List[str]) -> List[Document]:
+        """Summarize changed documents, forget removed ones and re-roll the tenant summary from the cache.
+
+        Returns the summaries of the changed documents plus the new tenant summary;
+        the other documents' summary entries are left as they are.
+        """
+        cached = self.cache.setdefault("documents", {})
+        changed_sources = {doc.metadata.get("source", "unknown") for doc in changed}
+        for source in removed:
+            # A replaced document keeps its entry, so unchanged content is not summarized again
+            if source not in changed_sources:
+                cached.pop(source, None)
+        pending, failed = self._summarize_changed(changed)
+        self.last_stats = {"documents": len(cached), "summarized": pending - len(failed), "failed": len(failed)}
+
+        doc_summaries = [(source, cached[source]["summary"]) for source in sorted(cached)]
+        tenant_summary = self._tenant_summary(doc_summaries)
+        self._save_cache()
+        return self._summary_documents(
+            [(source, summary) for source, summary in doc_summaries if source in changed_sources], tenant_summary
+        )
+
+    def rename(self, source: str, new_source: str):
+        """Keep a renamed document's cached summary under its new key"""
+        cached = self.cache.setdefault("documents", {})
+        if source in cached:
+            cached[new_source] = cached.pop(source)
+            self._save_cache()
+
+    def _summarize_changed(self, documents: List[Document]) -> tuple:
+        """Summarize documents that are new or changed since cached; returns (pending count, failed sources)"""
+        cached = self.cache.setdefault("documents", {})
+        pending = []
+        for doc in documents:
+            source = doc.metadata.get("source", "unknown")
+            digest = self._hash(doc.page_content)
+            entry = cached.get(source)
+            if not entry or entry.get("hash") != digest:
+                pending.append((source, digest, doc.page_content))
+
+        failed = set()
+        if pending:
+            print(f"📝 Summarizing {len(pending)} new or changed documents ({len(documents) - len(pending)} cached)...")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                summaries = list(executor.map(lambda p: self._summarize_document(p[0], p[2]), pending))
+            for (source, digest, _), summary in zip(pending, summaries):
+                if summary:
+                    cached[source] = {"hash": digest, "summary": summary}
+                else:
+                    # Not cached, so the next build retries it instead of keeping an empty summary
+                    cached.pop(source, None)
+                    failed.add(source)
+        return len(pending), failed
+
+    @staticmethod
+    def _summary_documents(doc_summaries: List[tuple], tenant_summary: str) -> List[Document]:
+        summary_docs = [
+            Document(page_content=summary, metadata={"source": source, "summary_level": "document"})
+            for source, summary in doc_summaries if summary
+        ]
+        if tenant_summary:
+            summary_docs.append(Document(
+                page_content=tenant_summary,
+                metadata={"source": TENANT_SUMMARY_SOURCE, "summary_level": "tenant"}
+            ))
+        return summary_docs
+
+    @property
+    def tenant_summary(self) -> Optional[str]:
+        return self.cache.get("tenant", {}).get("summary")
+
+    def _summarize_document(self, source: str, text: str) -> str:
+        """Map step: summarize one document, splitting very long ones first"""
+        try:
+            pieces = [text[i:i + self.max_chars_per_call] for i in range(0, len(text), self.max_chars_per_call)]
+            partials = [
+                self.llm_wrapper.invoke(DOCUMENT_SUMMARY_PROMPT.format(source=source, text=piece)).strip()
+                for piece in pieces
+            ]
+            if len(partials) == 1:
+                return partials[0]
+            return self._combine(partials)
+        except Exception as e:
+            print(f"  ⚠️  Could not summarize {source}: {e}")
+            return ""
+
+    def _tenant_summary(self, doc_summaries: List[tuple]) -> str:
+        """Reduce step: roll document summaries up into one tenant summary"""
+        digest = self._hash(json.dumps(doc_summaries))
+        tenant = self.cache.get("tenant", {})
+        if tenant.get("hash") == digest:
+            return tenant.get("summary", "")
+
+        texts = [f"[{source}]\n{summary}" for source, summary in doc_summaries if summary]
+        if not texts:
+            return ""
+
+        print(f"📝 Rolling up {len(texts)} document summaries into a tenant summary...")
+        try:
+            summary = self._combine(texts)
+        except Exception as e:
+            summary = ""
+            print(f"  ⚠️  Could not build tenant summary: {e}")
+        if not summary:
+            # Keep serving the previous rollup; the next build retries
+            self.last_stats["tenant_failed"] = 1
+            return tenant.get("summary", "")
+
+        self.cache["tenant"] = {"hash": digest, "summary": summary}
+        return summary
+
+    def _combine(self, texts: List[str]) -> str:
+        """Combine summaries hierarchically so each call stays within the batch size"""
+        while len(texts) > 1:
+            batches = [texts[i:i + self.combine_batch_size] for i in range(0, len(texts), self.combine_batch_size)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                texts = list(executor.map(
+                    lambda batch: self.llm_wrapper.invoke(COMBINE_SUMMARY_PROMPT.format(text="\n\n".join(batch))).strip(),
+                    batches
+                ))
+            if len(batches) == 1:
+                break
+        return texts[0] if texts else ""
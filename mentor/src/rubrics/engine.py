@@ -0,0 +1,384 @@
+"""
+Rubric Engine
+Computes the communications-cadence rubric deterministically from structured
+records instead of asking the LLM to estimate scores from a few chunks
+"""
+import json
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.rubrics.records import CommunicationRecords, normalize_subject
+
+
+# Rubric JSON paths -> (record table, column). A column of None means the whole row.
+PATH_FIELDS: Dict[str, Tuple[str, Optional[str]]] = {
+    "$.emails[*].category": ("threads", "category"),
+    "$.emails[*].probability_of_conversion": ("threads", "probability_of_conversion"),
+    "$.emails[*].messages[*]": ("messages", None),
+    "$.emails[*].messages[*].timestamp": ("messages", "timestamp"),
+    "$.emails[*].messages[*].body": ("messages", "body"),
+    "$.calendar_entries[*].start_time": ("calendar", "start_time"),
+    "$.calendar_entries[*].category": ("calendar", "category"),
+    "$.calendar_entries[*].description": ("calendar", "description"),
+    "$.slack_messages[*].messages[*]": ("slack", None),
+    "$.slack_messages[*].messages[*].timestamp": ("slack", "timestamp"),
+    "$.slack_messages[*].messages[*].message_text": ("slack", "message_text"),
+}
+
+NEXT_STEP_RE = (
+    r"next step|follow[ -]?up|schedule|calendar invite|book a time|let'?s meet|set up a call"
+    r"|by (?:monday|tuesday|wednesday|thursday|friday|eod|end of (?:day|week))"
+)
+DECISION_RE = r"\bdecided\b|\bdecision\b|\bagreed\b|\bassigned\b|action item|\bwill own\b|\bowner\b|@\w+ (?:to|will)\b"
+OWNER_RE = r"@\w+|\bowner\s*:|\bdri\b|\bassigned to\b"
+DUE_RE = r"\bby (?:mon|tue|wed|thu|fri|sat|sun)\w*|\bdue\b|\beod\b|\bdeadline\b|\b\d{1,2}/\d{1,2}\b"
+INTEGRATION_RE = r"integrat|\bapi\b|webhook|\bpos\b|\bsync\b|connector|\bsdk\b"
+
+FOLLOWUP_GAP = pd.Timedelta(hours=48)
+
+
+class RubricEngine:
+    def __init__(self, rubric: dict):
+        # Accept either the full file or the inner "mentorship_rubric" object
+        self.rubric = rubric.get("mentorship_rubric", rubric)
+        self.metadata = self.rubric.get("metadata", {})
+        self.categories = self.rubric.get("categories", [])
+        self.weights = self.rubric.get("weights", {})
+        self.tiers = sorted(
+            self.metadata.get("tier_thresholds", []),
+            key=lambda t: t.get("min", 0),
+            reverse=True
+        )
+
+        self._methods: Dict[str, Callable] = {
+            "latency_inverse": self._latency_inverse,
+            "presence_ratio": self._presence_ratio,
+            "stage_progression": self._stage_progression,
+            "ratio": self._ratio,
+            "keyword_heuristic": self._keyword_heuristic,
+            "rate_per_week": self._rate_per_week,
+            "completeness_ratio": self._completeness_ratio,
+        }
+        self._predicates: Dict[str, Callable] = {
+            "startup_followup_after_48h": self._pred_followup_after_48h,
+            "contains_next_step": lambda r, p: self._pred_text(r, p, NEXT_STEP_RE),
+            "decision_or_assignment": lambda r, p: self._pred_text(r, p, DECISION_RE),
+            "owner_and_due": self._pred_owner_and_due,
+            "min_depth_and_subject_consistency": self._pred_thread_integrity,
+            "integration_reference": lambda r, p: self._pred_text(r, p, INTEGRATION_RE),
+        }
+
+    @classmethod
+    def from_file(cls, rubrics_path: str) -> "RubricEngine":
+        with open(rubrics_path, 'r') as f:
+            return cls(json.load(f))
+
+    def score(self, records: CommunicationRecords) -> dict:
+        """Score every category and return a result shaped like computed_results_schema"""
+        warnings: List[str] = []
+        categories = []
+
+        for category in self.categories:
+            metric_results = [self._score_metric(metric, records, warnings) for metric in category.get("metrics", [])]
+            score = float(np.mean([m["score"] for m in metric_results])) if metric_results else 0.0
+            tier = self._tier(score)
+            categories.append({
+                "key": category.get("key"),
+                "label": category.get("label"),
+                "weight": self.weights.get(category.get("key"), category.get("weight", 0.0)),
+                "score": round(score, 1),
+                "tier": tier,
+                "metrics": metric_results,
+                "mentorship_note": self._guidance(category, tier)
+            })
+
+        total_weight = sum(c["weight"] for c in categories)
+        overall = sum(c["weight"] * c["score"] for c in categories) / total_weight if total_weight else 0.0
+        overall_tier = self._tier(overall)
+
+        return {
+            "overall": {
+                "score": round(overall, 1),
+                "tier": overall_tier,
+                "summary": self._summary(categories, overall, overall_tier)
+            },
+            "categories": categories,
+            "prioritized_actions": self._prioritized_actions(categories),
+            "warnings": warnings
+        }
+
+    # ------------------------------------------------------------------
+    # Metric dispatch
+    # ------------------------------------------------------------------
+
+    def _score_metric(self, metric: dict, records: CommunicationRecords, warnings: List[str]) -> dict:
+        scoring = metric.get("scoring", {})
+        method = self._methods.get(scoring.get("method"))
+        name = metric.get("name", "")
+
+        raw_value, score, details = None, None, ""
+        if method is None:
+            details = f"unsupported scoring method: {scoring.get('method')}"
+        else:
+            raw_value, score, details = method(records, metric.get("paths", []), scoring.get("parameters", {}))
+
+        if score is None or not np.isfinite(score):
+            # missing_data_policy: impute_min_score
+            warnings.append(f"missing metric: {name}")
+            score = 0.0
+            details = details or "no data"
+
+        return {
+            "name": name,
+            "raw_value": raw_value,
+            "score": round(float(np.clip(score, 0, 100)), 1),
+            "details": details
+        }
+
+    def _resolve(self, records: CommunicationRecords, path: str):
+        table, column = PATH_FIELDS.get(path, (None, None))
+        if table is None:
+            return None
+        frame = getattr(records, table)
+        return frame if column is None else frame[column]
+
+    def _texts(self, records: CommunicationRecords, paths: List[str]) -> pd.Series:
+        series = [self._resolve(records, p) for p in paths]
+        series = [s for s in series if isinstance(s, pd.Series)]
+        if not series:
+            return pd.Series([], dtype=str)
+        return pd.concat(series, ignore_index=True).fillna("").astype(str)
+
+    # ------------------------------------------------------------------
+    # Scoring methods: each returns (raw_value, score or None, details)
+    # ------------------------------------------------------------------
+
+    def _latency_inverse(self, records, paths, params):
+        latencies = self._reply_latencies(records.messages)
+        if latencies.empty:
+            return None, None, "no client message with a startup reply"
+
+        mean_minutes = float(latencies.mean())
+        lo, hi = params.get("min_minutes", 0), params.get("max_minutes", 2880)
+        score = 100.0 * (1.0 - np.clip((mean_minutes - lo) / max(hi - lo, 1e-9), 0.0, 1.0))
+        return round(mean_minutes, 1), score, f"mean of {len(latencies)} thread reply latencies (minutes)"
+
+    def _presence_ratio(self, records, paths, params):
+        if "threshold" in params:
+            values = pd.to_numeric(self._resolve(records, paths[0]), errors="coerce").dropna()
+            if values.empty:
+                return None, None, "no values"
+            ratio = float((values >= params["threshold"]).mean())
+            return round(ratio, 3), ratio * 100.0, f"{int((values >= params['threshold']).sum())}/{len(values)} >= {params['threshold']}"
+
+        predicate = self._predicates.get(params.get("predicate"))
+        if predicate is None:
+            return None, None, f"unsupported predicate: {params.get('predicate')}"
+
+        hits = predicate(records, paths)
+        if hits is None or len(hits) == 0:
+            return None, None, "no records"
+        ratio = float(hits.mean())
+        return round(ratio, 3), ratio * 100.0, f"{int(hits.sum())}/{len(hits)} match {params.get('predicate')}"
+
+    def _stage_progression(self, records, paths, params):
+        stages = params.get("stages_order", [])
+        categories = self._resolve(records, paths[0]).dropna().astype(str).str.lower()
+        if categories.empty or not stages:
+            return None, None, "no thread stages"
+
+        outcome = set(stages[-1].lower().split("|"))
+        resolved = categories.isin(outcome)
+        ratio = float(resolved.mean())
+        return round(ratio, 3), ratio * 100.0, f"{int(resolved.sum())}/{len(categories)} threads reached {stages[-1]}"
+
+    def _ratio(self, records, paths, params):
+        values = self._resolve(records, paths[0]).dropna().astype(str).str.lower()
+        if values.empty:
+            return None, None, "no categorized records"
+
+        numerator = int(self._match_label(values, params.get("from", "")).sum())
+        denominator = int(self._match_label(values, params.get("to", "")).sum())
+        if denominator == 0:
+            return None, None, f"no '{params.get('to')}' records"
+
+        ratio = numerator / denominator
+        ideal = params.get("ideal", 1.0) or 1.0
+        score = 100.0 * (1.0 - min(abs(ratio - ideal) / ideal, 1.0))
+        return round(ratio, 3), score, f"{numerator}/{denominator} (ideal {ideal})"
+
+    def _keyword_heuristic(self, records, paths, params):
+        texts = self._texts(records, paths)
+        if texts.empty:
+            return None, None, "no text"
+
+        lowered = texts.str.lower()
+        positive = params.get("keywords_positive", [])
+        negative = params.get("keywords_negative", [])
+        pos_hits = int(lowered.str.count(self._keyword_pattern(positive)).sum()) if positive else 0
+
+        if negative:
+            neg_hits = int(lowered.str.count(self._keyword_pattern(negative)).sum())
+            if pos_hits + neg_hits == 0:
+                return 0, None, "no keywords found"
+            score = 100.0 * pos_hits / (pos_hits + neg_hits)
+            return {"positive": pos_hits, "negative": neg_hits}, score, "positive / (positive + negative) keyword hits"
+
+        present = lowered.str.contains(self._keyword_pattern(positive), regex=True) if positive else pd.Series(False, index=lowered.index)
+        ratio = float(present.mean())
+        return round(ratio, 3), ratio * 100.0, f"{int(present.sum())}/{len(texts)} texts mention a fit keyword"
+
+    def _rate_per_week(self, records, paths, params):
+        times = pd.to_datetime(self._resolve(records, paths[0]), errors="coerce", utc=True).dropna()
+        if times.empty:
+            return None, None, "no dated entries"
+
+        weeks = max(int(np.ceil((times.max() - times.min()) / pd.Timedelta(weeks=1))), 1)
+        rate = len(times) / weeks
+        lo, hi = params.get("min", 0), params.get("max", 12)
+        score = 100.0 * np.clip((rate - lo) / max(hi - lo, 1e-9), 0.0, 1.0)
+        return round(rate, 2), score, f"{len(times)} entries over {weeks} week(s)"
+
+    def _completeness_ratio(self, records, paths, params):
+        series = [self._resolve(records, p) for p in paths]
+        series = [s for s in series if isinstance(s, pd.Series)]
+        total = sum(len(s) for s in series)
+        if total == 0:
+            return None, None, "no records"
+
+        valid = sum(int(s.notna().sum()) for s in series)
+        ratio = valid / total
+        return round(ratio, 3), ratio * 100.0, f"{valid}/{total} valid timestamps"
+
+    # ------------------------------------------------------------------
+    # Predicates: each returns a boolean Series over its unit (thread or message)
+    # ------------------------------------------------------------------
+
+    def _pred_text(self, records, paths, pattern: str) -> pd.Series:
+        return self._texts(records, paths).str.contains(pattern, case=False, regex=True)
+
+    def _pred_owner_and_due(self, records, paths) -> pd.Series:
+        texts = self._texts(records, paths)
+        return texts.str.contains(OWNER_RE, case=False, regex=True) & texts.str.contains(DUE_RE, case=False, regex=True)
+
+    def _pred_followup_after_48h(self, records, paths) -> Optional[pd.Series]:
+        """Per thread: startup sent a message 48h+ after its own previous message with no client reply in between"""
+        messages = records.messages.dropna(subset=["timestamp"])
+        if messages.empty:
+            return None
+
+        ordered = messages.sort_values(["thread_id", "timestamp"])
+        grouped = ordered.groupby("thread_id", sort=False)
+        prev_startup = grouped["is_startup"].shift(1)
+        gap = ordered["timestamp"] - grouped["timestamp"].shift(1)
+
+        followup = ordered["is_startup"] & (prev_startup == True) & (gap >= FOLLOWUP_GAP)  # noqa: E712
+        return followup.groupby(ordered["thread_id"], sort=False).any()
+
+    def _pred_thread_integrity(self, records, paths) -> Optional[pd.Series]:
+        messages = records.messages
+        if messages.empty:
+            return None
+
+        subjects = messages["subject"].fillna("").map(normalize_subject)
+        per_thread = subjects.groupby(messages["thread_id"])
+        return (per_thread.size() >= 2) & (per_thread.nunique() == 1)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _reply_latencies(messages: pd.DataFrame) -> pd.Series:
+        """Minutes from the first client message in each thread to the first startup reply after it"""
+        dated = messages.dropna(subset=["timestamp"])
+        if dated.empty:
+            return pd.Series([], dtype=float)
+
+        first_client = dated.loc[~dated["is_startup"]].groupby("thread_id")["timestamp"].min().rename("client_at")
+        startup = dated.loc[dated["is_startup"], ["thread_id", "timestamp"]].join(first_client, on="thread_id", how="inner")
+        replies = startup.loc[startup["timestamp"] > startup["client_at"]]
+        if replies.empty:
+            return pd.Series([], dtype=float)
+
+        first_reply = replies.groupby("thread_id").agg(reply_at=("timestamp", "min"), client_at=("client_at", "first"))
+        return (first_reply["reply_at"] - first_reply["client_at"]).dt.total_seconds() / 60.0
+
+    @staticmethod
+    def _keyword_pattern(keywords: List[str]) -> str:
+        return "|".join(rf"\b{re.escape(k.lower())}\b" for k in keywords)
+
+    @staticmethod
+    def _match_label(values: pd.Series, label: str) -> pd.Series:
+        """Match a stage/category label; supports '*' wildcards and the special 'all_events'"""
+        if label in ("all_events", "all", "*"):
+            return pd.Series(True, index=values.index)
+        pattern = "^" + re.escape(label.lower()).replace(r"\*", ".*") + "$"
+        return values.str.match(pattern)
+
+    def _tier(self, score: float) -> str:
+        for tier in self.tiers:
+            if score >= tier.get("min", 0):
+                return tier.get("tier", "")
+        return self.tiers[-1].get("tier", "") if self.tiers else ""
+
+    def _guidance(self, category: dict, tier: str) -> str:
+        guidance = category.get("guidance", {})
+        level = {0: "high", 1: "medium"}.get(self._tier_rank(tier), "low")
+        return guidance.get(level, "")
+
+    def _tier_rank(self, tier: str) -> int:
+        names = [t.get("tier") for t in self.tiers]
+        return names.index(tier) if tier in names else len(names)
+
+    def _summary(self, categories: List[dict], overall: float, tier: str) -> str:
+        if not categories:
+            return "No rubric categories defined."
+        ranked = sorted(categories, key=lambda c: c["score"])
+        return (
+            f"Overall {overall:.0f}/100 ({tier}). "
+            f"Strongest: {ranked[-1]['label']} ({ranked[-1]['score']:.0f}). "
+            f"Weakest: {ranked[0]['label']} ({ranked[0]['score']:.0f})."
+        )
+
+    def _prioritized_actions(self, categories: List[dict]) -> List[dict]:
+        """One action for each of the two lowest-scoring categories, targeting its weakest metric"""
+        actions = []
+        for category in sorted(categories, key=lambda c: c["score"])[:2]:
+            weakest = min(category["metrics"], key=lambda m: m["score"]) if category["metrics"] else None
+            actions.append({
+                "title": f"Improve {category['label']}",
+                "why": f"{weakest['name']} scored {weakest['score']:.0f}/100" if weakest else f"Category scored {category['score']:.0f}/100",
+                "next_step": category["mentorship_note"],
+                "owner_placeholder": "",
+                "due_in_days": 7
+            })
+        return actions
+
+    @staticmethod
+    def format_scores(results: dict) -> str:
+        """Plain-text score block for prompts (no braces, safe inside templates)"""
+        if not results:
+            return ""
+        overall = results.get("overall", {})
+        lines = [f"Overall: {overall.get('score', 0):.0f}/100 ({overall.get('tier', '')})"]
+        for category in results.get("categories", []):
+            lines.append(f"- {category['label']}: {category['score']:.0f}/100 ({category['tier']})")
+            for metric in category.get("metrics", []):
+                lines.append(f"    * {metric['name']}: {metric['score']:.0f}/100 ({metric['details']})")
+        return "\n".join(lines).replace("{", "(").replace("}", ")")
+
+
+if __name__ == "__main__":
+    # Score the bundled rubric against an empty corpus
+    import os
+    import time
+
+    engine = RubricEngine.from_file(os.path.join(os.path.dirname(__file__), 'example_rubrics.json'))
+    start = time.perf_counter()
+    result = engine.score(CommunicationRecords.empty())
+    print(f"Scored in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(RubricEngine.format_scores(result))
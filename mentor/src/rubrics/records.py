@@ -0,0 +1,280 @@
+"""
+Communication Records
+Extracts structured email, calendar and Slack records from loaded documents
+so rubric metrics can be computed over the full corpus
+"""
+import json
+import os
+import re
+from collections import Counter
+from email import policy
+from email.parser import Parser
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import List, Optional
+
+import pandas as pd
+from langchain_core.documents import Document
+
+
+THREAD_COLUMNS = ["thread_id", "subject", "category", "probability_of_conversion", "source"]
+MESSAGE_COLUMNS = ["thread_id", "sender", "sender_domain", "is_startup", "timestamp", "subject", "body", "source"]
+CALENDAR_COLUMNS = ["title", "start_time", "category", "description", "source"]
+SLACK_COLUMNS = ["channel", "user", "timestamp", "message_text", "source"]
+
+# Extracted rows saved next to a tenant's index, so one document can be removed or
+# replaced and the rubric rescored without re-reading the rest of the corpus
+RECORD_ROWS_FILE = "rubric_records.json"
+ROW_TABLES = ("threads", "messages", "calendar", "slack")
+
+SUBJECT_PREFIX_RE = re.compile(r"^\s*((re|fw|fwd)\s*:\s*)+", re.IGNORECASE)
+
+
+def normalize_subject(subject: str) -> str:
+    """Strip reply/forward prefixes so replies group with their thread"""
+    return SUBJECT_PREFIX_RE.sub("", subject or "").strip().lower()
+
+
+def _domain(address: str) -> str:
+    return address.rsplit("@", 1)[-1].lower() if address and "@" in address else ""
+
+
+class CommunicationRecords:
+    """Columnar email, calendar and Slack records for one tenant"""
+
+    def __init__(
+        self,
+        threads: pd.DataFrame,
+        messages: pd.DataFrame,
+        calendar: pd.DataFrame,
+        slack: pd.DataFrame
+    ):
+        self.threads = threads
+        self.messages = messages
+        self.calendar = calendar
+        self.slack = slack
+
+    @classmethod
+    def empty(cls) -> "CommunicationRecords":
+        return cls(
+            threads=pd.DataFrame(columns=THREAD_COLUMNS),
+            messages=pd.DataFrame(columns=MESSAGE_COLUMNS),
+            calendar=pd.DataFrame(columns=CALENDAR_COLUMNS),
+            slack=pd.DataFrame(columns=SLACK_COLUMNS)
+        )
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: List[Document],
+        startup_domains: Optional[List[str]] = None
+    ) -> "CommunicationRecords":
+        """Extract records from full-text documents (before chunking)"""
+        return RecordExtractor.from_documents(documents, startup_domains=startup_domains).build()
+
+    def summary(self) -> dict:
+        """Record counts, useful for logging and health checks"""
+        return {
+            "email_threads": len(self.threads),
+            "email_messages": len(self.messages),
+            "calendar_entries": len(self.calendar),
+            "slack_messages": len(self.slack)
+        }
+
+
+class RecordExtractor:
+    """Accumulates records from .eml and JSON export documents"""
+
+    def __init__(self, startup_domains: Optional[List[str]] = None):
+        self.startup_domains = {d.lower().lstrip("@") for d in (startup_domains or []) if d}
+        self._threads = []
+        self._messages = []
+        self._calendar = []
+        self._slack = []
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], startup_domains: Optional[List[str]] = None) -> "RecordExtractor":
+        extractor = cls(startup_domains=startup_domains)
+        for doc in documents:
+            extractor.add(doc.metadata.get("source", ""), doc.page_content)
+        return extractor
+
+    @classmethod
+    def load(cls, path: str, startup_domains: Optional[List[str]] = None) -> Optional["RecordExtractor"]:
+        """Extractor holding the rows saved by save(), or None if there are none"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                rows = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Could not read rubric records from {path}: {e}")
+            return None
+        extractor = cls(startup_domains=startup_domains)
+        for table in ROW_TABLES:
+            getattr(extractor, f"_{table}").extend(rows.get(table, []))
+        return extractor
+
+    def save(self, path: str):
+        """Write the extracted rows (before build's thread dedup and sender attribution)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({table: getattr(self, f"_{table}") for table in ROW_TABLES}, f, default=str)
+        os.replace(path + '.tmp', path)
+
+    def remove_source(self, source: str):
+        """Drop every row extracted from one document"""
+        for table in ROW_TABLES:
+            rows = getattr(self, f"_{table}")
+            rows[:] = [row for row in rows if row.get("source") != source]
+
+    def rename_source(self, source: str, new_source: str):
+        for table in ROW_TABLES:
+            for row in getattr(self, f"_{table}"):
+                if row.get("source") == source:
+                    row["source"] = new_source
+
+    def add(self, source: str, text: str):
+        """Add one document; unsupported formats are ignored"""
+        if not text:
+            return
+
+        lowered = source.lower()
+        try:
+            if lowered.endswith(".eml"):
+                self._add_eml(source, text)
+            elif lowered.endswith(".json"):
+                self._add_json(source, json.loads(text))
+        except Exception as e:
+            print(f"  ⚠️  Could not extract records from {source}: {e}")
+
+    def _add_eml(self, source: str, text: str):
+        msg = Parser(policy=policy.default).parsestr(text)
+        subject = str(msg.get("Subject", "") or "")
+
+        # Thread on the root of the References chain, falling back to the subject
+        references = str(msg.get("References", "") or "").split()
+        in_reply_to = str(msg.get("In-Reply-To", "") or "").strip()
+        thread_id = (references[0] if references else in_reply_to) or normalize_subject(subject)
+
+        senders = getaddresses([str(msg.get("From", "") or "")])
+        sender = senders[0][1].lower() if senders else ""
+
+        timestamp = None
+        if msg.get("Date"):
+            try:
+                timestamp = parsedate_to_datetime(str(msg["Date"]))
+            except (TypeError, ValueError):
+                timestamp = None
+
+        body_part = msg.get_body(preferencelist=("plain", "html"))
+        body = body_part.get_content() if body_part is not None else ""
+
+        self._threads.append({
+            "thread_id": thread_id,
+            "subject": subject,
+            "category": None,
+            "probability_of_conversion": None,
+            "source": source
+        })
+        self._messages.append({
+            "thread_id": thread_id,
+            "sender": sender,
+            "sender_domain": _domain(sender),
+            "is_startup": None,
+            "timestamp": timestamp,
+            "subject": subject,
+            "body": body,
+            "source": source
+        })
+
+    def _add_json(self, source: str, data):
+        """Add a structured export shaped like the rubric paths ($.emails, $.calendar_entries, $.slack_messages)"""
+        if not isinstance(data, dict):
+            return
+
+        for i, thread in enumerate(data.get("emails") or []):
+            thread_id = str(thread.get("thread_id") or thread.get("id") or f"{source}#{i}")
+            subject = thread.get("subject", "")
+            self._threads.append({
+                "thread_id": thread_id,
+                "subject": subject,
+                "category": thread.get("category"),
+                "probability_of_conversion": thread.get("probability_of_conversion"),
+                "source": source
+            })
+            for message in thread.get("messages") or []:
+                sender = str(message.get("from") or message.get("sender") or "").lower()
+                self._messages.append({
+                    "thread_id": thread_id,
+                    "sender": sender,
+                    "sender_domain": _domain(sender),
+                    "is_startup": self._explicit_side(message),
+                    "timestamp": message.get("timestamp"),
+                    "subject": message.get("subject", subject),
+                    "body": message.get("body", ""),
+                    "source": source
+                })
+
+        for entry in data.get("calendar_entries") or []:
+            self._calendar.append({
+                "title": entry.get("title") or entry.get("summary", ""),
+                "start_time": entry.get("start_time"),
+                "category": entry.get("category"),
+                "description": entry.get("description", ""),
+                "source": source
+            })
+
+        for channel in data.get("slack_messages") or []:
+            for message in channel.get("messages") or []:
+                self._slack.append({
+                    "channel": channel.get("channel", ""),
+                    "user": message.get("user", ""),
+                    "timestamp": message.get("timestamp"),
+                    "message_text": message.get("message_text", ""),
+                    "source": source
+                })
+
+    @staticmethod
+    def _explicit_side(message: dict) -> Optional[bool]:
+        """Read the sender side from export fields when present"""
+        if "from_startup" in message:
+            return bool(message["from_startup"])
+        role = str(message.get("sender_role") or message.get("direction") or "").lower()
+        if role in ("startup", "outbound", "internal"):
+            return True
+        if role in ("client", "customer", "inbound", "external"):
+            return False
+        return None
+
+    def build(self) -> CommunicationRecords:
+        threads = pd.DataFrame(self._threads, columns=THREAD_COLUMNS)
+        threads = threads.drop_duplicates(subset="thread_id", keep="first").reset_index(drop=True)
+        threads["probability_of_conversion"] = pd.to_numeric(threads["probability_of_conversion"], errors="coerce")
+
+        messages = pd.DataFrame(self._messages, columns=MESSAGE_COLUMNS)
+        messages["timestamp"] = pd.to_datetime(messages["timestamp"], errors="coerce", utc=True, format="mixed")
+        messages["body"] = messages["body"].fillna("").astype(str)
+
+        # Messages without an explicit side are attributed by sender domain
+        startup_domains = self.startup_domains or self._infer_startup_domains(messages)
+        unknown = messages["is_startup"].isna()
+        messages.loc[unknown, "is_startup"] = messages.loc[unknown, "sender_domain"].isin(startup_domains)
+        messages["is_startup"] = messages["is_startup"].astype(bool)
+
+        calendar = pd.DataFrame(self._calendar, columns=CALENDAR_COLUMNS)
+        calendar["start_time"] = pd.to_datetime(calendar["start_time"], errors="coerce", utc=True, format="mixed")
+        calendar["description"] = calendar["description"].fillna("").astype(str)
+
+        slack = pd.DataFrame(self._slack, columns=SLACK_COLUMNS)
+        slack["timestamp"] = pd.to_datetime(slack["timestamp"], errors="coerce", utc=True, format="mixed")
+        slack["message_text"] = slack["message_text"].fillna("").astype(str)
+
+        return CommunicationRecords(threads=threads, messages=messages, calendar=calendar, slack=slack)
+
+    @staticmethod
+    def _infer_startup_domains(messages: pd.DataFrame) -> set:
+        """Assume the most frequent sender domain belongs to the startup"""
+        domains = Counter(d for d in messages["sender_domain"] if d)
+        if not domains:
+            return set()
+        return {domains.most_common(1)[0][0]}
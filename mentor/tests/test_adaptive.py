@@ -0,0 +1,83 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.retrieval.adaptive import PLACEHOLDER_SOURCE, CutoffSettings, RetrievalMetrics, ScoreCutoff
+
+
+def candidates(*scores, source="a.txt"):
+    return [(Document(page_content=f"chunk {i}", metadata={"source": source}), score) for i, score in enumerate(scores)]
+
+
+def cutoff(**settings) -> ScoreCutoff:
+    return ScoreCutoff(CutoffSettings(**{"max_k": 6, "min_k": 2, "relative_score": 0.8,
+                                          "elbow_gap": 0.1, "min_relevance": 0.15, **settings}))
+
+
+def kept_scores(result):
+    return [score for _, score in result[0]]
+
+
+def test_elbow_cuts_at_the_largest_drop():
+    result = cutoff(relative_score=0.5).select(candidates(0.9, 0.88, 0.86, 0.6, 0.58))
+    assert kept_scores(result) == [0.9, 0.88, 0.86]
+    assert result[1] == "elbow"
+
+
+def test_relative_margin_without_a_clear_elbow():
+    result = cutoff().select(candidates(0.9, 0.85, 0.8, 0.75, 0.7, 0.4))
+    assert kept_scores(result) == [0.9, 0.85, 0.8, 0.75]
+    assert result[1] == "relative"
+
+
+def test_never_fewer_than_min_k():
+    result = cutoff(min_k=3).select(candidates(0.9, 0.3, 0.29, 0.28))
+    assert len(result[0]) == 3
+    assert result[1] == "min_k"
+
+
+def test_min_k_is_limited_to_relevant_chunks():
+    result = cutoff(min_k=3).select(candidates(0.9, 0.5, 0.1))
+    assert kept_scores(result) == [0.9, 0.5]
+    assert result[2] == "only 2 above min relevance"
+
+
+def test_never_more_than_max_k():
+    result = cutoff(max_k=3).select(candidates(*[0.9 - i * 0.01 for i in range(10)]))
+    assert len(result[0]) == 3
+    assert result[1] == "max_k"
+
+
+def test_nothing_relevant_or_only_placeholders():
+    assert cutoff().select(candidates(0.1, 0.05))[:2] == ([], "no_match")
+    assert cutoff().select(candidates(0.9, source=PLACEHOLDER_SOURCE))[:2] == ([], "no_documents")
+    assert cutoff().select([])[:2] == ([], "no_documents")
+
+
+def test_unnormalized_scores_keep_fixed_max_k():
+    # l2-space relevance can be negative; no floor or margin applies
+    result = cutoff(max_k=3).select(candidates(-0.2, -0.5, -0.9, -1.4), normalized=False)
+    assert kept_scores(result) == [-0.2, -0.5, -0.9]
+    assert result[1] == "fixed"
+
+
+def test_disabled_cutoff_fetches_and_keeps_max_k():
+    disabled = cutoff(enabled=False, max_k=2)
+    assert disabled.fetch_k == 2
+    assert kept_scores(disabled.select(candidates(0.1, 0.9, 0.5))) == [0.9, 0.5]
+
+
+def test_settings_validation():
+    with pytest.raises(ValueError):
+        CutoffSettings(min_k=0)
+    with pytest.raises(ValueError):
+        CutoffSettings(max_k=2, min_k=3)
+    assert CutoffSettings(max_k=8, candidate_k=4).candidate_k == 8
+
+
+def test_metrics_count_answers_without_llm():
+    metrics = RetrievalMetrics()
+    metrics.record("elbow", 3, 12, 900)
+    metrics.record("no_match", 0, 12, 0)
+    snapshot = metrics.snapshot()
+    assert snapshot["avg_chunks"] == 1.5
+    assert snapshot["answered_without_llm"] == 1
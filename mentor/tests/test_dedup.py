@@ -0,0 +1,89 @@
+from src.loaders.chunk_records import ChunkRecord, SourceText
+from src.loaders.dedup import ChunkDeduplicator, simhash, strip_quoted_reply, strip_signature
+
+
+PARAGRAPH = (
+    "We reviewed the pilot results with the operations team and agreed to expand coverage "
+    "to the two downtown clinics starting next month, pending the security review."
+)
+
+PLAN = (
+    "The rollout plan covers staff training, a shared booking calendar, after hours coverage for urgent "
+    "requests, weekly check-ins with each clinic manager and a final review of patient feedback before "
+    "we sign the annual contract in the spring."
+)
+
+
+def chunk(text: str, timestamp: float, source: str = "a.eml") -> ChunkRecord:
+    return ChunkRecord(SourceText(text, {"source": source, "timestamp": timestamp}), 0, len(text), index=0)
+
+
+def deduplicator(**kwargs) -> ChunkDeduplicator:
+    # A word count keeps the tests offline (no tokenizer download)
+    return ChunkDeduplicator(count_tokens=lambda text: len(text.split()), **kwargs)
+
+
+def distance(a: str, b: str) -> int:
+    return bin(simhash(a)[0] ^ simhash(b)[0]).count("1")
+
+
+def test_simhash_is_stable_and_close_for_near_duplicates():
+    assert simhash(PARAGRAPH) == simhash(PARAGRAPH)
+    assert simhash(PARAGRAPH)[1] == len(PARAGRAPH.split()) - 2
+    assert distance(PARAGRAPH, PARAGRAPH.replace("two", "three")) < distance(PARAGRAPH, "An unrelated note about lunch plans for the whole team on friday afternoon.")
+
+
+def test_bands_cover_max_distance():
+    dedup = deduplicator(max_distance=3)
+    # Fingerprints within 3 bits agree exactly on at least one of 4 bands
+    assert dedup.bands == 4
+    band_bits = 64 // dedup.bands
+    fingerprint = simhash(PARAGRAPH)[0]
+    flipped = fingerprint ^ (1 << 0) ^ (1 << band_bits) ^ (1 << 2 * band_bits)
+    bands = lambda f: [f >> (b * band_bits) & ((1 << band_bits) - 1) for b in range(dedup.bands)]
+    assert sum(x == y for x, y in zip(bands(fingerprint), bands(flipped))) == 1
+
+
+def test_exact_and_near_duplicates_keep_the_oldest_copy():
+    original = chunk(PARAGRAPH, timestamp=1.0, source="first.eml")
+    copies = [
+        chunk(PARAGRAPH.upper(), timestamp=3.0),  # same text once normalized
+        chunk(PARAGRAPH, timestamp=2.0),
+    ]
+    dedup = deduplicator()
+    kept = dedup.dedupe_chunks(copies + [original])
+    assert [c.get("source") for c in kept] == ["first.eml"]
+    assert kept[0].get("duplicates") == 2
+    assert dedup.last_stats["chunks_removed"] == 2
+
+
+def test_near_duplicate_within_distance_is_dropped():
+    text = " ".join([PARAGRAPH, PLAN, PLAN.replace("clinic", "office"), PLAN.replace("weekly", "monthly")])
+    variant = text + " Thanks, Ann"
+    assert distance(text, variant) <= 3
+    kept = deduplicator(max_distance=3).dedupe_chunks([chunk(text, 1.0), chunk(variant, 2.0)])
+    assert [c.page_content for c in kept] == [text]
+
+
+def test_short_chunks_only_match_exactly():
+    kept = deduplicator().dedupe_chunks([chunk("Thanks, sounds good", 1.0), chunk("Thanks, sounds great", 2.0)])
+    assert len(kept) == 2
+
+
+def test_repeated_paragraph_is_trimmed_from_a_forward_with_new_text():
+    note = "Forwarding this so finance can plan the invoice schedule and the budget for the second quarter rollout."
+    forward = chunk(f"{note}\n\n{PARAGRAPH}", timestamp=2.0, source="fwd.eml")
+    dedup = deduplicator()
+    kept = dedup.dedupe_chunks([chunk(PARAGRAPH, 1.0), forward])
+    assert [c.page_content for c in kept] == [PARAGRAPH, note]
+    assert dedup.last_stats["chunks_trimmed"] == 1
+
+
+def test_strip_quoted_reply_keeps_headers_and_new_text():
+    email = "From: a@x.com\nSubject: Re: Pilot\n\nSounds good.\n> old line\n\nOn Mon, Jan 1, 2024 Bob wrote:\nolder text"
+    assert strip_quoted_reply(email) == "From: a@x.com\nSubject: Re: Pilot\n\nSounds good."
+
+
+def test_strip_signature_keeps_sign_off_word():
+    assert strip_signature("See you Friday.\n\nBest,\nAnn Lee\nCEO, Startup\n555-0100") == "See you Friday.\n\nBest,"
+    assert strip_signature("See you Friday.\n-- \nAnn") == "See you Friday."
@@ -0,0 +1,61 @@
+import pytest
+
+from src.cluster.ring import HashRing
+
+
+NODES = [f"http://node-{i}:8000" for i in range(5)]
+TENANTS = [f"user-{i}" for i in range(2000)]
+
+
+def owners(ring: HashRing) -> dict:
+    return {key: ring.owner(key) for key in TENANTS}
+
+
+def test_nodes_for_is_distinct_ordered_and_stable():
+    ring = HashRing(NODES)
+    order = ring.nodes_for("user-1")
+    assert sorted(order) == sorted(NODES)
+    assert ring.nodes_for("user-1", 2) == order[:2]
+    assert HashRing(reversed(NODES)).nodes_for("user-1") == order
+
+
+def test_removing_a_node_moves_only_its_keys():
+    ring = HashRing(NODES)
+    before = owners(ring)
+    removed = NODES[2]
+    ring.remove(removed)
+    after = owners(ring)
+
+    moved = {key for key in TENANTS if before[key] != after[key]}
+    assert moved == {key for key in TENANTS if before[key] == removed}
+    # Each moved key lands on its previous fallback node
+    full = HashRing(NODES)
+    assert all(after[key] == full.nodes_for(key, 2)[1] for key in moved)
+
+
+def test_adding_a_node_only_takes_keys_for_itself():
+    ring = HashRing(NODES[:4])
+    before = owners(ring)
+    ring.add(NODES[4])
+    after = owners(ring)
+
+    moved = [key for key in TENANTS if before[key] != after[key]]
+    assert moved and all(after[key] == NODES[4] for key in moved)
+    # About 1/N of the keys move
+    assert len(moved) == pytest.approx(len(TENANTS) / 5, rel=0.3)
+
+
+def test_distribution_is_roughly_even():
+    counts = HashRing(NODES).distribution(TENANTS)
+    assert sum(counts.values()) == len(TENANTS)
+    assert max(counts.values()) < 1.3 * len(TENANTS) / len(NODES)
+
+
+def test_membership_changes_report_no_ops():
+    ring = HashRing(NODES[:1])
+    assert not ring.add(NODES[0])
+    assert not ring.remove(NODES[1])
+    assert ring.remove(NODES[0])
+    assert ring.owner("user-1") is None and ring.nodes_for("user-1") == []
+    with pytest.raises(ValueError):
+        HashRing(virtual_nodes=0)
@@ -0,0 +1,160 @@
+import json
+import os
+
+import pytest
+from langchain_core.documents import Document
+
+from src.rubrics.engine import RubricEngine
+from src.rubrics.records import CommunicationRecords, RecordExtractor
+
+
+RUBRICS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src/rubrics/example_rubrics.json")
+
+EXPORT = {
+    "emails": [
+        {
+            "thread_id": "t1",
+            "subject": "Pilot pricing",
+            "category": "pricing_discussion",
+            "probability_of_conversion": 80,
+            "messages": [
+                {"from": "ann@client.com", "timestamp": "2024-03-01T09:00:00Z", "body": "Can we start a pilot?"},
+                {"from": "bo@startup.io", "timestamp": "2024-03-01T10:00:00Z", "body": "Yes, next step is a call by Friday"},
+                {"from": "bo@startup.io", "timestamp": "2024-03-04T10:00:00Z", "body": "Following up on the pilot"}
+            ]
+        },
+        {
+            "thread_id": "t2",
+            "subject": "Demo",
+            "category": "demo_followup",
+            "probability_of_conversion": 40,
+            "messages": [
+                {"from": "cy@client.com", "timestamp": "2024-03-02T09:00:00Z", "body": "Not a fit for now"},
+                {"from": "bo@startup.io", "timestamp": "2024-03-02T09:30:00Z", "body": "Understood"}
+            ]
+        },
+        {"thread_id": "t3", "subject": "Closed", "category": "won", "probability_of_conversion": 95, "messages": []}
+    ],
+    "calendar_entries": [
+        {"title": "Client call", "start_time": "2024-03-01T15:00:00Z", "category": "customer_call", "description": "pilot"},
+        {"title": "Standup", "start_time": "2024-03-05T15:00:00Z", "category": "internal", "description": ""}
+    ],
+    "slack_messages": [
+        {"channel": "eng", "messages": [
+            {"user": "bo", "timestamp": "2024-03-01T12:00:00Z", "message_text": "@dee to own the API sync by Friday"},
+            {"user": "dee", "timestamp": "2024-03-01T12:05:00Z", "message_text": "lunch?"}
+        ]}
+    ]
+}
+
+
+def export_document(data=None, source="export.json") -> Document:
+    return Document(page_content=json.dumps(data or EXPORT), metadata={"source": source})
+
+
+def records(data=None) -> CommunicationRecords:
+    return CommunicationRecords.from_documents([export_document(data)], startup_domains=["startup.io"])
+
+
+def rubric(method: str, paths: list, **parameters) -> RubricEngine:
+    """A one-metric rubric, so a test sees exactly one scoring method"""
+    return RubricEngine({
+        "metadata": {"tier_thresholds": [{"tier": "Strong", "min": 75}, {"tier": "Weak", "min": 0}]},
+        "weights": {"only": 1.0},
+        "categories": [{
+            "key": "only",
+            "label": "Only",
+            "metrics": [{"name": "metric", "paths": paths, "scoring": {"method": method, "parameters": parameters}}]
+        }]
+    })
+
+
+def metric(engine: RubricEngine, recs: CommunicationRecords) -> dict:
+    return engine.score(recs)["categories"][0]["metrics"][0]
+
+
+def test_extracts_json_export_rows_and_sender_side():
+    recs = records()
+    assert recs.summary() == {"email_threads": 3, "email_messages": 5, "calendar_entries": 2, "slack_messages": 2}
+    assert recs.messages.groupby("sender_domain")["is_startup"].all().to_dict() == {"client.com": False, "startup.io": True}
+
+
+def test_eml_replies_thread_on_references_root():
+    eml = (
+        "From: ann@client.com\nSubject: Re: Pricing\nDate: Fri, 1 Mar 2024 09:00:00 +0000\n"
+        "References: <root@client.com> <second@client.com>\n\nSounds good\n"
+    )
+    recs = CommunicationRecords.from_documents([Document(page_content=eml, metadata={"source": "a.eml"})])
+    assert recs.messages["thread_id"].tolist() == ["<root@client.com>"]
+    assert str(recs.messages["timestamp"].iloc[0]) == "2024-03-01 09:00:00+00:00"
+
+
+def test_latency_inverse_uses_first_startup_reply():
+    # t1: 60 minutes, t2: 30 minutes
+    result = metric(rubric("latency_inverse", [], min_minutes=0, max_minutes=2880), records())
+    assert result["raw_value"] == 45.0
+    assert result["score"] == pytest.approx(100 * (1 - 45 / 2880), abs=0.1)
+
+
+def test_followup_predicate_needs_48h_without_client_reply():
+    result = metric(rubric("presence_ratio", ["$.emails[*].messages[*]"], predicate="startup_followup_after_48h"), records())
+    # Only t1 has a second startup message 3 days after the first
+    assert result["raw_value"] == 0.5
+
+
+def test_text_predicates():
+    next_step = rubric("presence_ratio", ["$.emails[*].messages[*].body"], predicate="contains_next_step")
+    assert metric(next_step, records())["details"] == "1/5 match contains_next_step"
+
+    owner_and_due = rubric("presence_ratio", ["$.slack_messages[*].messages[*].message_text"], predicate="owner_and_due")
+    assert metric(owner_and_due, records())["raw_value"] == 0.5
+
+
+def test_threshold_stage_and_ratio_methods():
+    high = rubric("presence_ratio", ["$.emails[*].probability_of_conversion"], threshold=70)
+    assert metric(high, records())["raw_value"] == pytest.approx(2 / 3, abs=1e-3)
+
+    stages = rubric("stage_progression", ["$.emails[*].category"], stages_order=["demo_followup", "won|lost"])
+    assert metric(stages, records())["raw_value"] == pytest.approx(1 / 3, abs=1e-3)
+
+    customer_share = rubric("ratio", ["$.calendar_entries[*].category"], **{"from": "customer_*", "to": "all_events", "ideal": 0.5})
+    assert metric(customer_share, records())["score"] == 100.0
+
+
+def test_keyword_heuristic_balances_positive_and_negative_hits():
+    engine = rubric(
+        "keyword_heuristic", ["$.emails[*].messages[*].body"],
+        keywords_positive=["yes", "pilot"], keywords_negative=["not a fit"]
+    )
+    result = metric(engine, records())
+    assert result["raw_value"] == {"positive": 3, "negative": 1}
+    assert result["score"] == 75.0
+
+
+def test_missing_data_scores_zero_with_warning():
+    result = rubric("latency_inverse", []).score(CommunicationRecords.empty())
+    assert result["categories"][0]["score"] == 0.0
+    assert result["warnings"] == ["missing metric: metric"]
+
+
+def test_bundled_rubric_is_deterministic_and_bounded():
+    engine = RubricEngine.from_file(RUBRICS_PATH)
+    first, second = engine.score(records()), engine.score(records())
+    assert first == second
+    assert 0 <= first["overall"]["score"] <= 100
+    assert first["overall"]["tier"] in {"Strong", "Moderate", "Needs Improvement"}
+    assert len(first["prioritized_actions"]) == 2
+
+
+def test_saved_rows_rescore_like_a_full_extraction(tmp_path):
+    other = {"emails": [{"thread_id": "x", "category": "won", "messages": [
+        {"from": "ann@client.com", "timestamp": "2024-03-09T09:00:00Z", "body": "ok"}
+    ]}]}
+    documents = [export_document(), export_document(other, "other.json")]
+    path = str(tmp_path / "rows.json")
+    RecordExtractor.from_documents(documents, ["startup.io"]).save(path)
+
+    extractor = RecordExtractor.load(path, ["startup.io"])
+    extractor.remove_source("other.json")
+    engine = RubricEngine.from_file(RUBRICS_PATH)
+    assert engine.score(extractor.build()) == engine.score(records())